@@ -0,0 +1,36 @@
+"""Auxiliary module to configure the logging of the exporter.
+
+Messages go through the `logging` module, leveled by the `--log_level` CLI option. The full dumps of
+the blocks (see `m_aux.pretty_print`) go through a dedicated logger: they only show up at DEBUG, or
+in a separate dump file when one is configured, whatever the log level.
+"""
+
+import logging
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+DUMP_LOGGER_NAME = "notion_exporter.dump"
+
+
+def setup_logging(log_level="INFO", dump_file=None):
+    """Configures the logging of the exporter.
+
+    Parameters:
+    - log_level (str): The level of the messages printed to the console.
+    - dump_file (str, optional): The file the full block dumps are written to. When it is set, the
+      dumps are only written there, otherwise they are printed to the console at DEBUG.
+    """
+    logging.basicConfig(level=log_level, format=LOG_FORMAT, force=True)
+
+    dump_logger = logging.getLogger(DUMP_LOGGER_NAME)
+    for handler in list(dump_logger.handlers):
+        dump_logger.removeHandler(handler)
+        handler.close()
+    if dump_file:
+        dump_handler = logging.FileHandler(dump_file, mode="w", encoding="utf-8")
+        dump_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        dump_logger.addHandler(dump_handler)
+        dump_logger.setLevel(logging.DEBUG)
+        dump_logger.propagate = False
+    else:
+        dump_logger.setLevel(logging.NOTSET)
+        dump_logger.propagate = True
@@ -0,0 +1,264 @@
+"""Auxiliary module to collect the metrics of a run.
+
+The metrics are kept in a module-level registry, in the same spirit as the global Notion client of
+`m_config.notion_client`, so any module can record them without threading a collector around:
+
+- Counters (`inc`): API calls by endpoint, rate limited calls, bytes downloaded, blocks by type,
+  files written...
+- Histograms (`observe`, `timed`): API latency by endpoint, parse time by block type.
+- Stage wall times (`stage`): fetch, parse, write...
+
+At the end of a run they are written as a JSON report and/or a Prometheus textfile (for the node
+exporter textfile collector).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_PREFIX = "notion_exporter"
+
+# Upper bounds (in seconds) of the histogram buckets, the +Inf bucket is implicit
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PARSE_TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+HISTOGRAM_BUCKETS = {
+    "api_call_duration_seconds": LATENCY_BUCKETS,
+    "media_download_duration_seconds": LATENCY_BUCKETS,
+    "parse_duration_seconds": PARSE_TIME_BUCKETS,
+}
+
+HELP = {
+    "api_calls_total": "Notion API calls by endpoint.",
+    "api_rate_limited_total": "Notion API calls answered with a 429 by endpoint.",
+    "api_errors_total": "Notion API calls that failed by endpoint.",
+    "api_call_duration_seconds": "Latency of the Notion API calls by endpoint.",
+    "media_downloaded_bytes_total": "Bytes of media downloaded by type.",
+    "media_downloads_total": "Media downloads by type and result.",
+    "media_download_duration_seconds": "Duration of the media downloads by type.",
+    "blocks_parsed_total": "Blocks parsed by type.",
+    "parse_duration_seconds": "Parse time of the blocks by type.",
+    "files_written_total": "Files written by kind.",
+    "stage_duration_seconds": "Wall time of the stages of the run.",
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_stages = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def reset():
+    """Clears all the metrics recorded so far."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _stages.clear()
+
+
+def inc(name, value=1, **labels):
+    """Increments a counter.
+
+    Parameters:
+    - name (str): The name of the counter, without the prefix.
+    - value (int|float): The increment.
+    - labels: The labels of the counter.
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """Records a value in a histogram.
+
+    Parameters:
+    - name (str): The name of the histogram, without the prefix.
+    - value (float): The observed value.
+    - labels: The labels of the histogram.
+    """
+    key = _key(name, labels)
+    buckets = HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = {"buckets": [0] * len(buckets), "count": 0, "sum": 0.0}
+            _histograms[key] = histogram
+        histogram["count"] += 1
+        histogram["sum"] += value
+        for position, upper_bound in enumerate(buckets):
+            if value <= upper_bound:
+                histogram["buckets"][position] += 1
+
+
+@contextmanager
+def timed(name, **labels):
+    """Records the duration of the wrapped code in a histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def api_call(endpoint):
+    """Counts and times a Notion API call, including the rate limited (429) and failed calls.
+
+    Parameters:
+    - endpoint (str): The endpoint called, e.g. "blocks.retrieve".
+    """
+    inc("api_calls_total", endpoint=endpoint)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        if getattr(e, "status", None) == 429:
+            inc("api_rate_limited_total", endpoint=endpoint)
+        inc("api_errors_total", endpoint=endpoint)
+        raise
+    finally:
+        observe("api_call_duration_seconds", time.perf_counter() - start, endpoint=endpoint)
+
+
+@contextmanager
+def stage(name):
+    """Records the wall time of a stage of the run (accumulated if the stage runs several times)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _stages[name] = _stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def counted_chunks(chunks, name, **labels):
+    """Counts the bytes of an iterable of chunks as they are consumed, e.g. a download.
+
+    Parameters:
+    - chunks (iterable): The bytes chunks.
+    - name (str): The name of the counter, without the prefix.
+    - labels: The labels of the counter.
+    """
+    for chunk in chunks:
+        inc(name, len(chunk), **labels)
+        yield chunk
+
+
+def get_report():
+    """Builds the JSON report of the metrics recorded so far.
+
+    Returns:
+    - dict: The counters, histograms and stage wall times.
+    """
+    with _lock:
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        histograms = []
+        for (name, labels), histogram in sorted(_histograms.items()):
+            histograms.append(
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram["count"],
+                    "sum": histogram["sum"],
+                    "buckets": dict(
+                        zip(
+                            [str(bound) for bound in HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS)],
+                            histogram["buckets"],
+                        )
+                    ),
+                }
+            )
+        stages = dict(_stages)
+    return {"counters": counters, "histograms": histograms, "stages": stages}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_prometheus():
+    """Formats the metrics recorded so far in the Prometheus text exposition format.
+
+    Returns:
+    - str: The content of the textfile.
+    """
+    lines = []
+    with _lock:
+        metric_types = {}
+        for name, _ in _counters:
+            metric_types.setdefault(name, "counter")
+        for name, _ in _histograms:
+            metric_types.setdefault(name, "histogram")
+        if _stages:
+            metric_types["stage_duration_seconds"] = "gauge"
+
+        for name, metric_type in sorted(metric_types.items()):
+            full_name = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            if metric_type == "counter":
+                for (counter_name, labels), value in sorted(_counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{full_name}{_format_labels(labels)} {value}")
+            elif metric_type == "histogram":
+                bounds = HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS)
+                for (histogram_name, labels), histogram in sorted(_histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    for bound, count in zip(bounds, histogram["buckets"]):
+                        bucket_labels = labels + (("le", str(bound)),)
+                        lines.append(f"{full_name}_bucket{_format_labels(bucket_labels)} {count}")
+                    inf_labels = labels + (("le", "+Inf"),)
+                    lines.append(
+                        f"{full_name}_bucket{_format_labels(inf_labels)} {histogram['count']}"
+                    )
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram['sum']}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {histogram['count']}")
+            else:
+                for stage_name, seconds in sorted(_stages.items()):
+                    lines.append(
+                        f"{full_name}{_format_labels((('stage', stage_name),))} {seconds}"
+                    )
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomically(file_path, content):
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(tmp_path, file_path)
+
+
+def write_json_report(file_path):
+    """Writes the JSON report of the metrics.
+
+    Parameters:
+    - file_path (str): The path of the report.
+    """
+    _write_atomically(file_path, json.dumps(get_report(), indent=2))
+
+
+def write_prometheus_textfile(file_path):
+    """Writes the metrics as a Prometheus textfile.
+
+    The file is replaced atomically, so the node exporter never scrapes a partially written file.
+
+    Parameters:
+    - file_path (str): The path of the textfile, which has to end with `.prom` to be collected.
+    """
+    _write_atomically(file_path, format_prometheus())
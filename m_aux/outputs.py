@@ -1,9 +1,83 @@
+import hashlib
+import logging
 import os
 import re
 import shutil
+import tarfile
+import tempfile
+import zipfile
 
 import requests
 
+from m_aux import metrics
+from m_aux.progress import progress
+
+logger = logging.getLogger(__name__)
+
+# Set when rendering offline (e.g. from a snapshot): the media are not downloaded, the ones of the
+# previous export in this folder (or archive) are copied instead
+offline_media_dir = None
+offline_media_archive = None
+
+
+def set_offline_media_source(media_source):
+    """Disables the download of the images and videos, copying the ones already exported instead.
+
+    Parameters:
+    - media_source (str): The folder or archive (.zip, .tar.gz) of the previous export, or None to
+      copy no media file.
+    """
+    global offline_media_dir, offline_media_archive
+    offline_media_dir = ""
+    offline_media_archive = None
+    if media_source and os.path.isfile(media_source):
+        if media_source.endswith(".zip"):
+            offline_media_archive = zipfile.ZipFile(media_source)
+        else:
+            offline_media_archive = tarfile.open(media_source, "r:gz")
+    elif media_source:
+        offline_media_dir = media_source
+
+
+def open_offline_media(relative_path):
+    """Opens a media file of the previous export, see `set_offline_media_source`.
+
+    Parameters:
+    - relative_path (str): The path of the media file, relative to the root of the export.
+
+    Returns:
+    - A binary file object, or None if the media file was not exported.
+    """
+    if offline_media_archive is not None:
+        try:
+            if isinstance(offline_media_archive, zipfile.ZipFile):
+                return offline_media_archive.open(relative_path)
+            return offline_media_archive.extractfile(relative_path)
+        except KeyError:
+            return None
+    media_path = os.path.join(offline_media_dir, relative_path)
+    if offline_media_dir and os.path.isfile(media_path):
+        return open(media_path, "rb")
+    return None
+
+
+# Set when rendering an export again (watch mode): the media downloaded from the same URL into this
+# folder are copied instead of downloaded. Notion signs the URLs of its files, a re-fetched block
+# comes with a new URL.
+reused_media_dir = None
+# URL each media file was downloaded from, by path relative to the root of the export
+downloaded_media_urls = {}
+
+
+def set_reused_media_dir(media_dir):
+    """Reuses the media already downloaded into a folder from the same URL.
+
+    Parameters:
+    - media_dir (str): The folder of the previous export.
+    """
+    global reused_media_dir
+    reused_media_dir = media_dir
+
 
 def is_folder(path):
     """Check if the given path points to a folder.
@@ -19,7 +93,10 @@ def is_folder(path):
 
 
 def prepare_output_folder(folder_path):
-    """Prepare the output folder by ensuring the specified folder exists and is empty.
+    """Prepare the output folder by ensuring the specified folder exists.
+
+    The folder is not emptied anymore. Its content is kept up to date by `sync_output_folder`, which
+    only replaces the files that changed and removes the stale ones.
 
     Parameters:
     - folder_path (str): The path to the folder to prepare.
@@ -28,21 +105,136 @@ def prepare_output_folder(folder_path):
     if not is_folder(folder_path):
         if os.path.exists(folder_path):
             # Path exists but is not a folder (likely a file), operation is aborted
-            print(f"Error: The path '{folder_path}' is not a folder.")
+            logger.error("The path '%s' is not a folder.", folder_path)
             return
         else:
             # Path does not exist, create the folder
             os.makedirs(folder_path)
-            print(f"Folder '{folder_path}' created.")
+            logger.info("Folder '%s' created.", folder_path)
             return
 
-    # If the folder exists, empty it
-    try:
-        shutil.rmtree(folder_path)
-        os.makedirs(folder_path)
-        print(f"Folder '{folder_path}' was emptied and recreated.")
-    except Exception as e:
-        print(f"An error occurred while preparing the folder: {e}")
+
+def prepare_staging_folder(folder_path):
+    """Creates an empty staging folder where the export is rendered before being synced.
+
+    The staging folder is created next to the output folder, so files can be moved into the output
+    folder with an atomic rename (same filesystem).
+
+    Parameters:
+    - folder_path (str): The path to the output folder the staging folder is created for.
+
+    Returns:
+    - str: The path to the staging folder.
+    """
+    folder_path = os.path.abspath(folder_path)
+    staging_path = tempfile.mkdtemp(
+        prefix=f".{os.path.basename(folder_path)}-staging-", dir=os.path.dirname(folder_path)
+    )
+    logger.info("Staging folder '%s' created.", staging_path)
+    return staging_path
+
+
+def file_content_hash(file_path, chunk_size=65536):
+    """Calculates the SHA-256 hash of the content of a file.
+
+    Parameters:
+    - file_path (str): The path to the file.
+    - chunk_size (int): The size of the chunks read from the file.
+
+    Returns:
+    - str: The hexadecimal digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def same_file_content(file_path, other_file_path):
+    """Checks if two files have the same content, comparing their sizes before their hashes.
+
+    Parameters:
+    - file_path (str): The path to the first file.
+    - other_file_path (str): The path to the second file.
+
+    Returns:
+    - bool: True if both files have the same content, False otherwise.
+    """
+    if os.path.getsize(file_path) != os.path.getsize(other_file_path):
+        return False
+    return file_content_hash(file_path) == file_content_hash(other_file_path)
+
+
+def list_relative_files(folder_path):
+    """Lists all the files under a folder as paths relative to it.
+
+    Parameters:
+    - folder_path (str): The folder to list.
+
+    Returns:
+    - set: The relative paths of the files in the folder.
+    """
+    relative_files = set()
+    for current_dir, _, files in os.walk(folder_path):
+        for file_name in files:
+            relative_files.add(os.path.relpath(os.path.join(current_dir, file_name), folder_path))
+    return relative_files
+
+
+def sync_output_folder(staging_path, folder_path, preserved_dirs=(), remove_stale=True):
+    """Syncs the rendered export from the staging folder into the output folder.
+
+    Files that do not exist in the output folder are added, files whose content hash differs are
+    replaced (atomic rename) and files of the output folder that are not part of the export anymore
+    are removed, together with the folders left empty. Unchanged files are not touched, so their
+    modification time (and any downstream cache relying on it) is preserved. The staging folder is
+    removed afterwards.
+
+    Top level folders listed in `preserved_dirs` are not part of the export (e.g. the profiles of
+    the run) and are left untouched. Incremental exports, which only render part of the content,
+    keep the stale files with `remove_stale` set to False.
+
+    Parameters:
+    - staging_path (str): The path to the staging folder holding the rendered export.
+    - folder_path (str): The path to the output folder to sync.
+    - preserved_dirs (iterable): The top level folders of the output folder to leave untouched.
+    - remove_stale (bool): Whether to remove the files that are not part of the export anymore.
+
+    Returns:
+    - dict: The number of files "added", "changed", "removed" and "unchanged".
+    """
+    summary = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+    staged_files = list_relative_files(staging_path)
+
+    for relative_file in sorted(staged_files):
+        staged_file = os.path.join(staging_path, relative_file)
+        target_file = os.path.join(folder_path, relative_file)
+        if not os.path.isfile(target_file):
+            summary["added"] += 1
+        elif same_file_content(staged_file, target_file):
+            summary["unchanged"] += 1
+            continue
+        else:
+            summary["changed"] += 1
+        os.makedirs(os.path.dirname(target_file), exist_ok=True)
+        os.replace(staged_file, target_file)
+
+    preserved_prefixes = tuple(f"{preserved_dir}{os.sep}" for preserved_dir in preserved_dirs)
+    stale_files = list_relative_files(folder_path) - staged_files if remove_stale else set()
+    for relative_file in stale_files:
+        if relative_file.startswith(preserved_prefixes):
+            continue
+        os.remove(os.path.join(folder_path, relative_file))
+        summary["removed"] += 1
+
+    # Remove the folders left empty, deepest first
+    for current_dir, _, _ in sorted(os.walk(folder_path), key=lambda x: x[0], reverse=True):
+        if current_dir != folder_path and not os.listdir(current_dir):
+            os.rmdir(current_dir)
+
+    shutil.rmtree(staging_path, ignore_errors=True)
+    return summary
 
 
 def normalize_string(name):
@@ -84,13 +276,15 @@ def find_relative_path(from_path, to_path):
     return relative_path
 
 
-def download_and_save_image_or_video(url: str, type: str, dest_file: str):
+def download_and_save_image_or_video(url: str, type: str, dest_file: str, backend):
     """Downloads content from a URL and saves it to a specific path with an appropriate extension.
 
     Parameters:
     - url (str): The URL to download the content from.
     - type (str): The type of the content ('image' or 'video').
-    - dest_file (str): The destination path to save the content, without the file extension.
+    - dest_file (str): The destination path to save the content, relative to the root of the export
+      and without the file extension.
+    - backend: The output backend the content is streamed into.
 
     Raises:
     - ValueError: If the type is not 'image' or 'video'.
@@ -104,18 +298,44 @@ def download_and_save_image_or_video(url: str, type: str, dest_file: str):
     extension = ".png" if type == "image" else ".mp4"
     full_path = f"{dest_file}{extension}"
 
+    if offline_media_dir is not None:
+        # Same fallback to the URL as a failed download when the media was never exported
+        offline_file = open_offline_media(full_path)
+        logger.debug("Offline run, %s reused: %s", full_path, offline_file is not None)
+        if offline_file is None:
+            return False
+        with offline_file:
+            backend.write_stream(full_path, iter(lambda: offline_file.read(65536), b""))
+        return True
+    reused_path = os.path.join(reused_media_dir, full_path) if reused_media_dir else None
+    if reused_path and downloaded_media_urls.get(full_path) == url and os.path.isfile(reused_path):
+        # Copied into the export being written, syncing it would remove the media otherwise
+        with open(reused_path, "rb") as reused_file:
+            backend.write_stream(full_path, iter(lambda: reused_file.read(65536), b""))
+        logger.debug("Media %s unchanged, reused", full_path)
+        return True
+
     # Make the request and check for a successful response
     try:
-        response = requests.get(url, stream=True, timeout=180)
-        response.raise_for_status()  # Will raise an exception for 4XX/5XX responses
+        with metrics.timed("media_download_duration_seconds", type=type):
+            response = requests.get(url, stream=True, timeout=180)
+            response.raise_for_status()  # Will raise an exception for 4XX/5XX responses
 
-        # Save the content to the specified file
-        with open(full_path, "wb") as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
+            # Stream the content into the output backend
+            chunks = response.iter_content(chunk_size=8192)
+            backend.write_stream(
+                full_path,
+                metrics.counted_chunks(chunks, "media_downloaded_bytes_total", type=type),
+            )
 
-        print(f"Content downloaded and saved to {full_path}")
+        logger.debug("Content downloaded and saved to %s", full_path)
+        downloaded_media_urls[full_path] = url
+        metrics.inc("media_downloads_total", type=type, result="ok")
+        metrics.inc("files_written_total", kind=type)
+        progress.media_done(success=True)
         return True
     except requests.RequestException as e:
-        print(f"Failed to download content from {url}: {e}")
+        logger.error("Failed to download content from %s: %s", url, e)
+        metrics.inc("media_downloads_total", type=type, result="failed")
+        progress.media_done(success=False)
     return False
@@ -1,40 +1,75 @@
 """Auxiliary module to pretty print data structures."""
 
 import json
+import logging
 
+from m_aux.logs import DUMP_LOGGER_NAME
 
-def pretty_print(obj, label: str = None):
-    """Pretty prints the input object. Supports dictionaries, valid JSON strings, lists of
-    dictionaries, and other objects by converting them to strings.
+dump_logger = logging.getLogger(DUMP_LOGGER_NAME)
+
+
+def format_pretty(obj):
+    """Formats the input object. Supports dictionaries, valid JSON strings, lists of dictionaries,
+    and other objects by converting them to strings.
 
     Parameters:
-    - obj: The object to print. Can be a dict, a JSON string, a list of dicts, or any object.
-    - label (optional): A label to print before the object. The label will be printed in yellow.
-    """
-    # Define ANSI color codes for yellow text and reset
-    YELLOW = "\033[93m"
-    RESET = "\033[0m"
+    - obj: The object to format. Can be a dict, a JSON string, a list of dicts, or any object.
 
-    # Print the label in yellow if provided
-    if label:
-        print(f"{YELLOW}{label}{RESET}\n")
+    Returns:
+    - str: The formatted object.
+    """
+    # Records (e.g. processed blocks) are printed as their dict
+    if hasattr(obj, "to_dict"):
+        obj = obj.to_dict()
+    elif isinstance(obj, list) and any(hasattr(i, "to_dict") for i in obj):
+        obj = [i.to_dict() if hasattr(i, "to_dict") else i for i in obj]
 
     # Check the type of obj and handle accordingly
     if isinstance(obj, dict):
         # Object is a dictionary, convert to JSON string for pretty printing
-        print(json.dumps(obj, indent=2))
+        return json.dumps(obj, indent=2)
     elif isinstance(obj, list) and all(isinstance(i, dict) for i in obj):
         # Object is a list of dictionaries, convert each dictionary to JSON string for pretty printing
-        print(json.dumps(obj, indent=2))
+        return json.dumps(obj, indent=2)
     elif isinstance(obj, str):
         try:
             # Attempt to parse the string as JSON
             parsed_json = json.loads(obj)
             # If successful, pretty print the JSON string
-            print(json.dumps(parsed_json, indent=2))
+            return json.dumps(parsed_json, indent=2)
         except json.JSONDecodeError:
             # If the string is not valid JSON, print it directly
-            print(obj)
+            return obj
     else:
         # For any other type, convert to string and print
-        print(str(obj))
+        return str(obj)
+
+
+class LazyPretty:
+    """Formats an object with `format_pretty` only when a log record actually gets emitted."""
+
+    __slots__ = ["obj"]
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return format_pretty(self.obj)
+
+
+def pretty_print(obj, label: str = None):
+    """Pretty prints the input object to the dump logger, at DEBUG level.
+
+    Nothing is serialized unless the dump logger is enabled for DEBUG, i.e. the log level is DEBUG
+    or a dump file is configured (see `m_aux.logs.setup_logging`).
+
+    Parameters:
+    - obj: The object to print. Can be a dict, a JSON string, a list of dicts, or any object.
+    - label (optional): A label to print before the object.
+    """
+    if not dump_logger.isEnabledFor(logging.DEBUG):
+        return
+    if label:
+        dump_logger.debug("%s\n%s", label, LazyPretty(obj))
+    else:
+        dump_logger.debug("%s", LazyPretty(obj))
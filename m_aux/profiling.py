@@ -0,0 +1,124 @@
+"""Auxiliary module to profile the stages of a run (CPU and memory).
+
+Profiling is off unless `enable_profiling` is called (`--profile` CLI option). Then every stage
+wrapped in `profile_stage` is run under cProfile and between two tracemalloc snapshots, and writes
+to the profile directory:
+
+- `<stage>.prof`: the cProfile stats, to be opened with `pstats`, snakeviz...
+- `<stage>.alloc.txt`: the peak traced memory of the stage and its top allocations (memory growth
+  by source line between the start and the end of the stage).
+
+Stages can be nested (e.g. "rename" within "write"): the outer profiler is paused while the inner
+stage runs, so every function call is attributed to a single stage.
+"""
+
+import cProfile
+import logging
+import os
+import tracemalloc
+from contextlib import contextmanager
+
+# Folder of the profiles inside the output folder, preserved by the output sync
+PROFILE_DIR = "_profile"
+DEFAULT_TOP_ALLOCATIONS = 25
+
+logger = logging.getLogger(__name__)
+
+_profile_dir = None
+_top_allocations = DEFAULT_TOP_ALLOCATIONS
+_active_profilers = []
+
+
+def enable_profiling(profile_dir, top_allocations=DEFAULT_TOP_ALLOCATIONS):
+    """Enables the profiling of the stages and starts tracing the memory allocations.
+
+    Parameters:
+    - profile_dir (str): The folder the profiles are written to.
+    - top_allocations (int): The number of allocations listed in the allocation reports.
+    """
+    global _profile_dir, _top_allocations
+    os.makedirs(profile_dir, exist_ok=True)
+    _profile_dir = profile_dir
+    _top_allocations = top_allocations
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    logger.info("Profiling enabled, profiles are written to '%s'.", profile_dir)
+
+
+def format_allocation_report(stage, start_snapshot, end_snapshot, peak, top_allocations):
+    """Formats the allocation report of a stage.
+
+    Parameters:
+    - stage (str): The name of the stage.
+    - start_snapshot (tracemalloc.Snapshot): The snapshot taken when the stage started.
+    - end_snapshot (tracemalloc.Snapshot): The snapshot taken when the stage ended.
+    - peak (int): The peak traced memory during the stage, in bytes.
+    - top_allocations (int): The number of allocations listed.
+
+    Returns:
+    - str: The report.
+    """
+    # The allocations of the profilers themselves are not part of the stage
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ]
+    differences = end_snapshot.filter_traces(filters).compare_to(
+        start_snapshot.filter_traces(filters), "lineno"
+    )
+    lines = [
+        f"Stage: {stage}",
+        f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB",
+        f"Memory growth: {sum(diff.size_diff for diff in differences) / 1024 / 1024:.1f} MiB",
+        "",
+        f"Top {top_allocations} allocations by memory growth:",
+    ]
+    lines.extend(str(diff) for diff in differences[:top_allocations])
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profile_stage(stage):
+    """Profiles the CPU and memory of the wrapped stage when profiling is enabled.
+
+    Parameters:
+    - stage (str): The name of the stage, used to name its profile files.
+    """
+    if _profile_dir is None:
+        yield
+        return
+
+    if _active_profilers:
+        outer = _active_profilers[-1]
+        outer["profiler"].disable()
+        outer["peak"] = max(outer["peak"], tracemalloc.get_traced_memory()[1])
+    entry = {"profiler": cProfile.Profile(), "peak": 0}
+    _active_profilers.append(entry)
+    tracemalloc.reset_peak()
+    start_snapshot = tracemalloc.take_snapshot()
+    entry["profiler"].enable()
+    try:
+        yield
+    finally:
+        entry["profiler"].disable()
+        _active_profilers.pop()
+        peak = max(entry["peak"], tracemalloc.get_traced_memory()[1])
+        end_snapshot = tracemalloc.take_snapshot()
+
+        entry["profiler"].dump_stats(os.path.join(_profile_dir, f"{stage}.prof"))
+        report = format_allocation_report(
+            stage, start_snapshot, end_snapshot, peak, _top_allocations
+        )
+        with open(
+            os.path.join(_profile_dir, f"{stage}.alloc.txt"), "w", encoding="utf-8"
+        ) as report_file:
+            report_file.write(report)
+        logger.info("Profile of stage '%s' written.", stage)
+
+        if _active_profilers:
+            # The peak of the inner stage is part of the outer stage too
+            outer = _active_profilers[-1]
+            outer["peak"] = max(outer["peak"], peak)
+            tracemalloc.reset_peak()
+            outer["profiler"].enable()
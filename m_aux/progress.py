@@ -0,0 +1,189 @@
+"""Auxiliary module to report the progress of a run.
+
+The crawl discovers the blocks as it goes: listing the children of a block adds them to the
+frontier (discovered but not fetched yet). The progress is estimated from the frontier: fetch
+throughput and estimated time remaining to fetch what is already discovered (a lower bound, since
+the frontier keeps growing until the last pages are listed). Media blocks are discovered by the
+crawl and downloaded while writing.
+
+Like `m_aux.metrics`, the reporter is a module-level instance any module can update. The progress
+is logged periodically and, optionally, written to a JSON status file that an orchestrator can
+poll. The status file is replaced atomically, so it is never read half written.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+DEFAULT_PROGRESS_INTERVAL = 30
+MEDIA_TYPES = ["image", "video"]
+
+logger = logging.getLogger(__name__)
+
+
+def format_duration(seconds):
+    """Formats a duration in seconds as "1h02m03s", or "?" when unknown."""
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class ProgressReporter:
+    """Tracks the discovered and fetched blocks, pages and media of a run."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.configure()
+
+    def configure(self, interval=DEFAULT_PROGRESS_INTERVAL, status_file=None):
+        """Resets the progress and sets how it is reported.
+
+        Parameters:
+        - interval (float): The minimum number of seconds between two progress reports.
+        - status_file (str, optional): The JSON status file to keep up to date.
+        """
+        with self.lock:
+            self.interval = interval
+            self.status_file = status_file
+            self.state = "running"
+            self.stage = None
+            self.started_at = time.time()
+            self.fetch_started_at = None
+            self.fetch_ended_at = None
+            self.last_report = time.monotonic()
+            self.blocks = {"discovered": 0, "fetched": 0}
+            self.pages = {"discovered": 0, "fetched": 0}
+            self.media = {"discovered": 0, "downloaded": 0, "failed": 0}
+            self.media_started_at = None
+
+    def set_stage(self, stage):
+        """Records the stage the run is in and reports the progress."""
+        with self.lock:
+            if self.stage == "fetch" and stage != "fetch":
+                # The fetch throughput is frozen once the crawl is over
+                self.fetch_ended_at = time.monotonic()
+            self.stage = stage
+        self.report(force=True)
+
+    def discover(self, blocks):
+        """Adds blocks to the frontier, e.g. the children just listed.
+
+        Parameters:
+        - blocks (list): The discovered blocks, as returned by the Notion API.
+        """
+        with self.lock:
+            if self.fetch_started_at is None:
+                self.fetch_started_at = time.monotonic()
+            self.blocks["discovered"] += len(blocks)
+            self.pages["discovered"] += sum(
+                1 for block in blocks if block.get("type") == "child_page"
+            )
+        self.report()
+
+    def fetched(self, block):
+        """Moves a block from the frontier to the fetched blocks.
+
+        Parameters:
+        - block (dict): The fetched block, as returned by the Notion API.
+        """
+        block_type = block.get("type")
+        with self.lock:
+            self.blocks["fetched"] += 1
+            if block_type == "child_page":
+                self.pages["fetched"] += 1
+            elif block_type in MEDIA_TYPES:
+                self.media["discovered"] += 1
+        self.report()
+
+    def media_done(self, success=True):
+        """Records a media download, successful or not."""
+        with self.lock:
+            if self.media_started_at is None:
+                self.media_started_at = time.monotonic()
+            self.media["downloaded" if success else "failed"] += 1
+        self.report()
+
+    def get_status(self):
+        """Builds the status of the run.
+
+        Returns:
+        - dict: The state, stage, counts, throughput and estimated time remaining of the run.
+        """
+        now = time.monotonic()
+        with self.lock:
+            blocks = dict(self.blocks, pending=self.blocks["discovered"] - self.blocks["fetched"])
+            pages = dict(self.pages, pending=self.pages["discovered"] - self.pages["fetched"])
+            media_pending = (
+                self.media["discovered"] - self.media["downloaded"] - self.media["failed"]
+            )
+            media = dict(self.media, pending=max(media_pending, 0))
+
+            throughput = None
+            eta = None
+            if self.fetch_started_at is not None and blocks["fetched"]:
+                fetch_time = (self.fetch_ended_at or now) - self.fetch_started_at
+                throughput = blocks["fetched"] / max(fetch_time, 1e-6)
+                eta = blocks["pending"] / throughput
+            media_throughput = None
+            if self.media_started_at is not None:
+                media_done = self.media["downloaded"] + self.media["failed"]
+                media_throughput = media_done / max(now - self.media_started_at, 1e-6)
+                if self.stage == "write":
+                    eta = media["pending"] / media_throughput
+
+            return {
+                "state": self.state,
+                "stage": self.stage,
+                "started_at": self.started_at,
+                "updated_at": time.time(),
+                "elapsed_seconds": time.time() - self.started_at,
+                "blocks": blocks,
+                "pages": pages,
+                "media": media,
+                "blocks_per_second": throughput,
+                "media_per_second": media_throughput,
+                "eta_seconds": eta,
+            }
+
+    def report(self, force=False):
+        """Logs the progress and updates the status file, at most once per interval unless forced."""
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_report < self.interval:
+                return
+            self.last_report = now
+
+        status = self.get_status()
+        logger.info(
+            "Progress [%s]: blocks %d/%d, pages %d/%d, media %d/%d, %.1f blocks/s, ETA %s",
+            status["stage"],
+            status["blocks"]["fetched"],
+            status["blocks"]["discovered"],
+            status["pages"]["fetched"],
+            status["pages"]["discovered"],
+            status["media"]["downloaded"] + status["media"]["failed"],
+            status["media"]["discovered"],
+            status["blocks_per_second"] or 0.0,
+            format_duration(status["eta_seconds"]),
+        )
+        if self.status_file:
+            self.write_status_file(status)
+
+    def write_status_file(self, status):
+        tmp_path = f"{self.status_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(status, file, indent=2)
+        os.replace(tmp_path, self.status_file)
+
+    def finish(self, success=True):
+        """Records the end of the run and reports the final progress."""
+        with self.lock:
+            self.state = "done" if success else "failed"
+        self.report(force=True)
+
+
+progress = ProgressReporter()
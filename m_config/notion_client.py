@@ -1,4 +1,6 @@
 import os
+import threading
+import time
 
 from notion_client import Client
 
@@ -8,7 +10,28 @@ notion_client = Client(auth=notion_token, log_level="INFO")
 notion_request_wait_time_ms = os.environ.get("NOTION_REQUEST_WAIT_TIME", 300)
 notion_request_wait_time = int(notion_request_wait_time_ms) / 1000
 
+# Time of the next request slot, shared by the threads crawling in parallel
+request_slot_lock = threading.Lock()
+next_request_slot = 0.0
+
+
+def wait_for_request_slot():
+    """Waits for the next request slot, `notion_request_wait_time` after the previous one.
+
+    The slots are shared by all the threads, so requests made in parallel stay as spaced out as
+    sequential ones.
+    """
+    global next_request_slot
+    with request_slot_lock:
+        now = time.monotonic()
+        wait_time = next_request_slot - now
+        next_request_slot = max(now, next_request_slot) + notion_request_wait_time
+    if wait_time > 0:
+        time.sleep(wait_time)
+
 
 def set_log_level(log_level):
     global notion_client
-    notion_client.log_level = log_level
+    notion_client.logger.setLevel(log_level)
+    # The client logs through its own console handler, keep its messages from being printed twice
+    notion_client.logger.propagate = False
@@ -1,7 +1,10 @@
+import logging
 from functools import wraps
-from typing import Dict, List, Optional
+from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
 
 
 class RichText(BaseModel):
@@ -21,6 +24,10 @@ class ChildPageBlock(BaseModel):
     title: str
 
 
+class ChildDatabaseBlock(BaseModel):
+    title: str
+
+
 class CodeBlock(BaseModel):
     caption: List[RichText]
     rich_text: List[RichText]
@@ -50,11 +57,6 @@ class LinkToPageBlock(BaseModel):
     page_id: str
 
 
-class ParentReference(BaseModel):
-    block_id: str
-    type: str
-
-
 class QuoteBlock(BaseModel):
     rich_text: List[RichText]
     color: str
@@ -86,6 +88,16 @@ class BulletedListItemBlock(BaseModel):
     color: str
 
 
+class TableBlock(BaseModel):
+    table_width: int
+    has_column_header: bool = False
+    has_row_header: bool = False
+
+
+class TableRowBlock(BaseModel):
+    cells: List[List[RichText]]
+
+
 class VideoFile(BaseModel):
     url: str
     expiry_time: str
@@ -103,6 +115,7 @@ class Block(BaseModel):
     type: str
     paragraph: Optional[ParagraphBlock] = None
     child_page: Optional[ChildPageBlock] = None
+    child_database: Optional[ChildDatabaseBlock] = None
     code: Optional[CodeBlock] = None
     heading_1: Optional[Heading1Block] = None
     heading_2: Optional[Heading2Block] = None
@@ -114,8 +127,9 @@ class Block(BaseModel):
     embed: Optional[EmbedBlock] = None
     bulleted_list_item: Optional[BulletedListItemBlock] = None
     video: Optional[VideoBlock] = None
+    table: Optional[TableBlock] = None
+    table_row: Optional[TableRowBlock] = None
     # Add other fields and types as necessary
-    dynamic_parents: Dict[str, ParentReference] = Field(default_factory=dict)
 
     class Config:
         extra = "allow"
@@ -139,48 +153,9 @@ def validate_block(block_model: BaseModel):
                 # Call the decorated function passing the whole object if the validation is successful
                 return func(block_data, *args, **kwargs)
             except Exception as e:
-                print(f"Error validating or parsing block data: {e}")
+                logger.error("Error validating or parsing block data: %s", e)
                 return None
 
         return wrapper
 
     return decorator
-
-
-def add_dynamic_parents(block_data: dict) -> dict:
-    """Processes a dictionary representing block data to extract and group all `c_parent_{i}`
-    entries into a separate dictionary within the block data under the key `dynamic_parents`.
-
-    This function iterates over each item in the provided dictionary, searching for keys that start with
-    `c_parent_`. Each matching item is added to a new dictionary, `dynamic_parents`, which is then added
-    back into the original block data under its own key. This is useful for handling blocks with an
-    arbitrary number of parent references dynamically in the data structure.
-
-    Parameters:
-    - block_data (dict): The original dictionary of block data, potentially containing various `c_parent_{i}` keys.
-
-    Returns:
-    - dict: The modified dictionary with `c_parent_{i}` data grouped under a `dynamic_parents` key.
-
-    Example:
-    ```
-    original_data = {
-        "id": "some_id",
-        "type": "some_type",
-        "c_parent_1": {"block_id": "parent1_id", "type": "parent1_type"},
-        "c_parent_2": {"block_id": "parent2_id", "type": "parent2_type"}
-    }
-    modified_data = add_dynamic_parents(original_data)
-    print(modified_data["dynamic_parents"])
-    # Output: {
-    #   "c_parent_1": {"block_id": "parent1_id", "type": "parent1_type"},
-    #   "c_parent_2": {"block_id": "parent2_id", "type": "parent2_type"}
-    # }
-    ```
-    """
-    dynamic_parents = {}
-    for key, value in block_data.items():
-        if key.startswith("c_parent_"):
-            dynamic_parents[key] = value
-    block_data["dynamic_parents"] = dynamic_parents
-    return block_data
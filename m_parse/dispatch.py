@@ -1,6 +1,12 @@
-from m_aux.pretty_print import pretty_print
-from m_parse.block_models import Block, add_dynamic_parents
+import logging
+import time
+
+from m_aux import metrics
+from m_parse.block_models import Block
 from m_parse.markdown_processing import *
+from m_parse.render_cache import render_cache
+
+logger = logging.getLogger(__name__)
 
 
 def dispatch_block_parsing(block_data: dict):
@@ -12,6 +18,9 @@ def dispatch_block_parsing(block_data: dict):
     which must be named following the pattern 'parse_{block_type}'. For example, a block type of
     'paragraph' expects a parsing function named 'parse_paragraph'.
 
+    When the render cache is enabled, the processed blocks of an unchanged block are returned
+    from the cache before any validation or parsing.
+
     The function first validates the input `block_data` using the Pydantic `Block` model, ensuring
     that the data structure adheres to expected schema. It then constructs the name of the parsing
     function based on the block type and attempts to retrieve this function from the global namespace.
@@ -24,12 +33,12 @@ def dispatch_block_parsing(block_data: dict):
       'child_page').
 
     Returns:
-    - None: The function does not return any value. Instead, it directly invokes the relevant parsing
-      functions which are responsible for handling the parsed data.
+    - The processed block, or list of processed blocks, returned by the parsing function. None if
+      the block could not be parsed.
 
     Raises:
     - Exception: If there is an issue with validating the block data against the Pydantic model or
-      if the expected parsing function does not exist or fails, an error message is printed to the console.
+      if the expected parsing function does not exist or fails, an error is logged.
 
     Note:
     - It is crucial to maintain a consistent naming convention between block types and parsing functions
@@ -37,23 +46,43 @@ def dispatch_block_parsing(block_data: dict):
       by a corresponding Pydantic model field in the `Block` model and a parsing function following the
       naming convention.
     """
+    block_type = block_data.get("type")
+    metrics.inc("blocks_parsed_total", type=block_type)
+    start = time.perf_counter()
+    cache_key = None
     try:
-        validated_block = Block.parse_obj(add_dynamic_parents(block_data))
+        if render_cache.enabled:
+            cache_key = render_cache.get_key(block_data)
+            cached_blocks = render_cache.get(cache_key)
+            if cached_blocks is not None:
+                return cached_blocks
+
+        validated_block = Block.parse_obj(block_data)
         parse_func_name = f"parse_{validated_block.type}"
         parse_func = globals().get(parse_func_name)
 
         if parse_func and getattr(validated_block, validated_block.type):
-            return parse_func(validated_block)
+            result = parse_func(validated_block)
+            if cache_key is not None:
+                render_cache.put(cache_key, result)
+            return result
         else:
-            print(f"Unsupported block type or missing data for type: {validated_block.type}")
+            logger.warning(
+                "Unsupported block type or missing data for type: %s", validated_block.type
+            )
     except Exception as e:
-        print(f"Error validating or parsing block data: {e}")
+        logger.error("Error validating or parsing block data: %s", e)
+    finally:
+        metrics.observe("parse_duration_seconds", time.perf_counter() - start, type=block_type)
 
 
 def dispatch_blocks_parsing(blocks_data: list):
     """Dispatches the parsing of a list of blocks and aggregates the results, handling both single
     blocks and lists of blocks as return values from parsing functions.
 
+    The raw API payloads are released as soon as their block is parsed: `blocks_data` is emptied,
+    only the compact processed blocks are kept.
+
     Parameters:
     - blocks_data (list): A list of block data dictionaries to be parsed.
 
@@ -63,8 +92,11 @@ def dispatch_blocks_parsing(blocks_data: list):
       return a single block or a list of blocks.
     """
     processed_blocks = []
-    for block_data in blocks_data:
+    for index, block_data in enumerate(blocks_data):
+        # Drop the reference held by the list, the raw block is freed once parsed
+        blocks_data[index] = None
         result = dispatch_block_parsing(block_data)
+        del block_data
 
         # Check if the parsing function returned a list of blocks or a single block
         # and append accordingly
@@ -73,4 +105,5 @@ def dispatch_blocks_parsing(blocks_data: list):
         elif result is not None:
             processed_blocks.append(result)
 
+    blocks_data.clear()
     return processed_blocks
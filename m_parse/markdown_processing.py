@@ -4,6 +4,7 @@ from m_parse.block_models import (
     Block,
     BookmarkBlock,
     BulletedListItemBlock,
+    ChildDatabaseBlock,
     ChildPageBlock,
     CodeBlock,
     EmbedBlock,
@@ -14,20 +15,26 @@ from m_parse.block_models import (
     LinkToPageBlock,
     ParagraphBlock,
     QuoteBlock,
+    TableBlock,
+    TableRowBlock,
     VideoBlock,
     validate_block,
 )
 from m_parse.markdown_processing_helpers import (
     markdown_bullet,
     markdown_code_block,
-    markdown_convert_paragraph_styles,
     markdown_headings,
     markdown_image_or_video,
     markdown_link,
     markdown_note_with_heading,
     markdown_table,
+    markdown_table_row,
+    markdown_table_separator,
 )
+from m_parse.processed_block import ProcessedBlock
+from m_parse.rich_text import render_rich_text
 from m_search.notion_pages import fetch_page_details
+from m_search.tree_index import tree_index
 
 ##################################################
 #                                                #
@@ -39,9 +46,8 @@ from m_search.notion_pages import fetch_page_details
 def calculate_path_on_hierarchy(block: Block) -> str:
     """Calculates the path for a given block based on its hierarchy of parent pages.
 
-    This function iterates through the `dynamic_parents` dictionary of a block, filtering for parents
-    that are of type 'child_page'. The resulting path is constructed by concatenating these filtered
-    parents' identifiers in order, separated by slashes ('/').
+    The path is made of the normalized IDs of the parent pages of the block, separated by slashes
+    ('/'). It is computed once by the tree index when the crawler registers the block.
 
     Parameters:
     - block (Block): The block object for which to calculate the hierarchy path.
@@ -49,25 +55,7 @@ def calculate_path_on_hierarchy(block: Block) -> str:
     Returns:
     - str: The calculated path, constructed from the block's parent pages.
     """
-    # Ensure dynamic_parents exists and is a dictionary; otherwise, default to an empty dict
-    dynamic_parents = getattr(block, "dynamic_parents", {})
-
-    # Filter for parents that are of type 'child_page' and collect their block_ids
-    page_parents = [
-        normalize_string(value.block_id)
-        for key, value in dynamic_parents.items()
-        if value.type == "child_page"
-    ]
-
-    # Construct the path from filtered parent pages
-    path = "/".join(page_parents)
-
-    return path
-
-
-def get_items_in_hierarchy(dynamic_parents: dict) -> int:
-    """Fetches the number of items in the block hierarchy."""
-    return sum(1 for key in dynamic_parents if key.startswith("c_parent_"))
+    return tree_index.page_path(block.id)
 
 
 def get_page_changelog(page_details: dict) -> str:
@@ -110,18 +98,26 @@ def get_page_changelog(page_details: dict) -> str:
     return markdown_table(headers, rows)
 
 
-def parsing_block_return(block_id: str, md: str, item_type: str, path: str) -> dict:
-    """Returns a dictionary with the block id and markdown content.
+def notion_page_url(page_id: str) -> str:
+    """Builds the Notion URL of a page, rewritten to the exported file by the link index."""
+    return f"https://www.notion.so/{normalize_string(page_id)}"
+
+
+def parsing_block_return(
+    block_id: str, md: str, item_type: str, path: str, text: str = None
+) -> ProcessedBlock:
+    """Returns the processed block with the block id and markdown content.
 
     Parameters:
     - block_id (str): The ID of the block. Normalized for future comparisons.
     - md (str): The markdown content generated for the block.
     - path (str): The calculated path for the block.
+    - text (str, optional): The plain text of the block, used to build the search index.
 
     Returns:
-    - dict: A dictionary containing the block ID and markdown content.
+    - ProcessedBlock: The processed block, containing the block ID and markdown content.
     """
-    return {"id": normalize_string(block_id), "md": md, "type": item_type, "path": path}
+    return ProcessedBlock(normalize_string(block_id), md, item_type, path, text=text or None)
 
 
 ##################################################
@@ -134,22 +130,15 @@ def parsing_block_return(block_id: str, md: str, item_type: str, path: str) -> d
 @validate_block(ParagraphBlock)
 def parse_paragraph(block: ParagraphBlock) -> str:
     """Parses a paragraph block to Markdown, considering text styles."""
-    # Initialize an empty list to hold Markdown-converted rich texts
-    markdown_parts = []
-
-    # Convert each rich text to Markdown and add it to the list
-    for rich_text in block.paragraph.rich_text:
-        markdown_parts.append(
-            markdown_convert_paragraph_styles(
-                rich_text.text["content"], rich_text.annotations, rich_text.href
-            )
-        )
-
-    # Join all parts into a single Markdown string
-    markdown_paragraph = " ".join(markdown_parts)
+    # Convert the rich texts to Markdown, joined by spaces
+    markdown_paragraph = render_rich_text(block.paragraph.rich_text)
 
     return parsing_block_return(
-        block.id, markdown_paragraph, block.type, calculate_path_on_hierarchy(block)
+        block.id,
+        markdown_paragraph,
+        block.type,
+        calculate_path_on_hierarchy(block),
+        "".join(rich_text.plain_text for rich_text in block.paragraph.rich_text),
     )
 
 
@@ -157,22 +146,19 @@ def parse_paragraph(block: ParagraphBlock) -> str:
 def parse_bulleted_list_item(block: Block) -> dict:
     """Parses a bulleted list item block into Markdown format, considering indentation and
     styles."""
-    bullet_items = []
     # Get the path hierarchy and calculate the indentation level
     # For this, it "removes" from the calculation those parts of hierarchy that are pages (do not count for indentation)
     path_hierarchy = calculate_path_on_hierarchy(block)
-    count_parents = get_items_in_hierarchy(block.dynamic_parents)
-    indent_level = count_parents - len(path_hierarchy.split("/"))
-    for rich_text_item in block.bulleted_list_item.rich_text:
-        bullet_items.append(
-            markdown_convert_paragraph_styles(
-                rich_text_item.plain_text, rich_text_item.annotations, rich_text_item.href
-            )
-        )
+    # An empty page path has always counted as one level
+    indent_level = tree_index.depth(block.id) - max(tree_index.page_depth(block.id), 1)
+    bullet_text = render_rich_text(block.bulleted_list_item.rich_text)
 
-    md = markdown_bullet(" ".join(bullet_items), indent=indent_level)
+    md = markdown_bullet(bullet_text, indent=indent_level)
+    text = "".join(
+        rich_text_item.plain_text for rich_text_item in block.bulleted_list_item.rich_text
+    )
 
-    return parsing_block_return(block.id, md, block.type, path_hierarchy)
+    return parsing_block_return(block.id, md, block.type, path_hierarchy, text)
 
 
 @validate_block(Heading1Block)
@@ -185,6 +171,7 @@ def parse_heading_1(block: Heading1Block):
         markdown_headings(heading_text, 2),
         block.type,
         calculate_path_on_hierarchy(block),
+        heading_text,
     )
 
 
@@ -198,6 +185,7 @@ def parse_heading_2(block: Heading2Block):
         markdown_headings(heading_text, 3),
         block.type,
         calculate_path_on_hierarchy(block),
+        heading_text,
     )
 
 
@@ -209,6 +197,7 @@ def parse_heading_3(block: Heading3Block):
         markdown_headings(heading_text, 4),
         block.type,
         calculate_path_on_hierarchy(block),
+        heading_text,
     )
 
 
@@ -218,12 +207,13 @@ def parse_code(block: CodeBlock):
         caption = block.code.caption[0].text["content"]
     except IndexError:
         caption = ""
+    code = block.code.rich_text[0].text["content"]
     md = markdown_code_block(
-        code=block.code.rich_text[0].text["content"],
+        code=code,
         caption=caption,
         language=block.code.language,
     )
-    return parsing_block_return(block.id, md, block.type, calculate_path_on_hierarchy(block))
+    return parsing_block_return(block.id, md, block.type, calculate_path_on_hierarchy(block), code)
 
 
 @validate_block(QuoteBlock)
@@ -231,21 +221,18 @@ def parse_quote(block: Block) -> str:
     """Parses a quote block into a Markdown formatted note with a specific heading."""
     heading = "NOTE"
 
-    # Initialize an empty string to build the note content
-    note_content = ""
-
-    # Iterate through each rich text segment in the quote
-    for rich_text in block.quote.rich_text:
-        # Append plain text to the note_content string
-        note_content += markdown_convert_paragraph_styles(
-            rich_text.plain_text, rich_text.annotations, rich_text.href
-        )
+    # Convert the rich texts to Markdown, joined without separator (same style runs are merged)
+    note_content = render_rich_text(block.quote.rich_text, separator="")
 
     # Use the markdown_note_with_heading helper to format the entire quote
     markdown_note = markdown_note_with_heading(note_content.strip(), heading)
 
     return parsing_block_return(
-        block.id, markdown_note, block.type, calculate_path_on_hierarchy(block)
+        block.id,
+        markdown_note,
+        block.type,
+        calculate_path_on_hierarchy(block),
+        "".join(rich_text.plain_text for rich_text in block.quote.rich_text),
     )
 
 
@@ -275,10 +262,15 @@ def parse_child_page(block: ChildPageBlock):
         else path_hierarchy
     )
     page_block = parsing_block_return(
-        block.id, markdown_headings(block.child_page.title), block.type, path_hierarchy
+        block.id,
+        markdown_headings(block.child_page.title),
+        block.type,
+        path_hierarchy,
+        block.child_page.title,
     )
-    # Including name of the page for further processing
+    # Including name and title of the page for further processing
     page_block["name"] = normalize_string(block.child_page.title)
+    page_block["title"] = block.child_page.title
     # Leaving trace of which is the root page for the execution for further processing
     if normalize_string(block.id) == block.root_block_id:
         page_block["root"] = True
@@ -289,9 +281,59 @@ def parse_child_page(block: ChildPageBlock):
             f"{block.id}-changelog", changelog, "changelog", changelog_path_hierarchy
         )
     )
+    # The rows of a database are listed in the index table of the database page
+    database_row = getattr(block, "database_row", None)
+    if database_row:
+        # The page of a row edited before an incremental run is kept as it was exported
+        if database_row.get("kept"):
+            page_block["kept"] = True
+        page_processed_blocks.append(
+            parsing_block_return(
+                f"{block.id}-index",
+                markdown_table_row(
+                    [
+                        markdown_link(block.child_page.title, notion_page_url(block.id)),
+                        database_row.get("last_edited_time", ""),
+                    ]
+                ),
+                "database_index_row",
+                path_hierarchy,
+                block.child_page.title,
+            )
+        )
     return page_processed_blocks
 
 
+@validate_block(ChildDatabaseBlock)
+def parse_child_database(block: Block):
+    """Parses a database block into a page holding the index table of the database rows.
+
+    The rows themselves are parsed as pages of the database (see `parse_child_page`), each one
+    adding its line to the index table.
+
+    Parameters:
+    - block (Block): The block to parse.
+
+    Returns:
+    - list: The processed blocks of the database page and of the header of its index table.
+    """
+    title = block.child_database.title or "Untitled database"
+    path_hierarchy = calculate_path_on_hierarchy(block)
+    database_id = normalize_string(block.id)
+    database_block = parsing_block_return(
+        block.id, markdown_headings(title), "child_page", path_hierarchy, title
+    )
+    database_block["name"] = normalize_string(title)
+    database_block["title"] = title
+    index_header = parsing_block_return(
+        f"{block.id}-index",
+        markdown_table(["Page", "Last edited"], []),
+        "database_index_header",
+        f"{path_hierarchy}/{database_id}" if path_hierarchy else database_id,
+    )
+    return [database_block, index_header]
+
+
 @validate_block(ImageBlock)
 def parse_image(block: ImageBlock) -> str:
     """Parses an image block into a Markdown image link."""
@@ -348,7 +390,7 @@ def parse_bookmark(block: BookmarkBlock) -> dict:
     markdown_bookmark = markdown_link(caption, bookmark_url)
 
     return parsing_block_return(
-        block.id, markdown_bookmark, block.type, calculate_path_on_hierarchy(block)
+        block.id, markdown_bookmark, block.type, calculate_path_on_hierarchy(block), caption
     )
 
 
@@ -367,7 +409,7 @@ def parse_embed(block: Block) -> dict:
     markdown_embed = markdown_link(caption_text, embed_url)
 
     return parsing_block_return(
-        block.id, markdown_embed, block.type, calculate_path_on_hierarchy(block)
+        block.id, markdown_embed, block.type, calculate_path_on_hierarchy(block), caption_text
     )
 
 
@@ -386,9 +428,54 @@ def parse_link_to_page(block: LinkToPageBlock):
     )
     md = markdown_link(page_name, url)
     return_block = parsing_block_return(
-        block.id, md, block.type, calculate_path_on_hierarchy(block)
+        block.id, md, block.type, calculate_path_on_hierarchy(block), page_name
     )
     return_block["external_url"] = url
     return_block["reference_id"] = url.split("-")[-1]
     return_block["reference_name"] = page_name
     return return_block
+
+
+@validate_block(TableBlock)
+def parse_table(block: Block):
+    """Parses a table block into the header of a Markdown table.
+
+    The rows are parsed on their own (see `parse_table_row`), one line each, so a table of any size
+    is rendered without holding its rows. Cells are not padded to a common width: Markdown does
+    not need it, and it would take a pass over all the rows first.
+
+    Returns:
+    - ProcessedBlock: An empty header, or no block (an empty list) when the first row is the header
+      of the table.
+    """
+    if block.table.has_column_header:
+        return []
+    return parsing_block_return(
+        block.id,
+        markdown_table([" "] * block.table.table_width, []),
+        block.type,
+        calculate_path_on_hierarchy(block),
+    )
+
+
+@validate_block(TableRowBlock)
+def parse_table_row(block: Block):
+    """Parses a table row block into a line of the Markdown table above it.
+
+    The first row of a table with a column header is marked by the crawler (`table_header`): it is
+    rendered as the header of the Markdown table.
+    """
+    # Line breaks would end the table: they are kept as HTML breaks
+    cells = [
+        render_rich_text(cell, separator="").replace("\n", "<br>")
+        for cell in block.table_row.cells
+    ]
+    md = markdown_table_row(cells)
+    row_type = block.type
+    if getattr(block, "table_header", False):
+        md = f"{md}\n{markdown_table_separator(len(cells))}"
+        row_type = "table_header_row"
+    text = " ".join(
+        "".join(rich_text.plain_text for rich_text in cell) for cell in block.table_row.cells
+    )
+    return parsing_block_return(block.id, md, row_type, calculate_path_on_hierarchy(block), text)
@@ -2,8 +2,12 @@
 
 Only those repeatedly used in the markdown processing functions are included here.
 """
+import re
+import unicodedata
 from typing import List
 
+from m_parse.rich_text import get_wrappers, render_run
+
 
 def markdown_headings(title: str, level: int = 1) -> str:
     """Generates a markdown heading with the specified level.
@@ -27,6 +31,20 @@ def markdown_headings(title: str, level: int = 1) -> str:
     return heading
 
 
+def markdown_heading_anchor(title: str) -> str:
+    """Generates the anchor MkDocs assigns to a heading (default slugify of the toc extension).
+
+    Parameters:
+    - title (str): The title text of the heading.
+
+    Returns:
+    - str: The anchor of the heading, without the leading '#'.
+    """
+    value = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("ascii")
+    value = re.sub(r"[^\w\s-]", "", value).strip().lower()
+    return re.sub(r"[-\s]+", "-", value)
+
+
 def markdown_table(headers: List[str], rows: List[List[str]]) -> str:
     """Generates a markdown table from headers and row values.
 
@@ -40,7 +58,7 @@ def markdown_table(headers: List[str], rows: List[List[str]]) -> str:
     # Generate the header row
     header_row = "| " + " | ".join(headers) + " |"
     # Generate the separator row
-    separator_row = "| " + " | ".join(["---"] * len(headers)) + " |"
+    separator_row = markdown_table_separator(len(headers))
     # Generate each data row
     data_rows = ["| " + " | ".join(row) + " |" for row in rows]
 
@@ -48,6 +66,30 @@ def markdown_table(headers: List[str], rows: List[List[str]]) -> str:
     return "\n".join([header_row, separator_row] + data_rows)
 
 
+def markdown_table_separator(columns: int) -> str:
+    """Generates the row separating the header of a markdown table from its rows.
+
+    Parameters:
+    - columns (int): The number of columns of the table.
+
+    Returns:
+    - str: The markdown-formatted separator row.
+    """
+    return "| " + " | ".join(["---"] * columns) + " |"
+
+
+def markdown_table_row(values: List[str]) -> str:
+    """Generates a single markdown table row, e.g. to append rows to a table one at a time.
+
+    Parameters:
+    - values (List[str]): The values of the row. Pipes are escaped.
+
+    Returns:
+    - str: The markdown-formatted row.
+    """
+    return "| " + " | ".join(value.replace("|", "\\|") for value in values) + " |"
+
+
 def markdown_link(title: str, url: str) -> str:
     """Generates a markdown link with the specified title and URL.
 
@@ -113,34 +155,14 @@ def markdown_convert_paragraph_styles(content: str, annotations: dict, href: str
     Parameters:
     - content (str): The text content to style.
     - annotations (dict): A dictionary containing style annotations.
+    - href (str): The link of the content, if any.
 
     Returns:
     - str: The content styled with Markdown, preserving leading/trailing spaces.
+
+    Use `m_parse.rich_text.render_rich_text` to render all the rich texts of a block at once.
     """
-    # Detect and store leading and trailing spaces
-    leading_spaces = len(content) - len(content.lstrip())
-    trailing_spaces = len(content) - len(content.rstrip())
-
-    # Trim the content before applying styles
-    trimmed_content = content.strip()
-
-    # Apply Markdown styles based on annotations
-    if annotations.get("bold", False):
-        trimmed_content = f"**{trimmed_content}**"
-    if annotations.get("italic", False):
-        trimmed_content = f"*{trimmed_content}*"
-    if annotations.get("strikethrough", False):
-        trimmed_content = f"~~{trimmed_content}~~"
-    if annotations.get("underline", False):
-        # Markdown doesn't officially support underline, so it's omitted or can use HTML
-        trimmed_content = f"<u>{trimmed_content}</u>"
-    if annotations.get("code", False):
-        trimmed_content = f"`{trimmed_content}`"
-
-    trimmed_content_with_href = f"[{trimmed_content}]({href})"
-    # Re-add leading and trailing spaces
-    styled_content = f"{' ' * leading_spaces}{trimmed_content_with_href if href else trimmed_content}{' ' * trailing_spaces}"
-    return styled_content
+    return render_run(content, get_wrappers(annotations), href)
 
 
 def markdown_note_with_heading(content: str, heading: str) -> str:
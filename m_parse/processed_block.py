@@ -0,0 +1,98 @@
+"""Compact record of a processed block, shared by the parsing and writing stages."""
+
+import sys
+
+
+class ProcessedBlock:
+    """A processed block: its Markdown and the data needed to write it.
+
+    Blocks are kept in memory from the parsing stage until the end of the export, so they are slotted
+    records instead of dicts, and their ID, path and type are interned: all the blocks of a page share
+    the same path string, and there are only a handful of types.
+
+    The record keeps the dict interface the writing stage was built on (`block["md"]`,
+    `block.get("root")`, `"text" in block`...). Unset fields are missing, like absent dict keys.
+    """
+
+    FIELDS = (
+        "id",
+        "md",
+        "type",
+        "path",
+        "text",
+        "name",
+        "title",
+        "root",
+        "kept",
+        "external_url",
+        "caption",
+        "reference_id",
+        "reference_name",
+        "named_path",
+    )
+    INTERNED_FIELDS = ("id", "type", "path")
+
+    __slots__ = FIELDS
+
+    def __init__(self, block_id, md, block_type, path, **fields):
+        self.id = sys.intern(block_id)
+        self.md = md
+        self.type = sys.intern(block_type)
+        self.path = sys.intern(path)
+        for field in self.FIELDS[4:]:
+            setattr(self, field, None)
+        for field, value in fields.items():
+            self[field] = value
+
+    def __getitem__(self, field):
+        value = self.get(field)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __setitem__(self, field, value):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        if field in self.INTERNED_FIELDS and value is not None:
+            value = sys.intern(value)
+        setattr(self, field, value)
+
+    def __contains__(self, field):
+        return self.get(field) is not None
+
+    def __repr__(self):
+        return f"ProcessedBlock({self.to_dict()!r})"
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None) if field in self.FIELDS else None
+        return default if value is None else value
+
+    @classmethod
+    def from_dict(cls, fields):
+        """Builds a block from the fields returned by `to_dict`."""
+        fields = dict(fields)
+        return cls(
+            fields.pop("id"), fields.pop("md"), fields.pop("type"), fields.pop("path"), **fields
+        )
+
+    def copy(self):
+        """Returns a shallow copy of the block."""
+        return ProcessedBlock(**self._constructor_fields())
+
+    def _constructor_fields(self):
+        fields = self.to_dict()
+        return {
+            "block_id": fields.pop("id"),
+            "md": fields.pop("md"),
+            "block_type": fields.pop("type"),
+            "path": fields.pop("path"),
+            **fields,
+        }
+
+    def to_dict(self):
+        """Returns the set fields of the block as a dict."""
+        return {
+            field: getattr(self, field)
+            for field in self.FIELDS
+            if getattr(self, field) is not None
+        }
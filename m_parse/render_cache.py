@@ -0,0 +1,181 @@
+"""Persistent cache of the processed blocks, to skip parsing the blocks that did not change.
+
+Most blocks are identical from one run to the next. The processed blocks a raw block was parsed
+into are stored in a SQLite database, keyed by a hash of everything the parsing depends on:
+
+- The raw block, as returned by the Notion API (with the fields added by the crawler).
+- The renderer version: `RENDERER_VERSION` and a hash of the sources of the parsing modules, so
+  changing the rendering invalidates the whole cache.
+- The position of the block in the tree (page path and depths), which the paths and the list
+  indentation are derived from.
+- The details of the pages the block reads (changelog of a page, title of a linked page).
+
+The lookup happens before the Pydantic validation, so a hit costs a JSON serialization and a hash.
+The cache is bounded: the least recently used entries are evicted when it is closed.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from m_aux import metrics
+from m_aux.outputs import normalize_string
+from m_parse.processed_block import ProcessedBlock
+from m_search.notion_pages import page_details_cache
+from m_search.tree_index import tree_index
+
+# Bump when the rendering changes in a way the sources hash does not catch (e.g. a dependency)
+RENDERER_VERSION = 1
+DEFAULT_RENDER_CACHE_MAX_ENTRIES = 200000
+
+logger = logging.getLogger(__name__)
+
+
+def get_renderer_hash():
+    """Hashes the renderer version and the sources of the parsing modules.
+
+    Returns:
+    - str: The hex digest identifying the renderer.
+    """
+    renderer_hash = hashlib.sha256(f"renderer-{RENDERER_VERSION}".encode("utf-8"))
+    for source_path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.py"))):
+        with open(source_path, "rb") as source_file:
+            renderer_hash.update(source_file.read())
+    return renderer_hash.hexdigest()
+
+
+def get_read_page_ids(block_data):
+    """Lists the pages whose details are read when parsing a block."""
+    if block_data.get("type") == "child_page":
+        return [block_data["id"]]
+    if block_data.get("type") == "link_to_page":
+        return [block_data["link_to_page"].get("page_id")]
+    return []
+
+
+class RenderCache:
+    """SQLite cache of the processed blocks by render key, see the module documentation."""
+
+    def __init__(self):
+        self.connection = None
+
+    def open(self, cache_path, max_entries=DEFAULT_RENDER_CACHE_MAX_ENTRIES):
+        """Opens (or creates) the cache database.
+
+        Parameters:
+        - cache_path (str): The path of the SQLite database.
+        - max_entries (int): The number of entries kept when the cache is closed.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS rendered_blocks "
+            "(key TEXT PRIMARY KEY, blocks TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.max_entries = max_entries
+        self.renderer_hash = get_renderer_hash()
+        self.used_keys = []
+        self.new_entries = []
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.connection is not None
+
+    def get_key(self, block_data):
+        """Calculates the render key of a raw block.
+
+        Parameters:
+        - block_data (dict): The raw block.
+
+        Returns:
+        - str: The hex digest of everything the parsing of the block depends on.
+        """
+        block_id = block_data.get("id")
+        key_data = {
+            "renderer": self.renderer_hash,
+            "block": block_data,
+            "page_path": tree_index.page_path(block_id),
+            "depth": tree_index.depth(block_id),
+            "page_depth": tree_index.page_depth(block_id),
+            "pages": [
+                page_details_cache.get(normalize_string(page_id))
+                for page_id in get_read_page_ids(block_data)
+                if page_id
+            ],
+        }
+        key_json = json.dumps(key_data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(key_json.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Looks up the processed blocks of a render key.
+
+        Returns:
+        - list: New processed blocks, or None on a miss.
+        """
+        row = self.connection.execute(
+            "SELECT blocks FROM rendered_blocks WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            metrics.inc("render_cache_lookups_total", result="miss")
+            return None
+        self.hits += 1
+        metrics.inc("render_cache_lookups_total", result="hit")
+        self.used_keys.append(key)
+        return [ProcessedBlock.from_dict(fields) for fields in json.loads(row[0])]
+
+    def put(self, key, result):
+        """Stores the processed block(s) a block was parsed into. Failed parsings are not stored.
+
+        Parameters:
+        - key (str): The render key of the raw block.
+        - result: The processed block, or list of processed blocks, returned by the parsing.
+        """
+        if result is None:
+            return
+        processed_blocks = result if isinstance(result, list) else [result]
+        blocks_json = json.dumps(
+            [processed_block.to_dict() for processed_block in processed_blocks],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        self.new_entries.append((key, blocks_json))
+
+    def close(self):
+        """Saves the new entries and the last use of the hits, then evicts the oldest entries."""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO rendered_blocks (key, blocks, last_used) VALUES (?, ?, ?)",
+                [(key, blocks_json, now) for key, blocks_json in self.new_entries],
+            )
+            self.connection.executemany(
+                "UPDATE rendered_blocks SET last_used = ? WHERE key = ?",
+                [(now, key) for key in self.used_keys],
+            )
+            evicted = self.connection.execute(
+                "DELETE FROM rendered_blocks WHERE key IN (SELECT key FROM rendered_blocks "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        self.connection.close()
+        self.connection = None
+        metrics.inc("render_cache_evictions_total", evicted)
+        logger.info(
+            "Render cache: %d hits, %d misses, %d entries evicted.",
+            self.hits,
+            self.misses,
+            evicted,
+        )
+
+
+# Shared render cache, disabled until opened
+render_cache = RenderCache()
@@ -0,0 +1,132 @@
+"""Rendering of the rich texts of the blocks to Markdown.
+
+A rich text is a list of runs: a text with its annotations (bold, italic...) and an optional link.
+Every combination of the rendered annotations is mapped to its Markdown wrappers once, when the
+module is loaded, so rendering a run is a table lookup and a concatenation:
+
+- The styles are nested in a fixed order: bold innermost, then italic, strikethrough, underline
+  (as HTML, Markdown has none) and code outermost.
+- The spaces around the text are kept outside of the styling, Markdown does not close a style
+  after a space. Every leading or trailing whitespace character is rendered as a space.
+- The link wraps the styled text.
+
+The runs of a rich text are rendered in one pass. When they are joined without a separator,
+adjacent runs with the same style and link are merged first: "**a****b**" is not valid Markdown,
+"**ab**" is. Runs are not merged across whitespace, so the spaces stay outside of the styling.
+"""
+
+from itertools import product
+from operator import itemgetter
+
+# Annotations rendered to Markdown and their wrappers, from the innermost to the outermost
+ANNOTATION_WRAPPERS = [
+    ("bold", "**", "**"),
+    ("italic", "*", "*"),
+    ("strikethrough", "~~", "~~"),
+    ("underline", "<u>", "</u>"),
+    ("code", "`", "`"),
+]
+ANNOTATION_NAMES = [name for name, _, _ in ANNOTATION_WRAPPERS]
+get_annotation_values = itemgetter(*ANNOTATION_NAMES)
+
+
+def build_style_wrappers():
+    """Maps every combination of the rendered annotations to its (prefix, suffix) wrappers.
+
+    Returns:
+    - dict: The wrappers by style, a tuple of booleans in the order of `ANNOTATION_WRAPPERS`.
+    """
+    style_wrappers = {}
+    for style in product([False, True], repeat=len(ANNOTATION_WRAPPERS)):
+        prefix = suffix = ""
+        for enabled, (_, opening, closing) in zip(style, ANNOTATION_WRAPPERS):
+            if enabled:
+                prefix = opening + prefix
+                suffix = suffix + closing
+        style_wrappers[style] = (prefix, suffix)
+    return style_wrappers
+
+
+STYLE_WRAPPERS = build_style_wrappers()
+
+
+def get_wrappers(annotations):
+    """Returns the (prefix, suffix) Markdown wrappers of the annotations of a run.
+
+    The wrappers identify the style of the run: two runs have the same style if they have the same
+    wrappers.
+    """
+    try:
+        return STYLE_WRAPPERS[get_annotation_values(annotations)]
+    except (KeyError, TypeError):
+        # Missing or non boolean annotations
+        style = tuple(bool(annotations.get(name, False)) for name in ANNOTATION_NAMES)
+        return STYLE_WRAPPERS[style]
+
+
+def render_run(content, wrappers, href=None):
+    """Renders a run of rich text to Markdown.
+
+    Parameters:
+    - content (str): The text of the run.
+    - wrappers (tuple): The (prefix, suffix) wrappers of the style of the run, see `get_wrappers`.
+    - href (str, optional): The link of the run.
+
+    Returns:
+    - str: The styled (and linked) text, with its leading / trailing whitespace outside as spaces.
+    """
+    prefix, suffix = wrappers
+    text = content.strip()
+    if len(text) != len(content):
+        leading = " " * (len(content) - len(content.lstrip()))
+        trailing = " " * (len(content) - len(content.rstrip()))
+        if href:
+            return f"{leading}[{prefix}{text}{suffix}]({href}){trailing}"
+        return f"{leading}{prefix}{text}{suffix}{trailing}"
+    if href:
+        return f"[{prefix}{text}{suffix}]({href})"
+    return f"{prefix}{text}{suffix}"
+
+
+def render_rich_text(rich_texts, separator=" "):
+    """Renders the runs of a rich text to Markdown, in one pass.
+
+    Parameters:
+    - rich_texts (list): The runs of the rich text (`RichText`).
+    - separator (str): The string joining the rendered runs. Without separator, the adjacent runs
+      with the same style and link are merged, unless whitespace separates them.
+
+    Returns:
+    - str: The Markdown of the rich text.
+    """
+    if separator:
+        return separator.join(
+            [
+                render_run(
+                    rich_text.plain_text, get_wrappers(rich_text.annotations), rich_text.href
+                )
+                for rich_text in rich_texts
+            ]
+        )
+
+    rendered_runs = []
+    # The run being merged, rendered when the next run has another style
+    pending_content = pending_wrappers = pending_href = None
+    for rich_text in rich_texts:
+        content = rich_text.plain_text
+        href = rich_text.href
+        wrappers = get_wrappers(rich_text.annotations)
+        if pending_content is not None:
+            if (
+                wrappers == pending_wrappers
+                and href == pending_href
+                and not (pending_content and pending_content[-1].isspace())
+                and not (content and content[0].isspace())
+            ):
+                pending_content += content
+                continue
+            rendered_runs.append(render_run(pending_content, pending_wrappers, pending_href))
+        pending_content, pending_wrappers, pending_href = content, wrappers, href
+    if pending_content is not None:
+        rendered_runs.append(render_run(pending_content, pending_wrappers, pending_href))
+    return "".join(rendered_runs)
@@ -0,0 +1,114 @@
+"""Filters pruning the crawl to a part of the wiki.
+
+The filters are applied when the children of a block are listed, so the pruned subtrees are never
+requested. Pages are matched by ID or by title glob (case insensitive):
+
+- Exclude: the matching pages are skipped with their whole subtree.
+- Include: only the matching pages and their subtrees are exported. The pages leading to them are
+  crawled for their child pages only, without their content: their blocks with children (columns,
+  toggles...) are walked for the child pages they hold, but not exported.
+- Max depth: the pages deeper than this number of pages under the root page are skipped.
+- Sample: only the first pages found, in crawl order, are exported.
+
+The links to the pages that are not exported keep pointing to Notion.
+"""
+
+import fnmatch
+
+from m_aux.outputs import normalize_string
+
+PAGE_TYPES = ["child_page", "child_database"]
+
+
+def get_page_title(block):
+    """Returns the title of a page or database block, or an empty string."""
+    return (block.get(block.get("type")) or {}).get("title") or ""
+
+
+def matches_page(patterns, block):
+    """Checks if a page matches any of the ID or title glob patterns.
+
+    Parameters:
+    - patterns (list): The page IDs (with or without hyphens) and title globs.
+    - block (dict): The page block, as returned by the Notion API.
+
+    Returns:
+    - bool: True if the page matches a pattern.
+    """
+    block_id = normalize_string(block["id"])
+    title = get_page_title(block).lower()
+    return any(
+        normalize_string(pattern) == block_id or fnmatch.fnmatchcase(title, pattern.lower())
+        for pattern in patterns
+    )
+
+
+class CrawlFilter:
+    """Decides which blocks are crawled, see the module documentation."""
+
+    def __init__(self, include=None, exclude=None, max_depth=None, sample=None):
+        self.include = include or []
+        self.exclude = exclude or []
+        self.max_depth = max_depth
+        self.sample = sample
+        self.pages = 0
+        self.skipped_pages = 0
+
+    def count_page(self, block):
+        """Counts a crawled page, for the sampling."""
+        if block.get("type") in PAGE_TYPES:
+            self.pages += 1
+
+    def is_included(self, block, parent_included):
+        """Checks if the content of a block is exported.
+
+        Parameters:
+        - block (dict): The block, as returned by the Notion API.
+        - parent_included (bool): Whether the content of its parent is exported.
+
+        Returns:
+        - bool: True if the block is in an included subtree.
+        """
+        if parent_included or not self.include:
+            return True
+        return block.get("type") in PAGE_TYPES and matches_page(self.include, block)
+
+    def allows(self, block, page_depth, parent_included):
+        """Checks if a listed block is crawled.
+
+        Parameters:
+        - block (dict): The block, as returned by the Notion API.
+        - page_depth (int): The number of pages between the root page and the block, itself included.
+        - parent_included (bool): Whether the content of its parent is exported.
+
+        Returns:
+        - bool: False if the block and its subtree are skipped.
+        """
+        if block.get("type") not in PAGE_TYPES:
+            # The content of the pages leading to the included pages is not exported, but may hold
+            # child pages
+            return parent_included or block.get("has_children", False)
+        if matches_page(self.exclude, block) or (
+            self.max_depth is not None and page_depth > self.max_depth
+        ):
+            self.skipped_pages += 1
+            return False
+        return True
+
+    def is_sampled_out(self, block):
+        """Checks if a page comes after the sampled pages, right before crawling it.
+
+        Parameters:
+        - block (dict): The block, as returned by the Notion API.
+
+        Returns:
+        - bool: True if the sample is already complete and the block is a page.
+        """
+        if (
+            block.get("type") in PAGE_TYPES
+            and self.sample is not None
+            and self.pages >= self.sample
+        ):
+            self.skipped_pages += 1
+            return True
+        return False
@@ -0,0 +1,365 @@
+"""Planning of an export: estimates its size, API calls and duration from a sample of the tree.
+
+The tree is listed breadth first from the root page, the way the crawler lists it, until a budget
+of API calls is spent. The blocks are only listed (never retrieved one by one), so the sample
+reaches far more blocks than a crawl with the same number of calls.
+
+The listed blocks are counted exactly, with the API calls the crawler would make for them:
+
+- A block retrieval per block (the database rows come from the query instead).
+- A page details retrieval per page and per link to a page.
+- A children listing per 100 children, and a database query per 100 rows.
+
+The blocks with children that were not listed yet (the frontier) are extrapolated from the averages
+of the sample: number of children per listed block, share of children with children of their own,
+pages, media and calls per block. Every frontier block is expanded over `EXTRAPOLATED_LEVELS`
+levels. When the whole tree fits in the budget, the plan is exact.
+
+The media size is estimated from the size of a sample of the media files (ranged requests of
+their first byte, not Notion API calls), and the duration from the measured API latency, the wait time
+between the requests (NOTION_REQUEST_WAIT_TIME) and the average rate limit of the Notion API. The
+crawler waits before its listings, queries and page details retrievals, so these are counted apart.
+
+The plan models the default discovery (walking down from the root page) only.
+
+The costs are broken down by top level subtree (the pages right under the root page), to tell which
+parts of the wiki dominate the export.
+"""
+
+import logging
+import time
+from collections import deque
+
+import requests
+
+from m_aux import metrics
+from m_aux.outputs import normalize_string
+from m_aux.progress import MEDIA_TYPES, format_duration
+from m_config.notion_client import (
+    notion_client,
+    notion_request_wait_time,
+    wait_for_request_slot,
+)
+from m_search.crawl_filters import PAGE_TYPES, CrawlFilter, get_page_title
+from m_search.notion_blocks import get_synced_original_id
+from m_search.notion_databases import DATABASE_QUERY_PAGE_SIZE, row_to_page_block
+
+DEFAULT_PLAN_MAX_CALLS = 200
+# Media files whose size is requested to estimate the media size
+PLAN_MEDIA_SAMPLE = 20
+PLAN_TOP_SUBTREES = 10
+# Average number of requests per second allowed by the Notion API
+NOTION_RATE_LIMIT = 3
+# Levels of the tree extrapolated under every block with children the sample did not list
+EXTRAPOLATED_LEVELS = 5
+ROOT_CONTENT = "(root page content)"
+COUNTS = ["blocks", "pages", "media", "calls", "listings", "page_details", "frontier"]
+
+logger = logging.getLogger(__name__)
+
+
+def get_media_url(block):
+    """Returns the URL of the file of an image or video block, or None."""
+    media = block.get(block.get("type")) or {}
+    return (media.get("file") or media.get("external") or {}).get("url")
+
+
+def is_container(block):
+    """Checks if the crawler lists the children (or queries the rows) of a block."""
+    return block.get("has_children", False) or block.get("type") == "child_database"
+
+
+def get_media_size(url):
+    """Requests the size of a media file, without downloading it.
+
+    The Notion files are presigned S3 URLs, signed for GET requests only (HEAD requests are
+    denied): the first byte of the file is requested, and the response is closed without reading
+    its body.
+
+    Returns:
+    - int: The size of the file, from the `Content-Range` (or `Content-Length` when the range is
+      ignored) of the response, or None if unknown.
+    """
+    try:
+        with requests.get(
+            url, headers={"Range": "bytes=0-0"}, stream=True, allow_redirects=True, timeout=10
+        ) as response:
+            response.raise_for_status()
+            if response.status_code == 206:
+                return int(response.headers["Content-Range"].rsplit("/", 1)[1])
+            return int(response.headers["Content-Length"])
+    except (requests.RequestException, KeyError, IndexError, ValueError) as e:
+        logger.debug("Size of %s unknown: %s", url, e)
+        return None
+
+
+class CrawlPlanner:
+    """Samples the tree breadth first and estimates the export, see the module documentation."""
+
+    def __init__(self, max_calls=DEFAULT_PLAN_MAX_CALLS, since=None, crawl_filter=None):
+        self.max_calls = max_calls
+        self.since = since
+        self.crawl_filter = crawl_filter or CrawlFilter()
+        self.calls = 0
+        self.latency = 0.0
+        # Counts of the blocks under the root page, by top level subtree
+        self.subtrees = {}
+        # Sample averages: blocks listed, listing calls, and blocks with children among them
+        self.listed_blocks = 0
+        self.listed_containers = 0
+        self.children_containers = 0
+        self.media_urls = []
+        # Complete listings by block ID (original block ID for the synced blocks), to replay them
+        self.listings = {}
+        # Pages whose details the crawler fetched (once per page), by normalized ID
+        self.detailed_page_ids = set()
+
+    def has_budget(self):
+        return self.calls < self.max_calls
+
+    def call(self, endpoint, request, **kwargs):
+        """Makes an API call of the sample, throttled and timed."""
+        wait_for_request_slot()
+        start = time.perf_counter()
+        with metrics.api_call(endpoint):
+            response = request(**kwargs)
+        self.latency += time.perf_counter() - start
+        self.calls += 1
+        return response
+
+    def get_counts(self, subtree):
+        return self.subtrees.setdefault(subtree, dict.fromkeys(COUNTS, 0))
+
+    def count_block(self, block, subtree, retrieved=True):
+        """Counts a listed block and the calls the crawler makes for it (besides its listing).
+
+        Parameters:
+        - block (dict): The block, as returned by the Notion API.
+        - subtree (str): The top level subtree of the block.
+        - retrieved (bool): False for the blocks the crawler gets without fetching them: database
+          rows (from the query, with their page details) and replayed synced content.
+        """
+        counts = self.get_counts(subtree)
+        block_type = block.get("type")
+        counts["blocks"] += 1
+        counts["pages"] += block_type == "child_page"
+        counts["calls"] += retrieved
+        if block_type == "child_page":
+            page_id = block["id"]
+        else:
+            page_id = (block.get("link_to_page") or {}).get("page_id")
+        if page_id and normalize_string(page_id) not in self.detailed_page_ids:
+            self.detailed_page_ids.add(normalize_string(page_id))
+            counts["calls"] += retrieved
+            counts["page_details"] += retrieved
+        if block_type in MEDIA_TYPES:
+            counts["media"] += 1
+            url = get_media_url(block)
+            if url and len(self.media_urls) < PLAN_MEDIA_SAMPLE:
+                self.media_urls.append(url)
+
+    def list_children(self, block, subtree):
+        """Lists the children of a block, and the rows of a database, within the budget.
+
+        Returns:
+        - tuple: The children (the rows as page blocks), and whether the listing was cut short.
+        """
+        counts = self.get_counts(subtree)
+        self.listed_containers += 1
+        listings = []
+        if block.get("has_children", False):
+            listings.append(
+                (
+                    "blocks.children.list",
+                    notion_client.blocks.children.list,
+                    {"block_id": block["id"]},
+                )
+            )
+        if block.get("type") == "child_database":
+            query = {"database_id": block["id"], "page_size": DATABASE_QUERY_PAGE_SIZE}
+            listings.append(("databases.query", notion_client.databases.query, query))
+
+        children = []
+        for endpoint, request, request_kwargs in listings:
+            has_more = True
+            while has_more:
+                if not self.has_budget():
+                    return children, True
+                response = self.call(endpoint, request, **request_kwargs)
+                counts["calls"] += 1
+                counts["listings"] += 1
+                for result in response.get("results", []):
+                    if endpoint == "databases.query":
+                        children.append((row_to_page_block(result, block["id"], self.since), True))
+                    else:
+                        children.append((result, False))
+                request_kwargs["start_cursor"] = response.get("next_cursor")
+                has_more = response.get("has_more", False) and request_kwargs["start_cursor"]
+        return children, False
+
+    def sample(self, root_page_id):
+        """Lists the tree breadth first from the root page until the budget is spent."""
+        root_block = self.call(
+            "blocks.retrieve", notion_client.blocks.retrieve, block_id=root_page_id
+        )
+        self.count_block(root_block, ROOT_CONTENT)
+        # The crawler retrieves the root block twice
+        self.get_counts(ROOT_CONTENT)["calls"] += 1
+        root_included = self.crawl_filter.is_included(root_block, False)
+        blocks_to_list = deque([(root_block, ROOT_CONTENT, 0, root_included)])
+        while blocks_to_list and self.has_budget():
+            block, subtree, page_depth, included = blocks_to_list.popleft()
+            if not is_container(block):
+                continue
+            # The content of a synced block is crawled once, and replayed under its references
+            listing_id = get_synced_original_id(block) or normalize_string(block["id"])
+            children = self.listings.get(listing_id)
+            replayed = children is not None
+            truncated = False
+            if not replayed:
+                children, truncated = self.list_children(block, subtree)
+                if not truncated:
+                    self.listings[listing_id] = children
+            for child, is_row in children:
+                child_page_depth = page_depth + (child.get("type") in PAGE_TYPES)
+                if not self.crawl_filter.allows(child, child_page_depth, included):
+                    continue
+                child_subtree = subtree
+                if subtree == ROOT_CONTENT and child.get("type") in PAGE_TYPES:
+                    child_subtree = get_page_title(child) or child["id"]
+                self.count_block(child, child_subtree, not (is_row or replayed))
+                if not replayed:
+                    self.listed_blocks += 1
+                    self.children_containers += is_container(child)
+                child_included = self.crawl_filter.is_included(child, included)
+                blocks_to_list.append((child, child_subtree, child_page_depth, child_included))
+            if truncated:
+                # The rest of the listing is extrapolated like the content of a frontier block
+                self.get_counts(subtree)["frontier"] += 1
+        for block, subtree, _, _ in blocks_to_list:
+            self.get_counts(subtree)["frontier"] += is_container(block)
+
+    def get_media_average_size(self):
+        """Averages the size of the sampled media files (0 when unknown)."""
+        sizes = [size for size in map(get_media_size, self.media_urls) if size is not None]
+        return sum(sizes) / len(sizes) if sizes else 0
+
+    def estimate(self):
+        """Extrapolates the frontier of every subtree from the averages of the sample.
+
+        Returns:
+        - dict: The estimated counts, wall time and top subtrees of the export.
+        """
+        totals = dict.fromkeys(COUNTS, 0)
+        for counts in self.subtrees.values():
+            for name in COUNTS:
+                totals[name] += counts[name]
+        listed_blocks = max(self.listed_blocks, 1)
+        children_per_container = self.listed_blocks / max(self.listed_containers, 1)
+        containers_share = self.children_containers / listed_blocks
+        # Listed blocks expanded per frontier block, over the extrapolated levels
+        expanded = sum(
+            (children_per_container * containers_share) ** level
+            for level in range(EXTRAPOLATED_LEVELS)
+        )
+        descendants = children_per_container * expanded
+        listings_per_container = totals["listings"] / max(self.listed_containers, 1)
+        block_calls = totals["calls"] - totals["listings"]
+        per_frontier = {
+            "blocks": descendants,
+            "pages": descendants * totals["pages"] / listed_blocks,
+            "media": descendants * totals["media"] / listed_blocks,
+            "listings": expanded * listings_per_container,
+            "page_details": descendants * totals["page_details"] / listed_blocks,
+            "calls": expanded * listings_per_container + descendants * block_calls / listed_blocks,
+        }
+
+        subtrees = []
+        estimated = dict.fromkeys(per_frontier, 0)
+        for subtree, counts in self.subtrees.items():
+            subtree_estimate = {
+                name: counts[name] + counts["frontier"] * per_frontier[name]
+                for name in per_frontier
+            }
+            subtrees.append((subtree, subtree_estimate))
+            for name in per_frontier:
+                estimated[name] += subtree_estimate[name]
+        subtrees.sort(key=lambda subtree: subtree[1]["calls"], reverse=True)
+
+        average_latency = self.latency / max(self.calls, 1)
+        # The listings, queries and page details retrievals wait between requests, the rate limit
+        # caps the average pace
+        wall_time = max(
+            estimated["calls"] * average_latency
+            + (estimated["listings"] + estimated["page_details"]) * notion_request_wait_time,
+            estimated["calls"] / NOTION_RATE_LIMIT,
+        )
+        return {
+            "exact": totals["frontier"] == 0,
+            "sample_calls": self.calls,
+            "sampled_blocks": totals["blocks"],
+            "blocks": round(estimated["blocks"]),
+            "pages": round(estimated["pages"]),
+            "media": round(estimated["media"]),
+            "media_bytes": round(estimated["media"] * self.get_media_average_size()),
+            "api_calls": round(estimated["calls"]),
+            "page_detail_calls": round(estimated["page_details"]),
+            "wall_time_seconds": round(wall_time),
+            "subtrees": [
+                {
+                    "subtree": subtree,
+                    "blocks": round(subtree_estimate["blocks"]),
+                    "api_calls": round(subtree_estimate["calls"]),
+                    "share": subtree_estimate["calls"] / max(estimated["calls"], 1),
+                }
+                for subtree, subtree_estimate in subtrees[:PLAN_TOP_SUBTREES]
+            ],
+        }
+
+
+def plan_export(root_page_id, max_calls=DEFAULT_PLAN_MAX_CALLS, since=None, crawl_filter=None):
+    """Samples the tree under the root page and estimates the cost of its export.
+
+    Parameters:
+    - root_page_id (str): The ID of the root page.
+    - max_calls (int): The budget of API calls of the sample.
+    - since (str, optional): An ISO 8601 date, only the database rows edited on or after it are
+      crawled.
+    - crawl_filter (CrawlFilter, optional): The include / exclude filters and maximum depth of the
+      export. The sample size is not applied.
+
+    Returns:
+    - dict: The plan, see `CrawlPlanner.estimate`.
+    """
+    planner = CrawlPlanner(max_calls, since, crawl_filter)
+    planner.sample(root_page_id)
+    plan = planner.estimate()
+    log_plan(plan)
+    return plan
+
+
+def log_plan(plan):
+    """Logs the plan of an export in a readable form."""
+    logger.info(
+        "Export plan (%s, %d API calls sampled %d blocks):",
+        "exact" if plan["exact"] else "estimated",
+        plan["sample_calls"],
+        plan["sampled_blocks"],
+    )
+    logger.info("  Blocks: %d, pages: %d", plan["blocks"], plan["pages"])
+    logger.info("  Media: %d files, %.1f MB", plan["media"], plan["media_bytes"] / (1024 * 1024))
+    logger.info(
+        "  API calls: %d (%d page details), wall time: %s",
+        plan["api_calls"],
+        plan["page_detail_calls"],
+        format_duration(plan["wall_time_seconds"]),
+    )
+    logger.info("  Top subtrees by API calls:")
+    for subtree in plan["subtrees"]:
+        logger.info(
+            "    %5.1f%%  %d calls, %d blocks  %s",
+            subtree["share"] * 100,
+            subtree["api_calls"],
+            subtree["blocks"],
+            subtree["subtree"],
+        )
@@ -1,110 +1,330 @@
 """Auxiliary functions to work with Notion API blocks."""
+import logging
 import time
+from contextlib import nullcontext
 
+from m_aux import metrics
+from m_aux.outputs import normalize_string
 from m_aux.pretty_print import pretty_print
-from m_config.notion_client import notion_client, notion_request_wait_time
+from m_aux.progress import progress
+from m_config.notion_client import (
+    notion_client,
+    notion_request_wait_time,
+    wait_for_request_slot,
+)
+from m_search.crawl_filters import PAGE_TYPES, CrawlFilter
+from m_search.notion_databases import query_database_rows, row_to_page_block
+from m_search.notion_pages import (
+    cache_page_details,
+    fetch_page_details,
+    page_details_cache,
+)
+from m_search.snapshot import SnapshotWriter
+from m_search.tree_index import tree_index
 
+logger = logging.getLogger(__name__)
 
-def fetch_and_process_block_hierarchy(root_block_id):
+
+def fetch_and_process_block_hierarchy(
+    root_block_id, since=None, snapshot_path=None, crawl_filter=None, reused_pages=None
+):
     """Fetches a block by its ID and processes its hierarchy, including all nested children.
 
+    Every fetched block is registered in the shared tree index (`m_search.tree_index`), which the
+    parser queries for the hierarchy of the blocks. The rows of the databases (`child_database`
+    blocks) are streamed from the database queries and processed as pages of the database.
+
+    The details of the pages the parser needs (changelogs, linked pages) are fetched along the
+    crawl, so parsing makes no API call. Optionally, the crawl is streamed into a snapshot the
+    parsing and writing stages can be re-run from (see `m_search.snapshot`).
+
+    Synced blocks are fetched once: the content of an original synced block is recorded the first
+    time it is crawled (under the original or any of its references), and replayed under the other
+    references with suffixed IDs (see `replay_synced_content`) instead of being fetched again.
+
+    The crawl can be pruned with include / exclude filters, a maximum depth and a sample size (see
+    `m_search.crawl_filters`), checked as soon as the blocks are listed. The blocks walked outside
+    of the included subtrees are not registered: the child pages found in them are registered under
+    the page holding them.
+
+    Re-crawls (watch mode) reuse the content of the pages that did not change since the previous
+    crawl: it is registered again as it was, and only the changed pages are fetched.
+
     Parameters:
     - notion_client: The Notion client used to fetch blocks.
     - root_block_id: The ID of the root block to start processing from.
+    - since (str, optional): An ISO 8601 date. When set, only the database rows edited on or after
+      it are crawled, the other rows are kept (see `row_to_page_block`).
+    - snapshot_path (str, optional): The path of the snapshot to write.
+    - crawl_filter (CrawlFilter, optional): The filters pruning the crawl. Everything is crawled
+      by default.
+    - reused_pages (dict, optional): The (block, parent ID) content of the unchanged pages of the
+      previous crawl, by normalized page ID (see `m_search.watch.get_page_contents`). Their page
+      details are kept in the cache as well.
 
     Returns:
-    - list: A list of all processed blocks, each with added parent hierarchy information.
+    - list: A list of all processed blocks, in crawl order.
     """
     processed_blocks = []
+    crawl_filter = crawl_filter or CrawlFilter()
     root_block = fetch_block_details(root_block_id)
+    progress.discover([root_block] if root_block else [])
     root_block_parent = root_block.get("parent", None)
     root_block_parent_id = (
         (root_block_parent.get("block_id") or root_block_parent.get("page_id")).strip()
         if root_block_parent and root_block_parent.get("type") == "page"
         else None
     )
+    tree_index.clear(root_block_parent_id)
+    reused_pages = reused_pages or {}
+    if not reused_pages:
+        page_details_cache.clear()
+    snapshot = (
+        SnapshotWriter(snapshot_path, root_block_id, root_block_parent_id)
+        if snapshot_path
+        else nullcontext()
+    )
+    # Content of the synced blocks already crawled, as (block, parent ID) by original block ID
+    synced_contents = {}
+    # Contents being recorded, for the synced blocks being crawled
+    recordings = []
+    saved_calls = {"count": 0}
+    # First rows of the tables with a column header (see `mark_table_header`)
+    table_header_ids = set()
 
-    def process_block(block_id, parent_hierarchy=[]):
-        """Recursively processes a block and its children, adding parent hierarchy information.
+    def register_block(block, parent_id):
+        """Registers a block in the tree index, the crawl results and the snapshot."""
+        progress.fetched(block)
+        # Register the block with a pointer to its parent
+        if parent_id is None:
+            tree_index.add_root(block)
+        else:
+            tree_index.add(block, parent_id)
+
+        # Ensure to propagate the information about the input root block (passed as parameter from CLI)
+        block["root_block_id"] = root_block_id
+        if block["id"] in table_header_ids:
+            block["table_header"] = True
+
+        # Add the processed block to the list
+        processed_blocks.append(block)
+        if snapshot_path:
+            snapshot.write_block(block, parent_id)
+        prefetch_page_details(block)
+        for recording in recordings:
+            recording.append((block, parent_id))
+
+    def process_children(child_blocks, page_depth, included):
+        """Yields the crawled children of a block, with their page depth and inclusion."""
+        kept_blocks = []
+        for child in child_blocks:
+            child_page_depth = page_depth + (child.get("type") in PAGE_TYPES)
+            if crawl_filter.allows(child, child_page_depth, included):
+                kept_blocks.append((child, child_page_depth))
+        progress.discover([child for child, _ in kept_blocks])
+        for child, child_page_depth in kept_blocks:
+            if not crawl_filter.is_sampled_out(child):
+                yield child, child_page_depth, crawl_filter.is_included(child, included)
+
+    def process_block(block_id, parent_id=None, current_block=None, page_depth=0, included=None):
+        """Recursively processes a block and its children, registering them in the tree index.
 
         Parameters:
         - block_id: The ID of the current block being processed.
-        - parent_hierarchy: The accumulated parent hierarchy for the current block.
+        - parent_id: The ID of the registered block the current block was listed under, directly or
+          through blocks that are not registered (None for the root).
+        - current_block: The current block, when already known (database rows). Fetched otherwise.
+        - page_depth: The number of pages between the root page and the block, itself included.
+        - included: Whether the content of the block is exported (see `CrawlFilter.is_included`).
         """
         # Fetch the current block's details (assuming a function or method exists to do this)
-        current_block = fetch_block_details(block_id)
+        if current_block is None:
+            current_block = fetch_block_details(block_id)
         if not current_block:
             return
+        if included is None:
+            included = crawl_filter.is_included(current_block, False)
+        # Outside of the included subtrees, only the pages are registered
+        children_parent_id = parent_id
+        if included or current_block.get("type") in PAGE_TYPES or parent_id is None:
+            crawl_filter.count_page(current_block)
+            register_block(current_block, parent_id)
+            children_parent_id = current_block["id"]
 
-        # Add parent hierarchy information to the current block
-        add_parent_hierarchy(
-            current_block, parent_hierarchy.copy(), root_block_id, root_block_parent_id
-        )
-
-        # Ensure to propagate the information about the input root block (passed as parameter from CLI)
-        current_block["root_block_id"] = root_block_id
+        reused_content = reused_pages.get(normalize_string(current_block["id"]))
+        if reused_content is not None and current_block.get("type") in PAGE_TYPES:
+            progress.discover([block for block, _ in reused_content])
+            for block, block_parent_id in reused_content:
+                if block.get("type") not in PAGE_TYPES:
+                    if included:
+                        register_block(block, block_parent_id)
+                    continue
+                child_page_depth = page_depth + 1
+                allowed = crawl_filter.allows(block, child_page_depth, included)
+                if not allowed or crawl_filter.is_sampled_out(block):
+                    continue
+                # Changed child pages are fetched again, with their possibly new title
+                reused_block = block if normalize_string(block["id"]) in reused_pages else None
+                process_block(
+                    block["id"],
+                    block_parent_id,
+                    reused_block,
+                    child_page_depth,
+                    crawl_filter.is_included(block, included),
+                )
+            return
 
-        # Add the processed block to the list
-        processed_blocks.append(current_block)
+        original_id = get_synced_original_id(current_block)
+        if included and original_id in synced_contents:
+            replayed_blocks, saved = replay_synced_content(
+                synced_contents[original_id], current_block["id"]
+            )
+            progress.discover([block for block, _ in replayed_blocks])
+            for block, block_parent_id in replayed_blocks:
+                register_block(block, block_parent_id)
+            saved_calls["count"] += saved
+            metrics.inc("api_calls_saved_total", saved, reason="synced_block")
+            return
 
         # If the block has children, process each child
         if current_block.get("has_children", False):
             child_blocks = get_all_children_blocks(block_id)
-            for child in child_blocks:
-                # Construct new parent hierarchy for the child
-                new_parent_hierarchy = parent_hierarchy.copy()
-                new_parent_hierarchy.append(
-                    {"block_id": block_id, "type": current_block.get("type")}
+            # The listed children are retrieved again when crawled, the mark is applied then
+            header_row = mark_table_header(current_block, child_blocks)
+            if header_row is not None:
+                table_header_ids.add(header_row["id"])
+            if original_id is not None:
+                recordings.append([])
+            for child, child_page_depth, child_included in process_children(
+                child_blocks, page_depth, included
+            ):
+                process_block(
+                    child["id"], children_parent_id, None, child_page_depth, child_included
                 )
-                process_block(child["id"], new_parent_hierarchy)
+            if original_id is not None:
+                synced_content = recordings.pop()
+                # The content of a synced block is only complete in an included subtree
+                if included:
+                    synced_contents[original_id] = synced_content
+
+        # The rows of a database are pages of the database, streamed from its query
+        # All the rows are listed in the index of the database, the ones edited before `since` are
+        # only kept (not crawled)
+        if current_block.get("type") == "child_database":
+            for row in query_database_rows(current_block["id"]):
+                row_block = row_to_page_block(row, current_block["id"], since)
+                for row_block, row_page_depth, row_included in process_children(
+                    [row_block], page_depth, included
+                ):
+                    # The row details are used for the page changelog instead of fetching the page
+                    cache_page_details(row["id"], row)
+                    process_block(
+                        row_block["id"],
+                        current_block["id"],
+                        row_block,
+                        row_page_depth,
+                        row_included,
+                    )
 
     # Start processing from the root block
-    process_block(root_block_id)
+    with snapshot:
+        process_block(root_block_id)
+    if crawl_filter.skipped_pages:
+        metrics.inc("pages_skipped_total", crawl_filter.skipped_pages)
+        logger.info("%d pages skipped by the crawl filters.", crawl_filter.skipped_pages)
+    if synced_contents:
+        logger.info(
+            "%d synced contents replayed under their references, %d API calls saved.",
+            len(synced_contents),
+            saved_calls["count"],
+        )
     return processed_blocks
 
 
-def add_parent_hierarchy(
-    block, parent_hierarchy=[], root_block_id=None, root_block_parent_id=None
-):
-    """Adds parent hierarchy identifiers to a block, ensuring no duplications and starting labeling
-    from c_parent_1.
+def get_synced_original_id(block):
+    """Returns the normalized ID of the original block of a synced block.
 
     Parameters:
-    - block: The current block being processed (dict).
-    - parent_hierarchy: A list of dictionaries each containing parent block_id and type collected up to the current depth.
+    - block (dict): The block, as returned by the Notion API.
+
+    Returns:
+    - str: The ID of the block itself for an original synced block, the ID of the block it is synced
+      from for a reference, and None for any other block.
     """
-    parent_block = block.get("parent", {})
-    parent_id = parent_block.get("block_id") or parent_block.get("page_id")
-    parent_id = parent_id.strip() if parent_id else None
-    parent_type = block.get("type")
+    if block.get("type") != "synced_block":
+        return None
+    synced_from = (block.get("synced_block") or {}).get("synced_from") or {}
+    return normalize_string(synced_from.get("block_id") or block["id"])
 
-    if root_block_id and block["id"] != root_block_id and root_block_parent_id:
-        parent_hierarchy.insert(0, {"block_id": root_block_parent_id, "type": "child_page"})
 
-    # Normalize block_id before comparison
-    normalized_parent_id = parent_id.replace("-", "") if parent_id else None
+def replay_synced_content(content, reference_id):
+    """Copies the recorded content of a synced block under another reference.
 
-    # Check the entire hierarchy for duplication
-    is_duplicate = any(
-        (parent.get("block_id").replace("-", "") == normalized_parent_id)
-        for parent in parent_hierarchy
-    )
+    The content is the same under every reference, so the blocks keep their original payload. Their
+    IDs are suffixed with the ID of the reference, so every copy has its own place in the tree index
+    (and its own media files).
+
+    Parameters:
+    - content (list): The recorded (block, parent ID) of the content, in crawl order.
+    - reference_id (str): The ID of the synced block the content is replayed under.
+
+    Returns:
+    - tuple: The (block, parent ID) copies, in crawl order, and the number of API calls saved (one
+      retrieval per block and one children listing per block with children, plus the listing of
+      the reference itself).
+    """
+    suffix = normalize_string(reference_id)
+    # The top level blocks of the content were listed under the synced block
+    copied_ids = {}
+    replayed_blocks = []
+    saved_calls = 1
+    for block, parent_id in content:
+        block_id = normalize_string(block["id"])
+        copied_ids[block_id] = f"{block_id}_{suffix}"
+        copied_parent_id = copied_ids.get(normalize_string(parent_id), reference_id)
+        replayed_blocks.append((dict(block, id=copied_ids[block_id]), copied_parent_id))
+        saved_calls += 2 if block.get("has_children") else 1
+    return replayed_blocks, saved_calls
 
-    if not is_duplicate and parent_id:
-        parent_hierarchy.append({"block_id": parent_id, "type": parent_type})
 
-    # Assign the parent hierarchy to the block with adjusted keys starting from c_parent_1
-    for i, parent_info in enumerate(parent_hierarchy, start=1):
-        key = f"c_parent_{i}"
-        block[key] = parent_info
+def mark_table_header(block, child_blocks):
+    """Marks the first row of a table with a column header, rendered as the header of the table.
+
+    Parameters:
+    - block (dict): The block the children were listed under.
+    - child_blocks (list): The children of the block, as returned by the Notion API.
+
+    Returns:
+    - dict: The marked row, or None if the block is not a table with a column header.
+    """
+    if block.get("type") != "table" or not child_blocks:
+        return None
+    if not (block.get("table") or {}).get("has_column_header"):
+        return None
+    child_blocks[0]["table_header"] = True
+    return child_blocks[0]
+
+
+def prefetch_page_details(block):
+    """Fetches the details of the pages the parser needs for a block (cached for the parser).
+
+    Parameters:
+    - block (dict): The block, as returned by the Notion API.
+    """
+    if block.get("type") == "child_page":
+        fetch_page_details(block["id"])
+    elif block.get("type") == "link_to_page" and block["link_to_page"].get("page_id"):
+        fetch_page_details(block["link_to_page"]["page_id"])
 
 
-def get_all_children_blocks(page_id: str):
+def get_all_children_blocks(page_id: str, throttled=False):
     """Get all child blocks of a given block (page_id) considering pagination.
 
     Parameters:
     - notion_client (Client): The Notion client to use for API requests.
     - page_id (str): The ID of the block from which to extract children.
+    - throttled (bool): True to wait for a slot of the shared throttle before every request, when
+      crawling in parallel (see `wait_for_request_slot`).
 
     Returns:
     - list: A list of all child blocks.
@@ -112,9 +332,15 @@ def get_all_children_blocks(page_id: str):
     all_blocks = []
     start_cursor = None
     has_more = True
-    time.sleep(notion_request_wait_time)
+    if not throttled:
+        time.sleep(notion_request_wait_time)
     while has_more:
-        response = notion_client.blocks.children.list(block_id=page_id, start_cursor=start_cursor)
+        if throttled:
+            wait_for_request_slot()
+        with metrics.api_call("blocks.children.list"):
+            response = notion_client.blocks.children.list(
+                block_id=page_id, start_cursor=start_cursor
+            )
         all_blocks.extend(response.get("results", []))
         start_cursor = response.get("next_cursor")
         has_more = response.get("has_more", False)
@@ -132,4 +358,7 @@ def fetch_block_details(block_id):
     Returns:
     - dict: The details of the fetched block.
     """
-    return notion_client.blocks.retrieve(block_id=block_id) if block_id else None
+    if not block_id:
+        return None
+    with metrics.api_call("blocks.retrieve"):
+        return notion_client.blocks.retrieve(block_id=block_id)
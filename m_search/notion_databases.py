@@ -0,0 +1,99 @@
+"""Auxiliary functions for fetching Notion databases."""
+
+import time
+
+from m_aux import metrics
+from m_config.notion_client import notion_client, notion_request_wait_time
+
+# Maximum page size of the Notion API
+DATABASE_QUERY_PAGE_SIZE = 100
+
+
+def query_database_rows(database_id):
+    """Streams the rows (pages) of a database, one query page at a time.
+
+    Only the current query page is held in memory, so databases of any size can be walked. All
+    the rows are queried, incremental runs included: the index table of the database lists them
+    all (see `row_to_page_block` for the rows edited before the date of the run).
+
+    Parameters:
+    - database_id (str): The ID of the database.
+
+    Yields:
+    - dict: The rows of the database, as returned by the Notion API.
+    """
+    query = {"database_id": database_id, "page_size": DATABASE_QUERY_PAGE_SIZE}
+
+    start_cursor = None
+    has_more = True
+    while has_more:
+        time.sleep(notion_request_wait_time)
+        if start_cursor:
+            query["start_cursor"] = start_cursor
+        with metrics.api_call("databases.query"):
+            response = notion_client.databases.query(**query)
+        yield from response.get("results", [])
+        start_cursor = response.get("next_cursor")
+        has_more = response.get("has_more", False) and start_cursor is not None
+
+
+def get_row_title(row):
+    """Extracts the title of a database row from its title property.
+
+    Parameters:
+    - row (dict): The row, as returned by the Notion API.
+
+    Returns:
+    - str: The plain text title of the row ("Untitled" when empty).
+    """
+    for value in row.get("properties", {}).values():
+        if value.get("type") == "title" or "title" in value:
+            title = "".join(text.get("plain_text", "") for text in value.get("title", []))
+            if title:
+                return title
+    return "Untitled"
+
+
+def is_kept_row(row, since=None):
+    """Checks if a database row was edited before the date of an incremental run.
+
+    Parameters:
+    - row (dict): The row, as returned by the Notion API.
+    - since (str, optional): The ISO 8601 date of the incremental run.
+
+    Returns:
+    - bool: True if the exported page of the row is kept as it is.
+    """
+    return bool(since) and row.get("last_edited_time", "") < since
+
+
+def row_to_page_block(row, database_id, since=None):
+    """Converts a database row to the `child_page` block it is exported as.
+
+    The rows edited before the date of an incremental run are kept: their page is neither crawled
+    nor written again, they are only listed in the index table of the database.
+
+    Parameters:
+    - row (dict): The row, as returned by the Notion API.
+    - database_id (str): The ID of the database of the row.
+    - since (str, optional): The ISO 8601 date of the incremental run.
+
+    Returns:
+    - dict: The block of the row page, listing its position in the database.
+    """
+    kept = is_kept_row(row, since)
+    return {
+        "object": "block",
+        "id": row["id"],
+        "type": "child_page",
+        "child_page": {"title": get_row_title(row)},
+        # The content of a row page is only known by listing its children
+        "has_children": not kept,
+        "parent": {"type": "database_id", "database_id": database_id},
+        "last_edited_time": row.get("last_edited_time"),
+        "database_row": {
+            "database_id": database_id,
+            "last_edited_time": row.get("last_edited_time", ""),
+            "kept": kept,
+        },
+    }
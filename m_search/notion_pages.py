@@ -2,18 +2,101 @@
 
 import time
 
+from m_aux import metrics
+from m_aux.outputs import normalize_string
 from m_config.notion_client import notion_client, notion_request_wait_time
 
+# Maximum page size of the Notion API
+SEARCH_PAGE_SIZE = 100
+# Page properties used by the parser: the title of the linked pages and the page changelog
+PAGE_DETAILS_PROPERTIES = ["Page", "Owner", "Created time", "Last edited time"]
+
+# Details of the pages already fetched or known from the crawl (e.g. database rows), by normalized ID
+page_details_cache = {}
+
+
+def compact_page_details(page_details):
+    """Keeps the details of a page the parser uses, dropping the other properties.
+
+    Parameters:
+    - page_details (dict): The page, as returned by the Notion API.
+
+    Returns:
+    - dict: The URL, the creator and the properties used by the parser.
+    """
+    properties = page_details.get("properties", {})
+    return {
+        "url": page_details.get("url"),
+        "created_by": page_details.get("created_by", {}),
+        "properties": {
+            name: properties[name] for name in PAGE_DETAILS_PROPERTIES if name in properties
+        },
+    }
+
+
+def cache_page_details(page_id, page_details):
+    """Keeps the details of a page, so fetching them again costs no API call.
+
+    Parameters:
+    - page_id (str): The ID of the page.
+    - page_details (dict): The details of the page.
+
+    Returns:
+    - dict: The compacted details that were cached.
+    """
+    page_details = compact_page_details(page_details)
+    page_details_cache[normalize_string(page_id)] = page_details
+    return page_details
+
 
 def fetch_page_details(page_id):
-    """Fetches the details of a page given its ID. Placeholder for actual implementation.
+    """Fetches the details of a page given its ID.
+
+    The details are cached: the crawler prefetches the pages the parser needs, and pages linked
+    several times are only fetched once.
 
     Parameters:
     - notion_client: The Notion client used to fetch pages.
     - page_id: The ID of the page to fetch.
 
     Returns:
-    - dict: The details of the fetched page.
+    - dict: The details of the fetched page (see `compact_page_details`).
     """
+    if not page_id:
+        return None
+    cached_details = page_details_cache.get(normalize_string(page_id))
+    if cached_details is not None:
+        return cached_details
     time.sleep(notion_request_wait_time)
-    return notion_client.pages.retrieve(page_id=page_id) if page_id else None
+    with metrics.api_call("pages.retrieve"):
+        page_details = notion_client.pages.retrieve(page_id=page_id)
+    return cache_page_details(page_id, page_details)
+
+
+def search_pages(object_type=None, sort_by_last_edited=False):
+    """Streams the pages (and databases) shared with the integration, one search page at a time.
+
+    Parameters:
+    - object_type (str, optional): "page" or "database" to only search those. Both by default.
+    - sort_by_last_edited (bool): True to stream the most recently edited first.
+
+    Yields:
+    - dict: The pages and databases, as returned by the Notion API.
+    """
+    query = {"page_size": SEARCH_PAGE_SIZE}
+    if object_type:
+        query["filter"] = {"property": "object", "value": object_type}
+    if sort_by_last_edited:
+        query["sort"] = {"direction": "descending", "timestamp": "last_edited_time"}
+
+    start_cursor = None
+    has_more = True
+    while has_more:
+        time.sleep(notion_request_wait_time)
+        if start_cursor:
+            query["start_cursor"] = start_cursor
+        with metrics.api_call("search"):
+            response = notion_client.search(**query)
+        yield from response.get("results", [])
+        start_cursor = response.get("next_cursor")
+        has_more = response.get("has_more", False) and start_cursor is not None
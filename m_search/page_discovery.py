@@ -0,0 +1,175 @@
+"""Discovery of the pages through the search endpoint, and parallel crawl of their content.
+
+Walking down from the root page finds the pages one children listing at a time. Instead, the search
+endpoint lists every page (and database) shared with the integration, 100 per call, and the page
+hierarchy is rebuilt locally from the `parent` of each page. The content of all the pages under the
+root page is then crawled in parallel, every page on its own, stopping at its child pages. The
+requests of all the threads go through the shared throttle (`wait_for_request_slot`).
+
+The crawled contents are assembled by `fetch_and_process_block_hierarchy`, as the reused pages of a
+crawl: the tree index is filled sequentially, in the same depth-first order as a regular crawl. The
+pages the search missed (e.g. pages nested in blocks, whose parent is a block) and the databases
+are crawled there, as usual.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from m_aux import metrics
+from m_aux.outputs import normalize_string
+from m_search.crawl_filters import PAGE_TYPES, CrawlFilter, matches_page
+from m_search.notion_blocks import (
+    get_all_children_blocks,
+    get_synced_original_id,
+    mark_table_header,
+    replay_synced_content,
+)
+from m_search.notion_databases import get_row_title
+from m_search.notion_pages import cache_page_details, page_details_cache, search_pages
+
+DEFAULT_CRAWL_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+
+def search_result_to_block(result):
+    """Converts a search result to the `child_page` / `child_database` block it is listed as."""
+    if result.get("object") == "database":
+        title = "".join(text.get("plain_text", "") for text in result.get("title", []))
+        return {"id": result["id"], "type": "child_database", "child_database": {"title": title}}
+    return {
+        "id": result["id"],
+        "type": "child_page",
+        "child_page": {"title": get_row_title(result)},
+    }
+
+
+def discover_pages(root_page_id, since=None, crawl_filter=None):
+    """Finds the pages under the root page through the search endpoint.
+
+    The details of the found pages are cached for the parser, so they are not fetched again.
+
+    The crawl filters are applied as by the crawl: the excluded and too deep pages are left out
+    with their sub-pages, the pages leading to the included pages are walked for their sub-pages
+    but their content is left to the crawl (which only looks for child pages in it), and the walk
+    stops once the sample size is reached.
+
+    Parameters:
+    - root_page_id (str): The ID of the root page.
+    - since (str, optional): An ISO 8601 date. When set, the database rows edited before it (and
+      their sub-pages) are left out: the crawl keeps their exported pages as they are.
+    - crawl_filter (CrawlFilter, optional): The filters pruning the crawl. Everything is found by
+      default.
+
+    Returns:
+    - list: The normalized IDs of the pages under the root page (itself included) whose content is
+      exported, depth first.
+    """
+    crawl_filter = crawl_filter or CrawlFilter()
+    results = {}
+    children = {}
+    for result in search_pages():
+        result_id = normalize_string(result["id"])
+        results[result_id] = result
+        parent = result.get("parent") or {}
+        parent_id = parent.get("page_id") or parent.get("database_id")
+        if parent_id:
+            children.setdefault(normalize_string(parent_id), []).append(result_id)
+
+    page_ids = []
+    walked_pages = 0
+    pages_to_walk = [(normalize_string(root_page_id), 0, False)]
+    while pages_to_walk:
+        if crawl_filter.sample is not None and walked_pages >= crawl_filter.sample:
+            break
+        walked_pages += 1
+        result_id, page_depth, parent_included = pages_to_walk.pop()
+        result = results.get(result_id)
+        block = search_result_to_block(result or {"id": result_id})
+        included = crawl_filter.is_included(block, parent_included)
+        if result is not None and result.get("object") == "page":
+            cache_page_details(result_id, result)
+            if included:
+                page_ids.append(result_id)
+        child_ids = []
+        for child_id in children.get(result_id, []):
+            child = results[child_id]
+            if since and child.get("parent", {}).get("type") == "database_id":
+                if child.get("last_edited_time", "") < since:
+                    continue
+            if matches_page(crawl_filter.exclude, search_result_to_block(child)):
+                continue
+            if crawl_filter.max_depth is not None and page_depth + 1 > crawl_filter.max_depth:
+                continue
+            child_ids.append((child_id, page_depth + 1, included))
+        pages_to_walk.extend(reversed(child_ids))
+
+    logger.info(
+        "%d pages and databases found by the search, %d under the root page.",
+        len(results),
+        len(page_ids),
+    )
+    return page_ids
+
+
+def crawl_page_content(page_id, synced_contents):
+    """Crawls the content of a page, stopping at its child pages.
+
+    Parameters:
+    - page_id (str): The ID of the page.
+    - synced_contents (dict): The content of the synced blocks already crawled by any thread, as
+      (block, parent ID) by original block ID (see `replay_synced_content`).
+
+    Returns:
+    - list: The (block, parent ID) content of the page, in depth-first order.
+    """
+    content = []
+
+    def crawl_children(block_id, block=None):
+        child_blocks = get_all_children_blocks(block_id, throttled=True)
+        if block is not None:
+            mark_table_header(block, child_blocks)
+        for child in child_blocks:
+            content.append((child, block_id))
+            if child.get("type") in PAGE_TYPES or not child.get("has_children", False):
+                continue
+            original_id = get_synced_original_id(child)
+            if original_id in synced_contents:
+                replayed_blocks, saved = replay_synced_content(
+                    synced_contents[original_id], child["id"]
+                )
+                content.extend(replayed_blocks)
+                metrics.inc("api_calls_saved_total", saved, reason="synced_block")
+                continue
+            start = len(content)
+            crawl_children(child["id"], child)
+            if original_id is not None:
+                synced_contents.setdefault(original_id, content[start:])
+
+    crawl_children(page_id)
+    return content
+
+
+def crawl_pages(root_page_id, since=None, crawl_filter=None, workers=DEFAULT_CRAWL_WORKERS):
+    """Discovers the pages under the root page and crawls their content in parallel.
+
+    Parameters:
+    - root_page_id (str): The ID of the root page.
+    - since (str, optional): An ISO 8601 date, see `discover_pages`.
+    - crawl_filter (CrawlFilter, optional): The filters pruning the crawl, see `discover_pages`.
+    - workers (int): The number of pages crawled at the same time.
+
+    Returns:
+    - dict: The (block, parent ID) content of the pages, by normalized page ID, to be assembled
+      by `fetch_and_process_block_hierarchy` (`reused_pages`).
+    """
+    page_details_cache.clear()
+    page_ids = discover_pages(root_page_id, since, crawl_filter)
+    synced_contents = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        contents = executor.map(
+            lambda page_id: crawl_page_content(page_id, synced_contents), page_ids
+        )
+        page_contents = dict(zip(page_ids, contents))
+    logger.info("Content of %d pages crawled with %d workers.", len(page_contents), workers)
+    return page_contents
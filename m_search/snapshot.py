@@ -0,0 +1,108 @@
+"""Snapshots of the raw crawl, to re-run the parsing and writing stages without the Notion API.
+
+A snapshot is a gzip compressed JSON Lines file, streamed while crawling:
+
+- A header line: `{"snapshot_version": 1, "root_block_id": ..., "root_parent_id": ...}`.
+- One line per block, in crawl order: `{"block": <raw block>, "parent_id": <ID or null>}`.
+- One line per page whose details the parser needs: `{"page_id": ..., "page_details": {...}}`.
+
+Loading a snapshot rebuilds the tree index and the page details cache exactly as the crawl left
+them, so the parser needs no network call.
+"""
+
+import gzip
+import json
+import logging
+import os
+
+from m_search.notion_pages import cache_page_details, page_details_cache
+from m_search.tree_index import tree_index
+
+SNAPSHOT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotWriter:
+    """Streams the crawl into a snapshot file, moved into place only when the crawl succeeds."""
+
+    def __init__(self, snapshot_path, root_block_id, root_parent_id=None):
+        self.snapshot_path = snapshot_path
+        self.tmp_path = f"{snapshot_path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(snapshot_path)), exist_ok=True)
+        self.file = gzip.open(self.tmp_path, "wt", encoding="utf-8")
+        self._write(
+            {
+                "snapshot_version": SNAPSHOT_VERSION,
+                "root_block_id": root_block_id,
+                "root_parent_id": root_parent_id,
+            }
+        )
+        self.blocks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.tmp_path)
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self.file.write("\n")
+
+    def write_block(self, block, parent_id):
+        """Adds a crawled block and the ID of the block it was listed under (None for the root)."""
+        self._write({"block": block, "parent_id": parent_id})
+        self.blocks += 1
+
+    def write_page_details(self, page_id, page_details):
+        """Adds the details of a page the parser needs."""
+        self._write({"page_id": page_id, "page_details": page_details})
+
+    def close(self):
+        """Adds the page details gathered by the crawl and moves the snapshot into place."""
+        for page_id, page_details in page_details_cache.items():
+            self.write_page_details(page_id, page_details)
+        self.file.close()
+        os.replace(self.tmp_path, self.snapshot_path)
+        logger.info("Snapshot of %d blocks written to '%s'.", self.blocks, self.snapshot_path)
+
+
+def load_snapshot(snapshot_path):
+    """Loads the blocks of a snapshot, rebuilding the tree index and the page details cache.
+
+    Parameters:
+    - snapshot_path (str): The path of the snapshot.
+
+    Returns:
+    - list: The raw blocks, in crawl order, as `fetch_and_process_block_hierarchy` returns them.
+
+    Raises:
+    - ValueError: If the file is not a snapshot of a supported version.
+    """
+    blocks = []
+    with gzip.open(snapshot_path, "rt", encoding="utf-8") as snapshot_file:
+        header = json.loads(snapshot_file.readline() or "{}")
+        if header.get("snapshot_version") != SNAPSHOT_VERSION:
+            raise ValueError(f"'{snapshot_path}' is not a version {SNAPSHOT_VERSION} snapshot")
+        tree_index.clear(header.get("root_parent_id"))
+        page_details_cache.clear()
+
+        for line in snapshot_file:
+            record = json.loads(line)
+            if "block" in record:
+                block = record["block"]
+                if record["parent_id"] is None:
+                    tree_index.add_root(block)
+                else:
+                    tree_index.add(block, record["parent_id"])
+                blocks.append(block)
+            else:
+                cache_page_details(record["page_id"], record["page_details"])
+
+    logger.info("Snapshot of %d blocks loaded from '%s'.", len(blocks), snapshot_path)
+    return blocks
@@ -0,0 +1,153 @@
+"""Index of the block tree discovered by the crawl.
+
+The crawler registers every block with a pointer to its parent, and the parser queries the index
+for the hierarchy of a block. Everything a query needs is computed once, when the block is
+registered, from the already registered parent: the ancestor queries are O(1) lookups instead of
+scans of the whole ancestry of every block.
+
+The index reproduces the hierarchy the exporter has always used:
+
+- The depth of a block is the number of its ancestors in the crawl, plus one when the parent page of
+  the root block is known.
+- The page path of a block is made of the normalized IDs of the pages among those ancestors,
+  separated by slashes.
+- The root block itself has its own parent (page or block) as only ancestor, listed as a page when
+  the root block is a page.
+"""
+
+import threading
+
+from m_aux.outputs import normalize_string
+
+# Blocks exported as pages: their descendants belong to them
+PAGE_TYPES = ["child_page", "child_database"]
+
+
+class TreeNode:
+    """Hierarchy of a registered block."""
+
+    __slots__ = ["parent_id", "type", "depth", "page_path", "page_depth", "nearest_page_id"]
+
+    def __init__(self, parent_id, block_type, depth, page_path, page_depth, nearest_page_id):
+        self.parent_id = parent_id
+        self.type = block_type
+        self.depth = depth
+        self.page_path = page_path
+        self.page_depth = page_depth
+        self.nearest_page_id = nearest_page_id
+
+
+class BlockTreeIndex:
+    """Parent pointers, depth, page path and nearest page of the blocks, by normalized ID."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self, root_parent_id=None):
+        """Empties the index before a new crawl.
+
+        Parameters:
+        - root_parent_id (str, optional): The ID of the parent page of the root block. When known,
+          it is the first page of the path of all the descendants of the root block.
+        """
+        with self.lock:
+            self.nodes = {}
+            self.root_id = None
+            # Hierarchy the descendants of the root block start from
+            self.root_parent_id = normalize_string(root_parent_id) if root_parent_id else None
+            self.base_depth = 1 if root_parent_id else 0
+            self.base_page_path = self.root_parent_id or ""
+
+    def add_root(self, block):
+        """Registers the root block of the crawl.
+
+        Parameters:
+        - block (dict): The root block, as returned by the Notion API.
+
+        Returns:
+        - TreeNode: The hierarchy of the root block.
+        """
+        parent = block.get("parent") or {}
+        parent_id = parent.get("block_id") or parent.get("page_id")
+        parent_id = normalize_string(parent_id.strip()) if parent_id else None
+        block_type = block.get("type")
+        # The parent of the root block is its only ancestor, listed with the type of the root block
+        page_path = parent_id if parent_id and block_type in PAGE_TYPES else ""
+        node = TreeNode(
+            parent_id,
+            block_type,
+            1 if parent_id else 0,
+            page_path,
+            1 if page_path else 0,
+            page_path or None,
+        )
+        with self.lock:
+            self.root_id = normalize_string(block["id"])
+            self.nodes[self.root_id] = node
+        return node
+
+    def add(self, block, parent_id):
+        """Registers a block below its (already registered) parent.
+
+        Parameters:
+        - block (dict): The block, as returned by the Notion API.
+        - parent_id (str): The ID of the block it was listed under.
+
+        Returns:
+        - TreeNode: The hierarchy of the block.
+        """
+        parent_id = normalize_string(parent_id)
+        with self.lock:
+            parent = self.nodes[parent_id]
+            if parent_id == self.root_id:
+                depth, page_path = self.base_depth, self.base_page_path
+                page_depth, nearest_page_id = (1, self.root_parent_id) if page_path else (0, None)
+            else:
+                depth, page_path = parent.depth, parent.page_path
+                page_depth, nearest_page_id = parent.page_depth, parent.nearest_page_id
+            if parent.type in PAGE_TYPES:
+                page_path = f"{page_path}/{parent_id}" if page_path else parent_id
+                page_depth += 1
+                nearest_page_id = parent_id
+            node = TreeNode(
+                parent_id, block.get("type"), depth + 1, page_path, page_depth, nearest_page_id
+            )
+            self.nodes[normalize_string(block["id"])] = node
+        return node
+
+    def get(self, block_id):
+        """Returns the hierarchy of a block (TreeNode), or None if it is not registered."""
+        return self.nodes.get(normalize_string(block_id))
+
+    def parent_id(self, block_id):
+        """Returns the normalized ID of the block a block was listed under."""
+        node = self.get(block_id)
+        return node.parent_id if node else None
+
+    def depth(self, block_id):
+        """Returns the number of ancestors of a block."""
+        node = self.get(block_id)
+        return node.depth if node else 0
+
+    def page_path(self, block_id):
+        """Returns the slash separated normalized IDs of the pages a block belongs to."""
+        node = self.get(block_id)
+        return node.page_path if node else ""
+
+    def page_depth(self, block_id):
+        """Returns the number of pages in the page path of a block."""
+        node = self.get(block_id)
+        return node.page_depth if node else 0
+
+    def nearest_page_id(self, block_id):
+        """Returns the normalized ID of the closest page among the ancestors of a block."""
+        node = self.get(block_id)
+        return node.nearest_page_id if node else None
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+# Shared by the crawler, which fills it, and the parser, which queries it
+tree_index = BlockTreeIndex()
@@ -0,0 +1,146 @@
+"""Watch mode: keeps an export up to date by polling Notion for the edited pages.
+
+The process stays warm between polls: the raw blocks of the last crawl, the tree index, the page
+details and the Notion client are kept in memory. Every poll searches the pages edited since the
+previous one (`last_edited_time` ordering, so the search stops at the first older page), and the
+crawl is run again reusing the content of the unchanged pages (see
+`fetch_and_process_block_hierarchy`): only the edited pages are fetched.
+
+Edits are mapped to the exported pages to crawl again:
+
+- An edited page of the export is crawled again.
+- A database row is edited: its database is queried again as well.
+- A new page: its parent page (or database) is crawled again, its listing holds the new page.
+
+Pages deleted or moved without editing their parent page are only dropped by the next full export.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from m_aux.outputs import normalize_string
+from m_search.notion_pages import page_details_cache, search_pages
+from m_search.tree_index import PAGE_TYPES, tree_index
+
+DEFAULT_WATCH_INTERVAL = 30
+DEFAULT_WATCH_MAX_INTERVAL = 600
+# Notion rounds `last_edited_time` down to the minute: the polls overlap by as much
+POLL_OVERLAP = timedelta(minutes=1)
+
+logger = logging.getLogger(__name__)
+
+
+def get_poll_checkpoint(poll_time):
+    """Calculates the `last_edited_time` the next poll searches from.
+
+    Parameters:
+    - poll_time (datetime): The time the previous poll (or crawl) started at, timezone aware.
+
+    Returns:
+    - str: The ISO 8601 date, in the `last_edited_time` format of the Notion API.
+    """
+    checkpoint = poll_time.astimezone(timezone.utc) - POLL_OVERLAP
+    return checkpoint.strftime("%Y-%m-%dT%H:%M:00.000Z")
+
+
+def search_edited_pages(since):
+    """Searches the pages edited on or after a date, most recently edited first.
+
+    Parameters:
+    - since (str): The ISO 8601 date, in the `last_edited_time` format of the Notion API.
+
+    Yields:
+    - dict: The edited pages, as returned by the Notion API.
+    """
+    for page in search_pages("page", sort_by_last_edited=True):
+        if page.get("last_edited_time", "") < since:
+            return
+        yield page
+
+
+def get_changed_page_ids(edited_pages):
+    """Maps the edited pages to the exported pages (and databases) to crawl again.
+
+    Parameters:
+    - edited_pages (iterable): The edited pages, as returned by the Notion API.
+
+    Returns:
+    - set: The normalized IDs of the pages and databases to crawl again.
+    """
+    changed_page_ids = set()
+    for page in edited_pages:
+        page_id = normalize_string(page["id"])
+        parent = page.get("parent") or {}
+        parent_id = parent.get("database_id") or parent.get("page_id")
+        if tree_index.get(page_id) is not None:
+            changed_page_ids.add(page_id)
+        # The listing of the parent (or the query of the database) holds the new or edited page
+        if parent_id and tree_index.get(parent_id) is not None:
+            if parent.get("type") == "database_id" or tree_index.get(page_id) is None:
+                changed_page_ids.add(normalize_string(parent_id))
+    return changed_page_ids
+
+
+def get_page_contents(blocks):
+    """Groups the blocks of a crawl by the page they belong to, to be reused by the next crawl.
+
+    Parameters:
+    - blocks (list): The raw blocks of the crawl, in crawl order, registered in the tree index.
+
+    Returns:
+    - dict: The (block, parent ID) content of every page, in crawl order, by normalized page ID.
+      The content of a page holds its child pages, but not their content. The pages without
+      content are listed as well, with an empty content, so they are not fetched again.
+    """
+    page_contents = {}
+    for index, block in enumerate(blocks):
+        if block.get("type") in PAGE_TYPES:
+            page_contents.setdefault(normalize_string(block["id"]), [])
+        node = tree_index.get(block["id"])
+        if index and node is not None and node.nearest_page_id:
+            page_contents.setdefault(node.nearest_page_id, []).append((block, node.parent_id))
+    return page_contents
+
+
+def get_reused_pages(page_contents, changed_page_ids):
+    """Drops the changed pages from the contents to reuse, and from the page details cache.
+
+    Parameters:
+    - page_contents (dict): The content of the pages of the previous crawl, by normalized page ID.
+    - changed_page_ids (set): The normalized IDs of the pages to crawl again.
+
+    Returns:
+    - dict: The content of the unchanged pages, by normalized page ID.
+    """
+    for page_id in changed_page_ids:
+        page_details_cache.pop(page_id, None)
+    return {
+        page_id: content
+        for page_id, content in page_contents.items()
+        if page_id not in changed_page_ids
+    }
+
+
+def next_poll_interval(interval, changed, min_interval, max_interval):
+    """Adapts the poll interval to the edit activity.
+
+    The interval drops to the minimum as soon as edits are found, and doubles at every quiet poll
+    up to the maximum.
+
+    Parameters:
+    - interval (float): The current interval, in seconds.
+    - changed (bool): Whether the last poll found edits.
+    - min_interval (float): The minimum interval, in seconds.
+    - max_interval (float): The maximum interval, in seconds.
+
+    Returns:
+    - float: The interval before the next poll, in seconds.
+    """
+    if changed:
+        return min_interval
+    return min(interval * 2, max_interval)
+
+
+def utc_now():
+    """Returns the current time, timezone aware."""
+    return datetime.now(timezone.utc)
@@ -0,0 +1,384 @@
+"""Static HTML site rendered straight from the export, without an MkDocs build.
+
+For very large wikis the MkDocs build takes longer (and much more memory) than the export itself.
+This emitter renders the exported Markdown pages into a plain static site:
+
+- Every page is rendered on its own into a shared template, in parallel processes.
+- The navigation is a single prebuilt fragment (`_nav.html`) built from the navigation manifest
+  and loaded by every page, so a change of the page tree does not invalidate the pages.
+- A manifest of the content hash of every rendered page and of the copied media files
+  (`.html-manifest.json`) lets the next runs only render the pages whose Markdown changed, and
+  remove the pages and media files that are gone.
+
+The site mirrors the layout of the exported docs folder: `engineering/runbooks.md` becomes
+`engineering/runbooks.html`, next to the media files of the page, which are copied along.
+"""
+
+import glob
+import hashlib
+import html
+import json
+import logging
+import os
+import posixpath
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import markdown
+except ImportError:  # markdown is only needed by the HTML output
+    markdown = None
+
+from m_aux import metrics
+from m_write.nav_manifest import NAV_MANIFEST_FILE
+
+HTML_MANIFEST_FILE = ".html-manifest.json"
+NAV_FRAGMENT_FILE = "_nav.html"
+ASSETS_DIR = "_assets"
+# Bump when the templates or the rendering change, so all the pages are rendered again
+HTML_TEMPLATE_VERSION = 2
+DEFAULT_HTML_WORKERS = os.cpu_count() or 1
+MARKDOWN_EXTENSIONS = ["tables", "fenced_code", "toc", "sane_lists"]
+# Files of the docs folder that are not part of the site
+SKIPPED_DIRS = ["search"]
+
+logger = logging.getLogger(__name__)
+
+MD_LINK_PATTERN = re.compile(r'(href="(?![a-z][a-z0-9+.-]*:)[^"#]*?)\.md(?=[#"])')
+# The videos are exported as images with the `type:video` alt text of the mkdocs-video plugin
+VIDEO_IMG_PATTERN = re.compile(r'<img alt="type:video" src="([^"]*)" />')
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<link rel="stylesheet" href="{root}{assets_dir}/style.css">
+<script src="{root}{assets_dir}/nav.js" defer></script>
+</head>
+<body data-root="{root}">
+<nav id="nav"><noscript><a href="{root}index.html">Home</a></noscript></nav>
+<main>
+{content}
+</main>
+</body>
+</html>
+"""
+
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta http-equiv="refresh" content="0; url={home}">
+<title>{title}</title>
+</head>
+<body><a href="{home}">{title}</a></body>
+</html>
+"""
+
+STYLE_CSS = """body { margin: 0; display: flex; font: 16px/1.6 system-ui, sans-serif; }
+#nav { flex: 0 0 18rem; height: 100vh; position: sticky; top: 0; overflow-y: auto;
+  padding: 1rem; box-sizing: border-box; border-right: 1px solid #ddd; font-size: 14px; }
+#nav ul { list-style: none; margin: 0; padding-left: 1rem; }
+#nav > ul { padding-left: 0; }
+#nav a { color: inherit; text-decoration: none; }
+#nav a.active { font-weight: bold; }
+main { flex: 1; min-width: 0; max-width: 60rem; padding: 1rem 2rem; }
+img, video { max-width: 100%; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #ddd; padding: 0.25rem 0.5rem; }
+pre { background: #f5f5f5; padding: 0.75rem; overflow-x: auto; }
+blockquote { margin: 0; padding-left: 1rem; border-left: 4px solid #ddd; color: #555; }
+"""
+
+NAV_JS = """document.addEventListener("DOMContentLoaded", function () {
+  var root = document.body.dataset.root;
+  var nav = document.getElementById("nav");
+  fetch(root + "_nav.html").then(function (response) {
+    return response.text();
+  }).then(function (fragment) {
+    nav.innerHTML = fragment;
+    nav.querySelectorAll("a").forEach(function (link) {
+      link.href = root + link.getAttribute("href");
+      if (link.href === location.href.split("#")[0]) { link.classList.add("active"); }
+    });
+  });
+});
+"""
+
+
+def to_html_path(md_path):
+    """Returns the path of the HTML page of a Markdown file."""
+    return f"{md_path[:-len('.md')]}.html"
+
+
+def find_docs_dir(export_dir):
+    """Finds the exported docs folder, the one holding the navigation manifest.
+
+    Parameters:
+    - export_dir (str): The root of the export.
+
+    Returns:
+    - str: The docs folder, or None when the export has no navigation manifest.
+    """
+    for manifest_path in [os.path.join(export_dir, NAV_MANIFEST_FILE)] + sorted(
+        glob.glob(os.path.join(export_dir, "*", NAV_MANIFEST_FILE))
+    ):
+        if os.path.isfile(manifest_path):
+            return os.path.dirname(manifest_path)
+    return None
+
+
+def build_nav_fragment(manifest):
+    """Builds the navigation fragment of the site from the navigation manifest.
+
+    Parameters:
+    - manifest (dict): The navigation manifest (see `m_write.nav_manifest`).
+
+    Returns:
+    - str: The nested HTML lists of the pages, with links relative to the root of the site.
+    """
+
+    def link(entry):
+        href = html.escape(to_html_path(entry["path"]))
+        return f'<a href="{href}">{html.escape(entry["title"])}</a>'
+
+    def page_items(page):
+        sub_items = [f"<li>{link(section)}</li>" for section in page.get("sections", [])]
+        sub_items.extend(page_items(child) for child in page.get("children", []))
+        sub_list = f"<ul>{''.join(sub_items)}</ul>" if sub_items else ""
+        return f"<li>{link(page)}{sub_list}</li>"
+
+    home = dict(manifest["home"], title="Home")
+    items = [page_items(home)] + [page_items(page) for page in manifest.get("pages", [])]
+    return f"<ul>{''.join(items)}</ul>\n"
+
+
+def get_page_titles(manifest):
+    """Returns the titles of the pages and sections of the manifest, by Markdown path."""
+    titles = {}
+    pages = [manifest["home"]] + list(manifest.get("pages", []))
+    while pages:
+        page = pages.pop()
+        titles[page["path"]] = page["title"]
+        for section in page.get("sections", []):
+            titles[section["path"]] = section["title"]
+        pages.extend(page.get("children", []))
+    return titles
+
+
+def render_page(docs_dir, html_dir, md_path, title):
+    """Renders a Markdown page into the page template and writes it (atomically).
+
+    Runs in the worker processes.
+
+    Parameters:
+    - docs_dir (str): The exported docs folder.
+    - html_dir (str): The root of the site.
+    - md_path (str): The Markdown file, relative to the docs folder.
+    - title (str): The title of the page.
+    """
+    with open(os.path.join(docs_dir, md_path), encoding="utf-8") as md_file:
+        content = markdown.markdown(md_file.read(), extensions=MARKDOWN_EXTENSIONS)
+    # Links to the other exported pages point to their HTML page
+    content = MD_LINK_PATTERN.sub(r"\1.html", content)
+    content = VIDEO_IMG_PATTERN.sub(r'<video controls src="\1"></video>', content)
+    root = "../" * md_path.count("/")
+    page = PAGE_TEMPLATE.format(
+        title=html.escape(title), root=root, assets_dir=ASSETS_DIR, content=content
+    )
+    write_file_atomic(os.path.join(html_dir, to_html_path(md_path)), page)
+
+
+def write_file_atomic(file_path, content):
+    """Writes a text file through a temporary file renamed into place."""
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as tmp_file:
+        tmp_file.write(content)
+    os.replace(tmp_path, file_path)
+
+
+def write_if_changed(file_path, content):
+    """Writes a text file only when its content changed. Returns True if it was written."""
+    try:
+        with open(file_path, encoding="utf-8") as current_file:
+            if current_file.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    write_file_atomic(file_path, content)
+    return True
+
+
+def scan_docs(docs_dir):
+    """Lists the Markdown pages and the other files (media) of the docs folder.
+
+    Returns:
+    - tuple: The Markdown files and the other files, relative to the docs folder.
+    """
+    md_paths = []
+    media_paths = []
+    for current_dir, dirs, files in os.walk(docs_dir):
+        relative_dir = os.path.relpath(current_dir, docs_dir)
+        dirs[:] = [
+            name
+            for name in dirs
+            if not name.startswith(".") and not (relative_dir == "." and name in SKIPPED_DIRS)
+        ]
+        for file_name in files:
+            if file_name.startswith("."):
+                continue
+            relative_path = posixpath.normpath(
+                posixpath.join(relative_dir.replace(os.sep, "/"), file_name)
+            )
+            (md_paths if file_name.endswith(".md") else media_paths).append(relative_path)
+    return sorted(md_paths), sorted(media_paths)
+
+
+def copy_media(docs_dir, html_dir, media_paths):
+    """Copies the media files that are missing or changed (size or modification time) to the site.
+
+    Returns:
+    - int: The number of copied files.
+    """
+    copied = 0
+    for media_path in media_paths:
+        source = os.path.join(docs_dir, media_path)
+        target = os.path.join(html_dir, media_path)
+        source_stat = os.stat(source)
+        try:
+            target_stat = os.stat(target)
+            if (target_stat.st_size, int(target_stat.st_mtime)) == (
+                source_stat.st_size,
+                int(source_stat.st_mtime),
+            ):
+                continue
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        shutil.copy2(source, target)
+        copied += 1
+    return copied
+
+
+def remove_files(html_dir, relative_paths):
+    """Removes files of the site that are gone from the export.
+
+    Returns:
+    - int: The number of removed files.
+    """
+    removed = 0
+    for relative_path in relative_paths:
+        try:
+            os.remove(os.path.join(html_dir, relative_path))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def page_hash(docs_dir, md_path, title):
+    """Hashes what the HTML of a page is rendered from: its Markdown, title and the templates."""
+    content_hash = hashlib.sha256(f"{HTML_TEMPLATE_VERSION}\n{md_path}\n{title}\n".encode("utf-8"))
+    with open(os.path.join(docs_dir, md_path), "rb") as md_file:
+        content_hash.update(md_file.read())
+    return content_hash.hexdigest()
+
+
+def write_html_site(export_dir, html_dir, workers=DEFAULT_HTML_WORKERS):
+    """Renders the exported Markdown pages into a static HTML site, see the module documentation.
+
+    Parameters:
+    - export_dir (str): The root of the export (directory output).
+    - html_dir (str): The root of the site.
+    - workers (int): The number of processes rendering the pages.
+
+    Returns:
+    - dict: The number of pages rendered, unchanged and removed, and of media files copied and
+      removed.
+
+    Raises:
+    - RuntimeError: If the markdown package is not installed.
+    """
+    if markdown is None:
+        raise RuntimeError("The HTML output needs the markdown package (pip install markdown)")
+    docs_dir = find_docs_dir(export_dir)
+    if docs_dir is None:
+        logger.warning("No navigation manifest in '%s', no HTML site written.", export_dir)
+        return {"rendered": 0, "unchanged": 0, "removed": 0, "media": 0, "media_removed": 0}
+    with open(os.path.join(docs_dir, NAV_MANIFEST_FILE), encoding="utf-8") as manifest_file:
+        nav_manifest = json.load(manifest_file)
+
+    os.makedirs(html_dir, exist_ok=True)
+    html_manifest_path = os.path.join(html_dir, HTML_MANIFEST_FILE)
+    try:
+        with open(html_manifest_path, encoding="utf-8") as manifest_file:
+            previous_manifest = json.load(manifest_file)
+    except FileNotFoundError:
+        previous_manifest = {}
+    previous_hashes = previous_manifest.get("pages", {})
+    previous_media_paths = previous_manifest.get("media", [])
+
+    # Shared files, only rewritten when they change
+    write_if_changed(os.path.join(html_dir, ASSETS_DIR, "style.css"), STYLE_CSS)
+    write_if_changed(os.path.join(html_dir, ASSETS_DIR, "nav.js"), NAV_JS)
+    write_if_changed(os.path.join(html_dir, NAV_FRAGMENT_FILE), build_nav_fragment(nav_manifest))
+    home_path = to_html_path(nav_manifest["home"]["path"])
+    write_if_changed(
+        os.path.join(html_dir, "index.html"),
+        INDEX_TEMPLATE.format(
+            home=html.escape(home_path), title=html.escape(nav_manifest["home"]["title"])
+        ),
+    )
+
+    md_paths, media_paths = scan_docs(docs_dir)
+    titles = get_page_titles(nav_manifest)
+    hashes = {}
+    pages_to_render = []
+    for md_path in md_paths:
+        title = titles.get(md_path) or posixpath.basename(md_path)[: -len(".md")]
+        hashes[md_path] = page_hash(docs_dir, md_path, title)
+        html_exists = os.path.isfile(os.path.join(html_dir, to_html_path(md_path)))
+        if previous_hashes.get(md_path) != hashes[md_path] or not html_exists:
+            pages_to_render.append((md_path, title))
+
+    if pages_to_render:
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(pages_to_render)))) as pool:
+            futures = [
+                pool.submit(render_page, docs_dir, html_dir, md_path, title)
+                for md_path, title in pages_to_render
+            ]
+            for future in futures:
+                future.result()
+    metrics.inc("files_written_total", len(pages_to_render), kind="html")
+
+    removed = remove_files(
+        html_dir, [to_html_path(path) for path in set(previous_hashes) - set(hashes)]
+    )
+    copied = copy_media(docs_dir, html_dir, media_paths)
+    media_removed = remove_files(html_dir, set(previous_media_paths) - set(media_paths))
+    write_file_atomic(
+        html_manifest_path, json.dumps({"pages": hashes, "media": media_paths}, indent=2)
+    )
+
+    summary = {
+        "rendered": len(pages_to_render),
+        "unchanged": len(hashes) - len(pages_to_render),
+        "removed": removed,
+        "media": copied,
+        "media_removed": media_removed,
+    }
+    logger.info(
+        "HTML site '%s' written: %d pages rendered, %d unchanged, %d removed, "
+        "%d media copied, %d removed.",
+        html_dir,
+        summary["rendered"],
+        summary["unchanged"],
+        summary["removed"],
+        summary["media"],
+        summary["media_removed"],
+    )
+    return summary
@@ -0,0 +1,63 @@
+"""Index of the exported pages by Notion ID, used to rewrite internal Notion links.
+
+Any Markdown link pointing to a Notion page that is part of the export (link to page blocks, inline
+links of paragraphs, bullets, bookmarks...) is rewritten to the relative path of the exported file.
+Links to pages outside of the export are left untouched.
+"""
+
+import posixpath
+import re
+
+from m_write.write_helpers import get_output_file_path
+
+# Notion page URLs end with the page ID, with or without hyphens. Samples:
+# https://www.notion.so/<page-name>-328968aac13d4b19b2a6e2b9c257e05c
+# https://www.notion.so/<workspace>/328968aa-c13d-4b19-b2a6-e2b9c257e05c?pvs=4
+# https://<workspace>.notion.site/<page-name>-328968aac13d4b19b2a6e2b9c257e05c
+NOTION_LINK_PATTERN = re.compile(
+    r"\]\((?P<url>https?://(?:[\w-]+\.)?notion\.(?:so|site)/[^)\s]*?"
+    r"(?P<id>[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12})"
+    r"(?:[?#][^)\s]*)?)\)"
+)
+
+
+def build_link_index(blocks):
+    """Builds the index of the exported pages, mapping their normalized ID to their output file.
+
+    Parameters:
+    - blocks (list): The renamed blocks.
+
+    Returns:
+    - dict: The output file (relative to the root of the export) of each page by normalized ID.
+    """
+    return {
+        block["id"]: get_output_file_path(block)
+        for block in blocks
+        if block.get("type") == "child_page"
+    }
+
+
+def rewrite_internal_links(md, source_file, link_index):
+    """Rewrites the links to exported Notion pages found in a Markdown content.
+
+    Parameters:
+    - md (str): The Markdown content to rewrite.
+    - source_file (str): The file the content is written to, relative to the root of the export.
+    - link_index (dict): The index built by `build_link_index`.
+
+    Returns:
+    - str: The Markdown content with the internal links pointing to the exported files.
+    """
+    # Most of the blocks do not link to Notion at all, skip the regular expression for them
+    if "notion." not in md:
+        return md
+
+    source_dir = posixpath.dirname(source_file) or "."
+
+    def replace_link(match):
+        target_file = link_index.get(match.group("id").replace("-", "").lower())
+        if target_file is None:
+            return match.group(0)
+        return f"]({posixpath.relpath(target_file, source_dir)})"
+
+    return NOTION_LINK_PATTERN.sub(replace_link, md)
@@ -0,0 +1,96 @@
+"""Navigation manifest of the export, consumed by the MkDocs entrypoint to build the `nav`.
+
+The manifest is written next to the root page Markdown file (the folder that becomes the MkDocs
+`docs` folder), so all the paths it contains are relative to that folder. Being a dotfile, MkDocs
+does not publish it.
+"""
+
+import json
+import posixpath
+
+from m_write.write_helpers import get_output_file_path
+
+NAV_MANIFEST_FILE = ".nav-manifest.json"
+NAV_MANIFEST_VERSION = 1
+
+
+def get_docs_dir(blocks):
+    """Finds the folder of the root page Markdown file, which becomes the MkDocs `docs` folder.
+
+    Parameters:
+    - blocks (list): The renamed blocks.
+
+    Returns:
+    - str: The folder relative to the root of the export, or None when there is no root page.
+    """
+    for block in blocks:
+        if block.get("type") == "child_page" and block.get("root"):
+            return posixpath.dirname(get_output_file_path(block))
+    return None
+
+
+def build_nav_manifest(blocks, split_pages=None):
+    """Builds the navigation manifest from the renamed blocks.
+
+    Pages keep the order in which they were found in Notion. Each entry holds the page title, the
+    path of its Markdown file and its child pages, plus the sub-pages it was split into, if any.
+
+    Parameters:
+    - blocks (list): The renamed blocks, parent pages first.
+    - split_pages (dict, optional): The (title, file path) of the sub-pages by split page file path.
+
+    Returns:
+    - tuple: The path of the manifest relative to the root of the export and the manifest (dict),
+      or (None, None) when the export has no root page.
+    """
+    split_pages = split_pages or {}
+    pages = [block for block in blocks if block.get("type") == "child_page"]
+    root_page = next((page for page in pages if page.get("root")), None)
+    if root_page is None:
+        return None, None
+
+    docs_dir = get_docs_dir([root_page])
+    nodes_by_id = {}
+    top_level_pages = []
+    for page in pages:
+        file_path = get_output_file_path(page)
+        node = {
+            "title": page.get("title") or page["name"],
+            "path": posixpath.relpath(file_path, docs_dir or "."),
+            "children": [],
+        }
+        if file_path in split_pages:
+            node["sections"] = [
+                {"title": title, "path": posixpath.relpath(path, docs_dir or ".")}
+                for title, path in split_pages[file_path]
+            ]
+        nodes_by_id[page["id"]] = node
+        if page is root_page:
+            continue
+        # The last ID of the path of a page is the page it belongs to
+        parent_node = nodes_by_id.get(page["path"].rpartition("/")[2])
+        if parent_node is None or parent_node is nodes_by_id[root_page["id"]]:
+            top_level_pages.append(node)
+        else:
+            parent_node["children"].append(node)
+
+    home = nodes_by_id[root_page["id"]]
+    manifest = {
+        "version": NAV_MANIFEST_VERSION,
+        "home": {key: value for key, value in home.items() if key != "children"},
+        "pages": top_level_pages,
+    }
+    return posixpath.join(docs_dir, NAV_MANIFEST_FILE), manifest
+
+
+def write_nav_manifest(blocks, backend, split_pages=None):
+    """Builds the navigation manifest and writes it through the output backend.
+
+    Parameters:
+    - blocks (list): The renamed blocks, parent pages first.
+    - backend: The output backend to write to.
+    - split_pages (dict, optional): The (title, file path) of the sub-pages by split page file path.
+    """
+    manifest_path, manifest = build_nav_manifest(blocks, split_pages)
+    if manifest_path is not None:
+        backend.write_text(manifest_path, json.dumps(manifest, indent=2, ensure_ascii=False))
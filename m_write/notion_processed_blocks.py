@@ -1,44 +1,91 @@
 """Module for processing and writing Notion blocks to Markdown files."""
 
-import os
-
-from m_aux.outputs import normalize_string
+from m_aux import metrics
 from m_aux.pretty_print import pretty_print
+from m_aux.profiling import profile_stage
+from m_write.link_index import build_link_index, rewrite_internal_links
+from m_write.nav_manifest import get_docs_dir, write_nav_manifest
+from m_write.output_backends import DirectoryBackend
+from m_write.page_split import split_page
+from m_write.search_index import SearchIndexWriter, get_page_sections
 from m_write.write_helpers import (
-    ensure_dir,
-    get_last_path_occurrence,
+    get_output_file_path,
+    join_md_parts,
     process_block_type,
     rename_to_pages,
-    write_or_append_md_file,
 )
 
 
-def process_and_write(blocks, root_dir):
-    """Processes the blocks and writes them to markdown files and directories."""
-    ensure_dir(root_dir)  # Ensure the root directory exists
+def process_and_write(
+    blocks,
+    root_dir,
+    backend=None,
+    search_index=False,
+    split_max_blocks=None,
+    split_max_bytes=None,
+):
+    """Processes the blocks and writes them to markdown files and directories.
+
+    The Markdown content of the blocks is gathered per file, in blocks order, and every file is then
+    written once through the output backend (a directory under `root_dir` by default). Links to
+    Notion pages that are part of the export are rewritten to the exported files on the way. A
+    navigation manifest of the pages is written as well, for the MkDocs entrypoint to build the nav.
+    Optionally, the search index of the pages is streamed as they are written, and pages going over
+    a number of blocks or bytes are split into sub-pages at their headings.
+
+    The pages kept by incremental runs (database rows edited before the date of the run) are linked
+    to and listed in the navigation, but their files are not written again: the output sync keeps
+    the exported ones.
+
+    Parameters:
+    - blocks (list): The processed blocks to write.
+    - root_dir (str): The root directory of the export.
+    - backend (optional): The output backend to write to. Defaults to a `DirectoryBackend` on root_dir.
+    - search_index (bool): Whether to write the search index of the pages.
+    - split_max_blocks (int, optional): The number of blocks above which a page is split.
+    - split_max_bytes (int, optional): The size in bytes above which a page is split.
+    """
+    if backend is None:
+        backend = DirectoryBackend(root_dir)
 
-    # Sort blocks by path length to ensure parent directories are created first
-    blocks.sort(key=lambda x: x["path"].count("/"))
-    renamed_blocks_id, renamed_blocks = rename_to_pages(blocks)
+    with metrics.stage("rename"), profile_stage("rename"):
+        # Sort blocks by path length to ensure parent pages are processed first
+        blocks.sort(key=lambda x: x["path"].count("/"))
+        renamed_blocks_id, renamed_blocks = rename_to_pages(blocks)
     pretty_print(renamed_blocks, "Renamed Blocks")
+    link_index = build_link_index(renamed_blocks)
 
+    md_files = {}
+    # Files of the pages kept as they were exported (database rows of incremental runs)
+    kept_files = set()
     for block in renamed_blocks:
-        block = process_block_type(renamed_blocks_id, block, root_dir)
-        # Creates the appropriate directory structure and files based on pages only
-        if block.get("type") == "child_page":
-            # If the path and md matches, then it is the root
-            if block.get("root"):
-                # Create a directory for the block
-                block_dir = os.path.join(root_dir, block["named_path"])
-            else:
-                # For any other pages it appends the name (of the page) to the root path
-                block_dir = os.path.join(root_dir, block["named_path"], block["name"])
-            ensure_dir(block_dir)
-            file_path = os.path.join(block_dir, f"{block['name']}.md")
-            write_or_append_md_file(file_path, block.get("md", ""))
-        elif block.get("type") == "parent_root_page":
+        block = process_block_type(renamed_blocks_id, block, backend)
+        # Pages get their own file, any other block is appended to the file of its page
+        file_path = get_output_file_path(block)
+        if file_path is None:
             continue
-        else:
-            target_file_name = get_last_path_occurrence(block["named_path"])
-            file_path = os.path.join(root_dir, block["named_path"], f"{target_file_name}.md")
-            write_or_append_md_file(file_path, block.get("md", ""))
+        if block.get("kept"):
+            kept_files.add(file_path)
+        md = rewrite_internal_links(block.get("md", ""), file_path, link_index)
+        md_files.setdefault(file_path, []).append((block.get("type"), md, block.get("text")))
+
+    docs_dir = get_docs_dir(renamed_blocks)
+    search_writer = (
+        SearchIndexWriter(backend, docs_dir) if search_index and docs_dir is not None else None
+    )
+    split_pages = {}
+    for file_path, parts in md_files.items():
+        if file_path in kept_files:
+            continue
+        split_files = split_page(file_path, parts, split_max_blocks, split_max_bytes)
+        if len(split_files) > 1:
+            split_pages[file_path] = [(title, path) for path, _, title in split_files[1:]]
+        for split_file_path, split_parts, _ in split_files:
+            backend.write_text(split_file_path, join_md_parts(split_parts))
+            metrics.inc("files_written_total", kind="markdown")
+            if search_writer:
+                search_writer.add_page(split_file_path, get_page_sections(split_parts))
+    if search_writer:
+        search_writer.close()
+
+    write_nav_manifest(renamed_blocks, backend, split_pages)
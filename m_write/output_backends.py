@@ -0,0 +1,210 @@
+"""Output backends the processed blocks are written to.
+
+All backends share the same layout: paths are relative to the root of the export, exactly as
+`process_and_write` lays out the markdown files and media in a directory.
+"""
+
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+
+ARCHIVE_EXTENSIONS = {"tar.gz": ".tar.gz", "zip": ".zip"}
+
+
+class DirectoryBackend:
+    """Writes the export as a directory tree under `root_dir`."""
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _target_path(self, relative_path):
+        target_path = os.path.join(self.root_dir, relative_path)
+        os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+        return target_path
+
+    def write_text(self, relative_path, content):
+        """Writes a whole text file.
+
+        Parameters:
+        - relative_path (str): The path of the file, relative to the root of the export.
+        - content (str): The content of the file.
+        """
+        with open(self._target_path(relative_path), "w", encoding="utf-8") as file:
+            file.write(content)
+
+    def write_stream(self, relative_path, chunks):
+        """Writes a binary file from an iterable of chunks (e.g. a download).
+
+        Parameters:
+        - relative_path (str): The path of the file, relative to the root of the export.
+        - chunks (iterable): The bytes chunks of the file.
+        """
+        with open(self._target_path(relative_path), "wb") as file:
+            for chunk in chunks:
+                file.write(chunk)
+
+    def open_text(self, relative_path):
+        """Opens a text file to be written incrementally. The caller closes it.
+
+        Parameters:
+        - relative_path (str): The path of the file, relative to the root of the export.
+
+        Returns:
+        - A writable text file object.
+        """
+        return open(self._target_path(relative_path), "w", encoding="utf-8")
+
+    def close(self):
+        """Nothing to release, files are closed as soon as they are written."""
+
+
+class ArchiveBackend:
+    """Streams the export straight into a `.tar.gz` or `.zip` archive.
+
+    Nothing is materialized in a directory tree. The archive is written to a temporary file next to
+    the target and only renamed into place when it is closed without errors.
+    """
+
+    # Media bigger than this is spooled to a temporary file instead of memory before entering a tar
+    SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, archive_path):
+        if archive_path.endswith(ARCHIVE_EXTENSIONS["zip"]):
+            self.archive_format = "zip"
+        elif archive_path.endswith(ARCHIVE_EXTENSIONS["tar.gz"]):
+            self.archive_format = "tar.gz"
+        else:
+            raise ValueError(f"Unsupported archive extension for '{archive_path}'")
+
+        self.archive_path = archive_path
+        self.tmp_path = f"{archive_path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+        if self.archive_format == "zip":
+            self.archive = zipfile.ZipFile(self.tmp_path, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            self.archive = tarfile.open(self.tmp_path, "w:gz")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.archive.close()
+            os.remove(self.tmp_path)
+
+    def _add_tar_member(self, relative_path, file_obj, size):
+        tar_info = tarfile.TarInfo(relative_path)
+        tar_info.size = size
+        tar_info.mtime = int(time.time())
+        self.archive.addfile(tar_info, file_obj)
+
+    def write_text(self, relative_path, content):
+        """Adds a whole text file to the archive.
+
+        Parameters:
+        - relative_path (str): The path of the file, relative to the root of the export.
+        - content (str): The content of the file.
+        """
+        data = content.encode("utf-8")
+        if self.archive_format == "zip":
+            self.archive.writestr(relative_path, data)
+        else:
+            with tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_SIZE) as spool:
+                spool.write(data)
+                spool.seek(0)
+                self._add_tar_member(relative_path, spool, len(data))
+
+    def write_stream(self, relative_path, chunks):
+        """Adds a binary file to the archive from an iterable of chunks (e.g. a download).
+
+        Zip members are streamed directly, with ZIP64 headers since their size is not known up
+        front (a member past 2 GiB would fail otherwise). Tar members need their size up front,
+        so the chunks are spooled first (in memory, or on disk for big files).
+
+        Parameters:
+        - relative_path (str): The path of the file, relative to the root of the export.
+        - chunks (iterable): The bytes chunks of the file.
+        """
+        if self.archive_format == "zip":
+            member_info = zipfile.ZipInfo(relative_path, time.localtime()[:6])
+            member_info.compress_type = zipfile.ZIP_DEFLATED
+            with self.archive.open(member_info, "w", force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+        else:
+            with tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_SIZE) as spool:
+                for chunk in chunks:
+                    spool.write(chunk)
+                size = spool.tell()
+                spool.seek(0)
+                self._add_tar_member(relative_path, spool, size)
+
+    def open_text(self, relative_path):
+        """Opens a text member to be written incrementally. The caller closes it.
+
+        Several members may be open at the same time, so their content is spooled (memory, then
+        disk past `SPOOL_MAX_SIZE`) and only added to the archive when they are closed.
+
+        Parameters:
+        - relative_path (str): The path of the file, relative to the root of the export.
+
+        Returns:
+        - A writable text file object.
+        """
+        return ArchiveTextMember(self, relative_path)
+
+    def close(self):
+        """Finishes the archive and moves it into place."""
+        self.archive.close()
+        os.replace(self.tmp_path, self.archive_path)
+
+
+class ArchiveTextMember:
+    """Text member of an archive being written incrementally, see `ArchiveBackend.open_text`."""
+
+    def __init__(self, backend, relative_path):
+        self.backend = backend
+        self.relative_path = relative_path
+        self.spool = tempfile.SpooledTemporaryFile(max_size=ArchiveBackend.SPOOL_MAX_SIZE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, content):
+        self.spool.write(content.encode("utf-8"))
+
+    def close(self):
+        if self.spool.closed:
+            return
+        self.spool.seek(0)
+        self.backend.write_stream(self.relative_path, iter(lambda: self.spool.read(65536), b""))
+        self.spool.close()
+
+
+def get_archive_path(outputs_dir, archive_format):
+    """Calculates the archive path for an output directory, adding the extension if missing.
+
+    Parameters:
+    - outputs_dir (str): The output directory (or archive path) given in the CLI.
+    - archive_format (str): Either "tar.gz" or "zip".
+
+    Returns:
+    - str: The path of the archive.
+    """
+    extension = ARCHIVE_EXTENSIONS[archive_format]
+    outputs_dir = outputs_dir.rstrip("/")
+    return outputs_dir if outputs_dir.endswith(extension) else f"{outputs_dir}{extension}"
@@ -0,0 +1,127 @@
+"""Splitting of oversized pages into sub-pages at heading boundaries.
+
+A page above the configured number of blocks or bytes is split at its `heading_1` / `heading_2`
+blocks. The content before the first heading stays in the page file, which becomes an index linking
+to the sub-pages. Every sub-page is written next to the page file, titled after its heading, and
+links to anchors of the page are fixed up to point to the sub-page holding the anchor.
+"""
+
+import logging
+import posixpath
+import re
+
+from m_parse.markdown_processing_helpers import (
+    markdown_heading_anchor,
+    markdown_headings,
+)
+
+SPLIT_HEADING_TYPES = ["heading_1", "heading_2"]
+HEADING_TYPES = ["heading_1", "heading_2", "heading_3"]
+# Anchors are truncated in sub-page file names to keep paths short
+MAX_SLUG_LENGTH = 50
+
+logger = logging.getLogger(__name__)
+
+ANCHOR_LINK_PATTERN = re.compile(r"\]\(#(?P<anchor>[^)\s]+)\)")
+
+
+def is_oversized(parts, max_blocks=None, max_bytes=None):
+    """Checks if the parts of a page go over the configured thresholds.
+
+    Parameters:
+    - parts (list): The (block type, Markdown, plain text) parts of the page.
+    - max_blocks (int, optional): The maximum number of blocks of a page.
+    - max_bytes (int, optional): The maximum size of a page in bytes.
+
+    Returns:
+    - bool: True if the page has to be split.
+    """
+    if max_blocks and len(parts) > max_blocks:
+        return True
+    if max_bytes and sum(len(md.encode("utf-8")) for _, md, _ in parts) > max_bytes:
+        return True
+    return False
+
+
+def fix_anchor_links(md, file_name, anchor_files):
+    """Points the links to anchors of the original page to the sub-page holding the anchor."""
+    if "](#" not in md:
+        return md
+
+    def replace_link(match):
+        target_file = anchor_files.get(match.group("anchor"))
+        if target_file is None or target_file == file_name:
+            return match.group(0)
+        return f"]({target_file}#{match.group('anchor')})"
+
+    return ANCHOR_LINK_PATTERN.sub(replace_link, md)
+
+
+def split_page(file_path, parts, max_blocks=None, max_bytes=None):
+    """Splits a page into an index page and sub-pages when it goes over the thresholds.
+
+    Parameters:
+    - file_path (str): The Markdown file of the page, relative to the root of the export.
+    - parts (list): The (block type, Markdown, plain text) parts of the page, in writing order.
+    - max_blocks (int, optional): The maximum number of blocks of a page.
+    - max_bytes (int, optional): The maximum size of a page in bytes.
+
+    Returns:
+    - list: The (file path, parts, title) of the files to write. The page file comes first, with
+      a None title. A page that is not split is returned as the only file.
+    """
+    if not is_oversized(parts, max_blocks, max_bytes):
+        return [(file_path, parts, None)]
+
+    # Group the parts by section, the first one being the content before the first heading
+    sections = [[]]
+    for part in parts:
+        if part[0] in SPLIT_HEADING_TYPES and part[2]:
+            sections.append([])
+        sections[-1].append(part)
+    if len(sections) == 1:
+        logger.warning("Page '%s' is oversized but has no heading to be split at.", file_path)
+        return [(file_path, parts, None)]
+
+    page_dir = posixpath.dirname(file_path)
+    page_name = posixpath.basename(file_path)[: -len(".md")]
+    sub_pages = []
+    for position, section in enumerate(sections[1:], start=1):
+        title = section[0][2]
+        slug = markdown_heading_anchor(title)[:MAX_SLUG_LENGTH].strip("-") or "section"
+        sub_file_name = f"{page_name}_{position:02d}_{slug}.md"
+        # The heading becomes the title of the sub-page
+        sub_parts = [("heading_page", markdown_headings(title), title)] + section[1:]
+        sub_pages.append((sub_file_name, sub_parts, title))
+
+    # Anchors of the original page and the file holding them, to fix up the intra-page links
+    anchor_files = {}
+    for sub_file_name, sub_parts, _ in sub_pages:
+        for block_type, _, text in sub_parts:
+            if block_type in HEADING_TYPES + ["heading_page"] and text:
+                anchor_files.setdefault(markdown_heading_anchor(text), sub_file_name)
+
+    index_links = "\n".join(
+        f"- [{title}]({sub_file_name})" for sub_file_name, _, title in sub_pages
+    )
+    page_parts = sections[0] + [("split_index", index_links, None)]
+    files = [(file_path, page_parts, None)] + [
+        (posixpath.join(page_dir, sub_file_name), sub_parts, title)
+        for sub_file_name, sub_parts, title in sub_pages
+    ]
+
+    return [
+        (
+            split_file_path,
+            [
+                (
+                    block_type,
+                    fix_anchor_links(md, posixpath.basename(split_file_path), anchor_files),
+                    text,
+                )
+                for block_type, md, text in split_parts
+            ],
+            title,
+        )
+        for split_file_path, split_parts, title in files
+    ]
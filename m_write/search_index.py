@@ -0,0 +1,168 @@
+"""Search index of the export, in the MkDocs (Material theme) `search_index.json` format.
+
+The index is streamed doc by doc while the pages are written, so it never has to be built in memory:
+
+- `search/search_index.json`: the whole index, served to the browser by the theme.
+- `search/sections/<section>.json`: one shard per top level section of the wiki (same format), for very large
+  wikis where the whole index is too big to be loaded at once.
+
+Both are written under the `docs` folder (next to the root page), so MkDocs publishes them as they
+are. When they exist, the MkDocs entrypoint disables the indexing of the search plugin.
+"""
+
+import json
+import os
+import posixpath
+import tempfile
+from collections import OrderedDict
+from itertools import chain
+
+from m_parse.markdown_processing_helpers import markdown_heading_anchor
+
+SEARCH_INDEX_DIR = "search"
+SEARCH_INDEX_FILE = "search_index.json"
+SEARCH_SHARDS_DIR = "sections"
+HOME_SECTION = "home"
+
+# Same configuration the Material search plugin writes with its default settings
+SEARCH_INDEX_CONFIG = {
+    "lang": ["en"],
+    "separator": r"[\s\-,:!=\[\]()\"`/]+|\.(?!\d)|&[lg]t;|(?!\b)(?=[A-Z][a-z])",
+    "pipeline": ["stopWordFilter"],
+}
+
+INDEX_HEADER = f'{{"config": {json.dumps(SEARCH_INDEX_CONFIG)}, "docs": ['
+INDEX_FOOTER = "\n]}\n"
+# Section shards being written at most, see `SearchIndexWriter`
+MAX_OPEN_SHARDS = 16
+
+HEADING_TYPES = ["heading_1", "heading_2", "heading_3"]
+# Parts holding the title of a page: the page itself or the heading a split sub-page starts with
+PAGE_TITLE_TYPES = ["child_page", "heading_page"]
+
+
+def page_location(file_path):
+    """Calculates the URL of a page relative to the site root (MkDocs `use_directory_urls`).
+
+    Parameters:
+    - file_path (str): The Markdown file of the page, relative to the docs folder.
+
+    Returns:
+    - str: The location of the page, e.g. "engineering/runbooks/" for "engineering/runbooks.md".
+    """
+    location = file_path[: -len(".md")] if file_path.endswith(".md") else file_path
+    if posixpath.basename(location) in ["index", "README"]:
+        location = posixpath.dirname(location)
+    return f"{location}/" if location else ""
+
+
+def get_page_sections(parts):
+    """Groups the plain text of the parts of a page by section.
+
+    Parameters:
+    - parts (list): The (block type, Markdown, plain text) parts written to the page.
+
+    Returns:
+    - list: The sections of the page as (title, plain texts) tuples. The first one is the page
+      itself, the others start at a heading.
+    """
+    sections = []
+    for block_type, _, text in parts:
+        if block_type in PAGE_TITLE_TYPES and not sections:
+            sections.append((text or "", []))
+        elif block_type in HEADING_TYPES and text:
+            sections.append((text, []))
+        elif text:
+            if not sections:
+                sections.append(("", []))
+            sections[-1][1].append(text)
+    return sections
+
+
+class SearchIndexWriter:
+    """Streams the search docs of the pages into the whole index and its section shards.
+
+    The whole index is streamed into the export. The shards are spooled into a temporary folder
+    and copied into the export when the writer is closed: at most `MAX_OPEN_SHARDS` of them are
+    open at a time, the least recently written one is closed and reopened (appending) when it
+    gets a doc again. The pages come depth first, so the shard of a section is seldom reopened.
+    """
+
+    def __init__(self, backend, docs_dir):
+        self.backend = backend
+        self.docs_dir = docs_dir
+        self.index_file = backend.open_text(self._export_path(SEARCH_INDEX_FILE))
+        self.index_file.write(INDEX_HEADER)
+        self.index_empty = True
+        self.shards_dir = tempfile.TemporaryDirectory(prefix="search_shards_")
+        # Spool file of every shard, in the order the shards got their first doc
+        self.shard_paths = {}
+        # Open spool files, the least recently written first
+        self.open_shards = OrderedDict()
+
+    def _export_path(self, file_name):
+        return posixpath.join(self.docs_dir, SEARCH_INDEX_DIR, file_name)
+
+    def _write_shard_doc(self, shard, doc):
+        shard_file = self.open_shards.pop(shard, None)
+        separator = ",\n"
+        if shard_file is None:
+            if len(self.open_shards) >= MAX_OPEN_SHARDS:
+                self.open_shards.popitem(last=False)[1].close()
+            if shard not in self.shard_paths:
+                separator = "\n"
+                shard_file_name = f"{len(self.shard_paths)}.json"
+                self.shard_paths[shard] = os.path.join(self.shards_dir.name, shard_file_name)
+            shard_file = open(self.shard_paths[shard], "a", encoding="utf-8")
+        self.open_shards[shard] = shard_file
+        shard_file.write(separator + doc)
+
+    def add_page(self, file_path, sections):
+        """Adds the docs of a page: one for the page itself and one per heading section.
+
+        Parameters:
+        - file_path (str): The Markdown file of the page, relative to the root of the export.
+        - sections (list): The sections of the page as (title, plain texts) tuples. The first one
+          is the page itself, the others start at a heading.
+        """
+        relative_path = posixpath.relpath(file_path, self.docs_dir or ".")
+        location = page_location(relative_path)
+        top_level = relative_path.split("/")[0]
+        section = HOME_SECTION if top_level == relative_path else top_level
+        shard = posixpath.join(SEARCH_SHARDS_DIR, f"{section}.json")
+
+        anchors = set()
+        for position, (title, texts) in enumerate(sections):
+            doc_location = location
+            if position > 0:
+                # Same de-duplication of repeated anchors as the Python-Markdown toc extension
+                anchor = base_anchor = markdown_heading_anchor(title)
+                suffix = 1
+                while anchor in anchors:
+                    anchor = f"{base_anchor}_{suffix}"
+                    suffix += 1
+                anchors.add(anchor)
+                doc_location = f"{location}#{anchor}"
+            doc = json.dumps(
+                {"location": doc_location, "title": title, "text": " ".join(texts)},
+                ensure_ascii=False,
+            )
+            self.index_file.write(("\n" if self.index_empty else ",\n") + doc)
+            self.index_empty = False
+            self._write_shard_doc(shard, doc)
+
+    def close(self):
+        """Terminates and closes the whole index, and copies the shards into the export."""
+        self.index_file.write(INDEX_FOOTER)
+        self.index_file.close()
+        for shard_file in self.open_shards.values():
+            shard_file.close()
+        self.open_shards.clear()
+        for shard, shard_path in self.shard_paths.items():
+            with open(shard_path, "rb") as shard_file:
+                chunks = iter(lambda: shard_file.read(65536), b"")
+                self.backend.write_stream(
+                    self._export_path(shard),
+                    chain([INDEX_HEADER.encode("utf-8")], chunks, [INDEX_FOOTER.encode("utf-8")]),
+                )
+        self.shards_dir.cleanup()
@@ -1,13 +1,11 @@
 import os
-import uuid
 
-from m_aux.outputs import (
-    download_and_save_image_or_video,
-    find_relative_path,
-    normalize_string,
-)
+from m_aux.outputs import download_and_save_image_or_video, normalize_string
 from m_aux.pretty_print import pretty_print
 
+# Blocks rendered as a single row of the table above them, so they are not separated by a blank line
+TABLE_ROW_TYPES = ["database_index_row", "table_row"]
+
 
 def ensure_dir(directory):
     """Ensures that a directory exists. If the directory does not exist, it is created.
@@ -19,21 +17,53 @@ def ensure_dir(directory):
         os.makedirs(directory)
 
 
-def write_or_append_md_file(file_path, content):
-    """Writes or appends Markdown content to a file.
+def join_md_parts(parts):
+    """Joins the Markdown content of the blocks written to the same file.
+
+    Every block is separated from the previous one by an empty line, except the table rows that
+    continue the table above them, and the file ends with a newline.
+
+    Parameters:
+    - parts (list): The (block type, Markdown, plain text) parts of the file, in writing order.
+
+    Returns:
+    - str: The content of the Markdown file.
+    """
+    content = []
+    for block_type, md, _ in parts:
+        if content:
+            content.append("\n" if block_type in TABLE_ROW_TYPES else "\n\n")
+        content.append(md)
+    content.append("\n")
+    return "".join(content)
+
+
+def get_output_file_path(block):
+    """Calculates the Markdown file a block is written to, relative to the root of the export.
 
-    If the file exists, appends the content to it with a preceding newline character.
-    Otherwise, creates a new file and writes the content.
+    Pages get their own directory (named after the page) with a Markdown file of the same name,
+    except for the root page that is written directly under its named path. Any other block is
+    appended to the file of the page it belongs to.
 
     Parameters:
-    - file_path (str): The path of the file to write to or append.
-    - content (str): The Markdown content to write or append.
+    - block (dict): The renamed block.
+
+    Returns:
+    - str: The relative path of the Markdown file, or None if the block is not written.
     """
-    mode = "a" if os.path.exists(file_path) else "w"
-    with open(file_path, mode, encoding="utf-8") as md_file:
-        if mode == "a":
-            md_file.write("\n")
-        md_file.write(content + "\n")
+    if block.get("type") == "child_page":
+        # If the path and md matches, then it is the root
+        if block.get("root"):
+            block_dir = block["named_path"]
+        else:
+            # For any other pages it appends the name (of the page) to the root path
+            block_dir = os.path.join(block["named_path"], block["name"])
+        return os.path.join(block_dir, f"{block['name']}.md")
+    elif block.get("type") == "parent_root_page":
+        return None
+
+    target_file_name = get_last_path_occurrence(block["named_path"])
+    return os.path.join(block["named_path"], f"{target_file_name}.md")
 
 
 def get_md_content(block):
@@ -49,34 +79,32 @@ def get_md_content(block):
 
 
 def rename_to_pages(blocks):
-    """Renames blocks to 'pages' and processes them based on their type.
+    """Resolves the named path ('pages' path) of every block in place.
 
-    This function takes a list of blocks as input. Each block is a dictionary that includes an 'id' and a 'type'.
+    This function takes a list of blocks as input. Each block is a dictionary that includes an 'id', a
+    'type' and a 'path' made of the normalized IDs of its parent pages separated by slashes ("/").
     The function first pre processes the blocks to create a mapping of block IDs to blocks.
 
-    It then iterates over the blocks. For each block, it creates a copy and fetches its renamed path.
-    The renamed path is a string of block names separated by slashes ("/"), which is fetched by calling the
-    'get_renamed_path' function with the block ID.
-
-    The function then processes the block based on its type by calling the 'process_block_type' function.
-    The processed block is then appended to the list of renamed blocks.
-
-    Finally, the function pre processes the renamed blocks again to create a new mapping of block IDs to blocks,
-    and returns this mapping along with the list of renamed blocks.
+    It then resolves the named path of each block by calling 'get_renamed_path'. The named paths are
+    memoized by their ID path, so each page prefix of the tree is resolved only once and the blocks
+    below it inherit the already resolved prefix. Blocks are updated in place and never copied, so
+    renaming is linear in the number of blocks.
 
     Args:
         blocks (list): The blocks to rename.
 
     Returns:
-        tuple: A tuple containing a dictionary mapping block IDs to blocks and a list of renamed blocks.
+        tuple: A tuple containing a dictionary mapping block IDs to blocks and the list of renamed blocks.
     """
     blocks_by_id, _blocks = preprocess_blocks(blocks)
-    renamed_blocks = []
+    named_paths = {}
     for block in _blocks:
-        rename_block = block.copy()
-        rename_block["named_path"] = get_renamed_path(blocks_by_id, block["id"])
-        renamed_blocks.append(rename_block)
-    return preprocess_blocks(renamed_blocks)
+        block["named_path"] = get_renamed_path(blocks_by_id, block["id"], named_paths)
+        # Keep the "parent_root_page" trace in sync with the root block it was created from
+        parent_root_block = blocks_by_id.get(block.get("path"))
+        if block.get("root") and parent_root_block and parent_root_block is not block:
+            parent_root_block["named_path"] = block["named_path"]
+    return blocks_by_id, _blocks
 
 
 def preprocess_blocks(blocks):
@@ -99,42 +127,66 @@ def preprocess_blocks(blocks):
     return blocks_by_id, blocks
 
 
-def get_renamed_path(blocks_by_id, block_id):
+def get_renamed_path(blocks_by_id, block_id, named_paths=None):
     """Fetches the renamed path for a block by its ID.
 
     This function takes a dictionary mapping block IDs to blocks and a block ID as input.
     It then fetches the block corresponding to the given ID and retrieves its path.
     The path is a string of block IDs separated by slashes ("/").
 
-    The function then splits the path into individual block IDs and iterates over them.
-    For each block ID in the path, it fetches the corresponding block and checks its type.
-    If the block type is "child_page", it appends the block's name to the result path.
-    If the block type is "parent_root_page" and the path contains only one block ID,
-    it also appends the block's name to the result path.
-
-    Finally, the function joins the result path back into a string, with block names separated by slashes,
-    and returns this string.
+    Every block of type "child_page" found in the path contributes its name to the result path.
+    If the path contains only one block ID and it references the "parent_root_page", its name is
+    used as well.
 
     Args:
         blocks_by_id (dict): A dictionary mapping block IDs to blocks.
         block_id (str): The ID of the block for which to fetch the renamed path.
+        named_paths (dict, optional): Memo of already resolved ID paths, shared between calls.
 
     Returns:
         str: The renamed path for the block, with block names separated by slashes.
     """
     block = blocks_by_id.get(block_id)
-    result_path = []
-    splitted_path = block.get("path").split("/")
+    path = block.get("path")
+
+    # We would like to substitute only for the root block for the "parent_root_page" type
+    if "/" not in path:
+        block_ref = blocks_by_id.get(path)
+        if block_ref and block_ref.get("type") in ["child_page", "parent_root_page"]:
+            return block_ref["name"]
+        return ""
+
+    return resolve_named_path(blocks_by_id, path, named_paths if named_paths is not None else {})
+
+
+def resolve_named_path(blocks_by_id, path, named_paths):
+    """Resolves an ID path into its named path, memoizing every prefix on the way.
+
+    The path is walked upwards until a prefix that was already resolved is found. Only the missing
+    levels are then resolved, each one appending the name of its page (if it is a "child_page") to
+    the named path of its parent level.
+
+    Parameters:
+    - blocks_by_id (dict): A dictionary mapping block IDs to blocks.
+    - path (str): The ID path to resolve, with block IDs separated by slashes.
+    - named_paths (dict): Memo of already resolved ID paths. It is updated in place.
+
+    Returns:
+    - str: The named path, with block names separated by slashes.
+    """
+    pending = []
+    prefix = path
+    while prefix and prefix not in named_paths:
+        pending.append(prefix)
+        prefix = prefix.rpartition("/")[0]
 
-    for path_ref in splitted_path:
-        block_ref = blocks_by_id.get(path_ref)
-        if block_ref:
-            if block_ref.get("type") == "child_page":
-                result_path.append(block_ref["name"])
-            # We would like to substitute only for the root block for the "parent_root_page" type
-            elif block_ref.get("type") == "parent_root_page" and len(splitted_path) == 1:
-                result_path.append(block_ref["name"])
-    return "/".join(result_path)
+    named_path = named_paths.get(prefix, "")
+    for level in reversed(pending):
+        block_ref = blocks_by_id.get(level.rpartition("/")[2])
+        if block_ref and block_ref.get("type") == "child_page":
+            named_path = f"{named_path}/{block_ref['name']}" if named_path else block_ref["name"]
+        named_paths[level] = named_path
+    return named_path
 
 
 def get_last_path_occurrence(input_path: str):
@@ -156,11 +208,11 @@ def get_last_path_occurrence(input_path: str):
 ##################################################
 
 
-def process_block_type(blocks_by_id, block, root_dir):
+def process_block_type(blocks_by_id, block, backend):
     """Dispatches the block to the appropriate processing function based on its type."""
     # Map of block types to their processing functions
+    # Links to pages ("link_to_page" included) are rewritten afterwards with the global link index
     type_processing_map = {
-        "link_to_page": process_link_to_page,
         "video": process_image_or_video,
         "image": process_image_or_video,
     }
@@ -170,36 +222,24 @@ def process_block_type(blocks_by_id, block, root_dir):
 
     # If a processing function is found, call it, otherwise return the block unchanged
     if process_func:
-        return process_func(blocks_by_id, block, root_dir)
+        return process_func(blocks_by_id, block, backend)
     else:
         return block
 
 
-def process_link_to_page(blocks_by_id, block, root_dir):
-    """Processes a 'link_to_page' block."""
-    reference_block_id = block.get("external_url")
-    if reference_block_id:
-        # Based on Notion structure of urls. Sample: https://www.notion.so/<page-name>-328968aac13d4b19b2a6e2b9c257e05c
-        reference_block = blocks_by_id.get(reference_block_id.split("-")[-1])
-        if reference_block:
-            relative_path = find_relative_path(block["named_path"], reference_block["named_path"])
-            block[
-                "md"
-            ] = f"[{reference_block['name']}]({relative_path}/{reference_block['name']}.md)"
-    return block
-
-
-def process_image_or_video(blocks_by_id, block, root_dir):
+def process_image_or_video(blocks_by_id, block, backend):
     pretty_print(block, "Processing Image or Video")
     caption = block.get("caption")
     extension = "png" if block.get("type") == "image" else "mp4"
+    # The block ID keeps the media file name stable between runs, so unchanged media is not synced again
     if caption in [None, "linked video", "linked image"]:
-        caption = str(uuid.uuid4())
+        caption = block.get("id")
     prefix = caption if block.get("type") == "image" else "type:video"
     if download_and_save_image_or_video(
         block.get("external_url"),
         block.get("type"),
-        f'{root_dir}/{block.get("named_path")}/{caption}',
+        os.path.join(block.get("named_path"), caption),
+        backend,
     ):
         block["md"] = f"![{prefix}](./{caption}.{extension})"
     return block
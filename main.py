@@ -1,11 +1,213 @@
 import argparse
+import json
+import logging
+import os
+import shutil
+import time
 
-from m_aux.outputs import prepare_output_folder
+from m_aux import metrics
+from m_aux.logs import setup_logging
+from m_aux.outputs import (
+    prepare_output_folder,
+    prepare_staging_folder,
+    set_offline_media_source,
+    set_reused_media_dir,
+    sync_output_folder,
+)
 from m_aux.pretty_print import pretty_print
+from m_aux.profiling import (
+    DEFAULT_TOP_ALLOCATIONS,
+    PROFILE_DIR,
+    enable_profiling,
+    profile_stage,
+)
+from m_aux.progress import DEFAULT_PROGRESS_INTERVAL, progress
 from m_config.notion_client import set_log_level
 from m_parse.dispatch import dispatch_blocks_parsing
+from m_parse.render_cache import DEFAULT_RENDER_CACHE_MAX_ENTRIES, render_cache
+from m_search.crawl_filters import CrawlFilter
+from m_search.crawl_plan import DEFAULT_PLAN_MAX_CALLS, plan_export
 from m_search.notion_blocks import fetch_and_process_block_hierarchy
+from m_search.page_discovery import DEFAULT_CRAWL_WORKERS, crawl_pages
+from m_search.snapshot import load_snapshot
+from m_search.watch import (
+    DEFAULT_WATCH_INTERVAL,
+    DEFAULT_WATCH_MAX_INTERVAL,
+    get_changed_page_ids,
+    get_page_contents,
+    get_poll_checkpoint,
+    get_reused_pages,
+    next_poll_interval,
+    search_edited_pages,
+    utc_now,
+)
+from m_write.html_site import DEFAULT_HTML_WORKERS, write_html_site
 from m_write.notion_processed_blocks import process_and_write
+from m_write.output_backends import ArchiveBackend, get_archive_path
+
+logger = logging.getLogger(__name__)
+
+
+def get_write_options(args):
+    """Gathers the `process_and_write` options given in the CLI."""
+    return {
+        "search_index": args.search_index,
+        "split_max_blocks": args.split_max_blocks,
+        "split_max_bytes": args.split_max_bytes,
+    }
+
+
+def get_crawl_filter(args):
+    """Builds the crawl filters given in the CLI."""
+    return CrawlFilter(args.include, args.exclude, args.max_depth, args.sample)
+
+
+def is_filtered_run(args):
+    """Checks if the crawl filters given in the CLI prune the export."""
+    return bool(
+        args.include or args.exclude or args.max_depth is not None or args.sample is not None
+    )
+
+
+def write_directory_output(processed_blocks, args):
+    """Renders the export into a staging folder and syncs it into the output folder."""
+    staging_dir = prepare_staging_folder(args.outputs_dir)
+    try:
+        process_and_write(processed_blocks, staging_dir, **get_write_options(args))
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    # Only the files whose content changed are replaced in the output folder
+    # Incremental runs only render the updated database rows, the other files are kept
+    # Filtered runs only render a part of the wiki, the files of the rest are kept
+    sync_summary = sync_output_folder(
+        staging_dir,
+        args.outputs_dir,
+        preserved_dirs=[PROFILE_DIR],
+        remove_stale=not (args.since or is_filtered_run(args)),
+    )
+    logger.info(
+        "Output folder '%s' synced: %d added, %d changed, %d removed, %d unchanged.",
+        args.outputs_dir,
+        sync_summary["added"],
+        sync_summary["changed"],
+        sync_summary["removed"],
+        sync_summary["unchanged"],
+    )
+    if args.sync_report:
+        with open(args.sync_report, "w", encoding="utf-8") as report_file:
+            json.dump(sync_summary, report_file, indent=2)
+
+
+def write_archive_output(processed_blocks, args):
+    """Streams the export straight into a .tar.gz or .zip archive."""
+    archive_path = get_archive_path(args.outputs_dir, args.output_format)
+    with ArchiveBackend(archive_path) as backend:
+        process_and_write(processed_blocks, archive_path, backend, **get_write_options(args))
+    logger.info("Archive '%s' written.", archive_path)
+
+
+def parse_blocks(blocks, args):
+    """Parses the raw blocks, through the render cache when one is given in the CLI."""
+    if args.render_cache:
+        render_cache.open(args.render_cache, args.render_cache_max_entries)
+    try:
+        return dispatch_blocks_parsing(blocks)
+    finally:
+        render_cache.close()
+
+
+def watch_export(blocks, args, poll_time):
+    """Keeps the export up to date until interrupted, crawling and rendering the edited pages again.
+
+    See `m_search.watch`. The whole export is rendered again in memory (the links, navigation and
+    search index of the other pages may depend on the edited ones), and only the files whose
+    content changed are replaced in the output folder. A failed round is logged and polled again
+    later, from the same poll time.
+
+    Parameters:
+    - blocks (list): The raw blocks of the initial crawl.
+    - args: The CLI arguments.
+    - poll_time (datetime): The time the initial crawl started at.
+    """
+    set_reused_media_dir(args.outputs_dir)
+    page_contents = get_page_contents(blocks)
+    interval = args.watch_interval
+    logger.info("Watching the pages edited in Notion, first poll in %ds.", interval)
+    try:
+        while True:
+            time.sleep(interval)
+            next_poll_time = utc_now()
+            try:
+                edited_pages = list(search_edited_pages(get_poll_checkpoint(poll_time)))
+                changed_page_ids = get_changed_page_ids(edited_pages)
+                if changed_page_ids:
+                    logger.info(
+                        "%d pages edited, %d exported pages crawled again.",
+                        len(edited_pages),
+                        len(changed_page_ids),
+                    )
+                    page_contents = update_export(page_contents, changed_page_ids, args)
+            except Exception as e:
+                # The next round searches from the same poll time, the edits are not missed
+                interval = next_poll_interval(
+                    interval, False, args.watch_interval, args.watch_max_interval
+                )
+                logger.error("Watch round failed, next poll in %ds: %s", interval, e)
+                continue
+
+            poll_time = next_poll_time
+            interval = next_poll_interval(
+                interval, bool(changed_page_ids), args.watch_interval, args.watch_max_interval
+            )
+            if changed_page_ids:
+                logger.info("Export updated, next poll in %ds.", interval)
+            else:
+                logger.debug("No exported page edited, next poll in %ds.", interval)
+    except KeyboardInterrupt:
+        logger.info("Watch mode stopped.")
+
+
+def update_export(page_contents, changed_page_ids, args):
+    """Crawls the changed pages again, and updates the export with them.
+
+    Parameters:
+    - page_contents (dict): The raw blocks of the previous crawl, by page (see `m_search.watch`).
+    - changed_page_ids (set): The normalized IDs of the pages to crawl again.
+    - args: The CLI arguments.
+
+    Returns:
+    - dict: The raw blocks of the new crawl, by page.
+    """
+    with metrics.stage("watch_fetch"):
+        blocks = fetch_and_process_block_hierarchy(
+            args.page_id,
+            args.since,
+            crawl_filter=get_crawl_filter(args),
+            reused_pages=get_reused_pages(page_contents, changed_page_ids),
+        )
+    page_contents = get_page_contents(blocks)
+    with metrics.stage("watch_parse"):
+        # The raw blocks are kept for the next crawl
+        processed_blocks = parse_blocks(list(blocks), args)
+    with metrics.stage("watch_write"):
+        write_directory_output(processed_blocks, args)
+    if args.html_dir:
+        with metrics.stage("watch_html"):
+            write_html_site(args.outputs_dir, args.html_dir, args.html_workers)
+    write_metrics_reports(args)
+    return page_contents
+
+
+def write_metrics_reports(args):
+    """Writes the metrics of the run to the JSON report and Prometheus textfile given in the CLI."""
+    if args.metrics_report:
+        metrics.write_json_report(args.metrics_report)
+        logger.info("Metrics report written to '%s'.", args.metrics_report)
+    if args.metrics_textfile:
+        metrics.write_prometheus_textfile(args.metrics_textfile)
+        logger.info("Metrics textfile written to '%s'.", args.metrics_textfile)
 
 
 def main():
@@ -24,22 +226,251 @@ def main():
     parser.add_argument(
         "-o", "--outputs_dir", help="Set the output directory", default="wiki_processed_files"
     )
-    parser.add_argument("--page-id", "-p", help="ID of the root Notion page", required=True)
+    parser.add_argument("--page-id", "-p", help="ID of the root Notion page", default=None)
+    parser.add_argument(
+        "--since",
+        help="Incremental run: only crawl and export the database rows edited on or after this ISO 8601 date, keeping the exported files of the other rows (database index tables still list all the rows)",
+        default=None,
+    )
+    parser.add_argument(
+        "--discovery",
+        help="How the pages are found: walking down from the root page, or listing them all with the search endpoint and crawling their content in parallel",
+        default="crawl",
+        choices=["crawl", "search"],
+    )
+    parser.add_argument(
+        "--crawl-workers",
+        help="Number of pages crawled at the same time with --discovery search",
+        type=int,
+        default=DEFAULT_CRAWL_WORKERS,
+    )
+    parser.add_argument(
+        "--include",
+        help="Only export the pages matching this ID or title glob, with their subtrees (repeatable)",
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--exclude",
+        help="Skip the pages matching this ID or title glob, with their subtrees (repeatable)",
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--max-depth",
+        help="Skip the pages nested deeper than this number of pages under the root page",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--sample",
+        help="Preview mode: only export the first N pages found",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--plan",
+        help="Dry run: sample the tree breadth first and estimate the blocks, pages, media size, API calls and wall time of the export, by subtree",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--plan-max-calls",
+        help="Budget of API calls of the --plan sample",
+        type=int,
+        default=DEFAULT_PLAN_MAX_CALLS,
+    )
+    parser.add_argument(
+        "--watch",
+        help="After the export, keep polling Notion for edited pages and update the export with them until interrupted",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        help="Seconds between two polls of --watch while pages are being edited",
+        type=float,
+        default=DEFAULT_WATCH_INTERVAL,
+    )
+    parser.add_argument(
+        "--watch-max-interval",
+        help="Maximum seconds between two polls of --watch, the interval doubles at every poll finding no edit",
+        type=float,
+        default=DEFAULT_WATCH_MAX_INTERVAL,
+    )
+    parser.add_argument(
+        "--snapshot",
+        help="Write the raw crawl (blocks and page details) to this .jsonl.gz snapshot file",
+        default=None,
+    )
+    parser.add_argument(
+        "--from-snapshot",
+        help="Render from this snapshot instead of crawling Notion, without any API call (media are not downloaded again, the ones already in the output directory or archive are copied)",
+        default=None,
+    )
+    parser.add_argument(
+        "--render-cache",
+        help="Keep the processed blocks in this SQLite cache, so the blocks unchanged since the previous run are not parsed again",
+        default=None,
+    )
+    parser.add_argument(
+        "--render-cache-max-entries",
+        help="Maximum number of blocks kept in the render cache, the least recently used ones are evicted",
+        type=int,
+        default=DEFAULT_RENDER_CACHE_MAX_ENTRIES,
+    )
+    parser.add_argument(
+        "--sync-report",
+        help="Write the added, changed and removed files counts of the output sync to this JSON file",
+        default=None,
+    )
+    parser.add_argument(
+        "--output-format",
+        help="Write the export as a directory or stream it into an archive named after the output directory",
+        default="directory",
+        choices=["directory", "tar.gz", "zip"],
+    )
+    parser.add_argument(
+        "--html-dir",
+        help="Also render the exported pages into a static HTML site in this directory, without MkDocs (only the changed pages are rendered again)",
+        default=None,
+    )
+    parser.add_argument(
+        "--html-workers",
+        help="Number of processes rendering the pages of --html-dir",
+        type=int,
+        default=DEFAULT_HTML_WORKERS,
+    )
+    parser.add_argument(
+        "--search-index",
+        help="Write the MkDocs search index of the pages, so the MkDocs build can skip indexing",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--split-max-blocks",
+        help="Split the pages with more blocks than this into sub-pages at their headings",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--split-max-bytes",
+        help="Split the pages bigger than this many bytes into sub-pages at their headings",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--dump-file",
+        help="Write the full dumps of the fetched, processed and renamed blocks to this file, whatever the log level",
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics-report",
+        help="Write the metrics of the run (API calls, latencies, parse times, stage times...) to this JSON file",
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        help="Write the metrics of the run to this Prometheus textfile (.prom), for the node exporter to scrape",
+        default=None,
+    )
+    parser.add_argument(
+        "--profile",
+        help=f"Profile the CPU (cProfile) and memory (tracemalloc) of every stage into {PROFILE_DIR} in the output directory",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile-top",
+        help="Number of allocations listed in the memory reports of --profile",
+        type=int,
+        default=DEFAULT_TOP_ALLOCATIONS,
+    )
+    parser.add_argument(
+        "--status-file",
+        help="Keep the progress of the run (counts, throughput, ETA) up to date in this JSON file",
+        default=None,
+    )
+    parser.add_argument(
+        "--progress-interval",
+        help="Minimum number of seconds between two progress reports",
+        type=float,
+        default=DEFAULT_PROGRESS_INTERVAL,
+    )
 
     args = parser.parse_args()
-    print(args.__dict__)
+    if not args.page_id and not args.from_snapshot:
+        parser.error("one of the arguments --page-id/-p --from-snapshot is required")
+    if args.plan and not args.page_id:
+        parser.error("--plan needs --page-id/-p")
+    if args.plan and args.discovery == "search":
+        parser.error("--plan only models the default discovery, not --discovery search")
+    if args.watch and (args.from_snapshot or args.output_format != "directory"):
+        parser.error("--watch needs --page-id/-p and the directory output format")
+    if args.html_dir and args.output_format != "directory":
+        parser.error("--html-dir needs the directory output format")
+    setup_logging(args.log_level, args.dump_file)
+    logger.info("Arguments: %s", args.__dict__)
+    if args.profile:
+        enable_profiling(os.path.join(args.outputs_dir, PROFILE_DIR), args.profile_top)
+    progress.configure(args.progress_interval, args.status_file)
 
     # Initialize Notion client with token and set log level
     set_log_level(args.log_level)
 
+    if args.plan:
+        with metrics.stage("plan"):
+            plan_export(args.page_id, args.plan_max_calls, args.since, get_crawl_filter(args))
+        write_metrics_reports(args)
+        return
+
     # Prepare the output folder
-    prepare_output_folder(args.outputs_dir)
+    if args.output_format == "directory":
+        prepare_output_folder(args.outputs_dir)
+
+    success = False
+    try:
+        progress.set_stage("fetch")
+        poll_time = utc_now()
+        with metrics.stage("fetch"), profile_stage("fetch"):
+            if args.from_snapshot:
+                set_offline_media_source(
+                    args.outputs_dir
+                    if args.output_format == "directory"
+                    else get_archive_path(args.outputs_dir, args.output_format)
+                )
+                blocks = load_snapshot(args.from_snapshot)
+            else:
+                crawled_pages = None
+                if args.discovery == "search":
+                    crawled_pages = crawl_pages(
+                        args.page_id, args.since, get_crawl_filter(args), args.crawl_workers
+                    )
+                blocks = fetch_and_process_block_hierarchy(
+                    args.page_id, args.since, args.snapshot, get_crawl_filter(args), crawled_pages
+                )
+        pretty_print(blocks, "Fetched blocks")
+        progress.set_stage("parse")
+        with metrics.stage("parse"), profile_stage("parse"):
+            # Watch mode keeps the raw blocks for the next crawls
+            processed_blocks = parse_blocks(list(blocks) if args.watch else blocks, args)
+        pretty_print(processed_blocks, "Processed blocks")
 
-    blocks = fetch_and_process_block_hierarchy(args.page_id)
-    pretty_print(blocks, "Fetched blocks")
-    processed_blocks = dispatch_blocks_parsing(blocks)
-    pretty_print(processed_blocks, "Processed blocks")
-    process_and_write(processed_blocks, args.outputs_dir)
+        progress.set_stage("write")
+        with metrics.stage("write"), profile_stage("write"):
+            if args.output_format == "directory":
+                write_directory_output(processed_blocks, args)
+            else:
+                write_archive_output(processed_blocks, args)
+        if args.html_dir:
+            progress.set_stage("html")
+            with metrics.stage("html"), profile_stage("html"):
+                write_html_site(args.outputs_dir, args.html_dir, args.html_workers)
+        if args.watch:
+            write_metrics_reports(args)
+            progress.set_stage("watch")
+            watch_export(blocks, args, poll_time)
+        success = True
+    finally:
+        progress.finish(success)
+        # The metrics of a failed run are reported as well, they tell where it stopped
+        write_metrics_reports(args)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,29 @@
 import argparse
+import hashlib
+import json
 import os
 import re
 import subprocess  # nosec B404
 
 import yaml
+from static_server import precompress_site, serve_site
+
+# Written by the exporter next to the root page, see m_write/nav_manifest.py
+NAV_MANIFEST_FILE = ".nav-manifest.json"
+# Only the beginning of a file is read to find its first header
+HEADER_READ_SIZE = 4096
+# Search index prebuilt by the exporter, see m_write/search_index.py
+PREBUILT_SEARCH_INDEX = os.path.join("search", "search_index.json")
+# Content hash of the inputs the site in the site directory was built from
+BUILD_HASH_FILE = ".build-hash"
 
 
 def read_header(markdown_file_path):
     """Reads the first header of a Markdown file and returns its content.
 
+    Only the first `HEADER_READ_SIZE` characters of the file are read, the page title is always at
+    the top of the exported pages.
+
     Parameters:
     - markdown_file_path (str): The path to the Markdown file.
 
@@ -20,7 +35,7 @@ def read_header(markdown_file_path):
 
     try:
         with open(markdown_file_path, encoding="utf-8") as md_file:
-            file_content = md_file.read()
+            file_content = md_file.read(HEADER_READ_SIZE)
             match = header_pattern.search(file_content)
             if match:
                 return match.group(1).strip()
@@ -32,26 +47,83 @@ def read_header(markdown_file_path):
     return ""
 
 
+def load_nav_manifest(start_path):
+    """Loads the navigation manifest written by the exporter, if any.
+
+    Parameters:
+    - start_path (str): The MkDocs content path.
+
+    Returns:
+    - dict: The manifest, or None if there is no manifest or it can not be read.
+    """
+    manifest_path = os.path.join(start_path, NAV_MANIFEST_FILE)
+    try:
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"An error occurred while reading the nav manifest {manifest_path}: {e}")
+        return None
+
+
+def generate_nav_from_manifest(manifest):
+    """Generates the MkDocs navigation structure from the exporter navigation manifest.
+
+    The structure is the same one `generate_nav_structure` discovers from the filesystem, keeping the
+    pages in their Notion order. The sub-pages a page was split into follow its index.
+    """
+
+    def sections_nav(page):
+        return [{section["title"]: section["path"]} for section in page.get("sections", [])]
+
+    def page_nav(page):
+        page_entries = [{"index": page["path"]}] + sections_nav(page)
+        page_entries.extend(page_nav(child) for child in page.get("children", []))
+        return {f"'{page['title']}'": page_entries}
+
+    nav_structure = [{"Home": manifest["home"]["path"]}] + sections_nav(manifest["home"])
+    nav_structure.extend(page_nav(page) for page in manifest.get("pages", []))
+    return nav_structure
+
+
+def scan_directory(start_path):
+    """Lists the visible sub directories and Markdown files of a directory in a single pass.
+
+    Returns:
+    - tuple: The sorted names of the directories and of the Markdown files.
+    """
+    dirs = []
+    md_files = []
+    with os.scandir(start_path) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                dirs.append(entry.name)
+            elif entry.is_file() and entry.name.endswith(".md"):
+                md_files.append(entry.name)
+    md_files.sort()
+    dirs.sort()
+    return dirs, md_files
+
+
 def generate_nav_structure(start_path, parent_path=None, is_root=True):
     """Recursively generates a MkDocs navigation structure from the directory and files under
-    start_path."""
+    start_path.
+
+    The navigation manifest written by the exporter is used when it is found in start_path, so the
+    filesystem is only scanned for content that was not generated by the exporter.
+    """
+    if is_root and parent_path is None:
+        manifest = load_nav_manifest(start_path)
+        if manifest is not None:
+            return generate_nav_from_manifest(manifest)
+
     nav_structure = []
     if parent_path is None:
         parent_path = start_path
-    dirs = [
-        d
-        for d in os.listdir(start_path)
-        if os.path.isdir(os.path.join(start_path, d)) and not d.startswith(".")
-    ]
-    md_files = [
-        f
-        for f in os.listdir(start_path)
-        if os.path.isfile(os.path.join(start_path, f))
-        and f.endswith(".md")
-        and not f.startswith(".")
-    ]
-    md_files.sort()
-    dirs.sort()
+    dirs, md_files = scan_directory(start_path)
 
     # Handle the Home page differently by checking if it's the root call
     if is_root and md_files:
@@ -82,17 +154,83 @@ def generate_nav_structure(start_path, parent_path=None, is_root=True):
     return nav_structure
 
 
-def update_mkdocs_nav(mkdocs_yml_path, nav_structure):
+def disable_search_indexing(mkdocs_config):
+    """Disables the indexing of the search plugin, keeping the plugin (and the search UI) enabled.
+
+    The search index prebuilt by the exporter is then published as a static file.
+    """
+    plugins = mkdocs_config.get("plugins", [])
+    for position, plugin in enumerate(plugins):
+        if plugin == "search":
+            plugins[position] = {"search": {"enabled": False}}
+        elif isinstance(plugin, dict) and "search" in plugin:
+            plugin["search"] = {**(plugin["search"] or {}), "enabled": False}
+
+
+def update_mkdocs_nav(mkdocs_yml_path, nav_structure, prebuilt_search_index=False):
     """Updates the mkdocs.yml file with the generated navigation structure."""
     with open(mkdocs_yml_path) as file:
         mkdocs_config = yaml.safe_load(file)
 
     mkdocs_config["theme"]["nav"] = nav_structure
+    if prebuilt_search_index:
+        disable_search_indexing(mkdocs_config)
 
     with open(mkdocs_yml_path, "w") as file:
         yaml.safe_dump(mkdocs_config, file, default_flow_style=False, sort_keys=False)
 
 
+def content_hash(mkdocs_content_path, mkdocs_yml_path):
+    """Calculates a hash of the MkDocs inputs: every file of the content path and mkdocs.yml.
+
+    Parameters:
+    - mkdocs_content_path (str): The MkDocs content path.
+    - mkdocs_yml_path (str): The path to mkdocs.yml.
+
+    Returns:
+    - str: The hexadecimal digest of the inputs.
+    """
+    digest = hashlib.sha256()
+    input_files = [mkdocs_yml_path]
+    for current_dir, dirs, files in os.walk(mkdocs_content_path):
+        dirs.sort()
+        input_files.extend(os.path.join(current_dir, file_name) for file_name in sorted(files))
+
+    for file_path in input_files:
+        digest.update(os.path.relpath(file_path, mkdocs_content_path).encode("utf-8"))
+        with open(file_path, "rb") as input_file:
+            for chunk in iter(lambda: input_file.read(65536), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_site(mkdocs_yml_path, mkdocs_content_path, site_dir):
+    """Builds the site once and precompresses it, unless it was already built from the same inputs.
+
+    Parameters:
+    - mkdocs_yml_path (str): The path to mkdocs.yml.
+    - mkdocs_content_path (str): The MkDocs content path.
+    - site_dir (str): The directory where the site is built.
+    """
+    inputs_hash = content_hash(mkdocs_content_path, mkdocs_yml_path)
+    build_hash_path = os.path.join(site_dir, BUILD_HASH_FILE)
+    try:
+        with open(build_hash_path, encoding="utf-8") as build_hash_file:
+            if build_hash_file.read().strip() == inputs_hash:
+                print(f"Site in {site_dir} is up to date, skipping the build.")
+                return
+    except FileNotFoundError:
+        pass
+
+    subprocess.run(  # nosec B603, B607
+        ["mkdocs", "build", "--clean", "--config-file", mkdocs_yml_path, "--site-dir", site_dir],
+        check=True,
+    )
+    print(f"{precompress_site(site_dir)} precompressed files written.")
+    with open(build_hash_path, "w", encoding="utf-8") as build_hash_file:
+        build_hash_file.write(inputs_hash)
+
+
 def main(
     mkdocs_yml_path,
     mkdocs_content_path,
@@ -101,6 +239,8 @@ def main(
     mkdocs_interface,
     mkdocs_port,
     generate,
+    mode="serve",
+    site_dir="/app/site",
 ):
     if generate:
         # Generate navigation structure from content path
@@ -119,10 +259,18 @@ def main(
         with open(mkdocs_yml_path, "w") as file:
             file.write(mkdocs_yml_content)
         # Update mkdocs.yml with the navigation structure
-        update_mkdocs_nav(mkdocs_yml_path, nav_structure)
+        prebuilt_search_index = os.path.isfile(
+            os.path.join(mkdocs_content_path, PREBUILT_SEARCH_INDEX)
+        )
+        update_mkdocs_nav(mkdocs_yml_path, nav_structure, prebuilt_search_index)
 
-    # Serve the MkDocs site
-    subprocess.run(["mkdocs", "serve"], check=True)  # nosec B603, B607
+    if mode == "production":
+        # Build once and serve the static site with caching headers
+        build_site(mkdocs_yml_path, mkdocs_content_path, site_dir)
+        serve_site(site_dir, mkdocs_interface, mkdocs_port)
+    else:
+        # Serve the MkDocs site with the development server (live reload)
+        subprocess.run(["mkdocs", "serve"], check=True)  # nosec B603, B607
 
 
 if __name__ == "__main__":
@@ -141,6 +289,13 @@ if __name__ == "__main__":
     )
     parser.add_argument("--mkdocs_port", default=os.environ.get("MKDOCS_PORT", "8000"))
     parser.add_argument("--generate", "-g", default=True, type=bool)
+    parser.add_argument(
+        "--mode",
+        default=os.environ.get("MKDOCS_MODE", "serve"),
+        choices=["serve", "production"],
+        help="'serve' runs the MkDocs development server, 'production' builds and serves the static site",
+    )
+    parser.add_argument("--site_dir", default=os.environ.get("MKDOCS_SITE_DIR", "/app/site"))
 
     args = parser.parse_args()
 
@@ -152,4 +307,6 @@ if __name__ == "__main__":
         args.mkdocs_interface,
         args.mkdocs_port,
         args.generate,
+        args.mode,
+        args.site_dir,
     )
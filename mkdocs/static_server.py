@@ -0,0 +1,216 @@
+"""Lightweight static server for the built MkDocs site.
+
+Meant for production, in front of real users, instead of the `mkdocs serve` development server:
+
+- Precompressed variants (`.br`, `.gz`) are served when the client accepts them.
+- Responses carry an ETag and honour `If-None-Match` with a 304.
+- Fingerprinted theme assets are cached forever, pages are revalidated on every request.
+- File bodies are sent with `sendfile` and single byte ranges are supported (video seeking).
+"""
+
+import email.utils
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Text based files worth compressing, smaller files are not worth the extra request handling
+COMPRESSIBLE_EXTENSIONS = {".html", ".js", ".css", ".json", ".xml", ".svg", ".txt", ".map"}
+COMPRESS_MIN_SIZE = 1024
+
+# Theme assets have a content hash in their name (e.g. bundle.f1e2d3c4.min.js)
+FINGERPRINTED_ASSET = re.compile(r"\.[0-9a-f]{8,}\.min\.(js|css)$")
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+CACHE_DEFAULT = "public, max-age=3600"
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def precompress_site(site_dir):
+    """Writes gzip (and brotli, when available) variants next to the compressible site files.
+
+    Variants are only kept when they are smaller than the original file.
+
+    Parameters:
+    - site_dir (str): The built site directory.
+
+    Returns:
+    - int: The number of variants written.
+    """
+    if brotli is None:
+        print("The brotli package is not installed, only gzip variants are generated.")
+
+    written = 0
+    for current_dir, _, files in os.walk(site_dir):
+        for file_name in files:
+            if os.path.splitext(file_name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            file_path = os.path.join(current_dir, file_name)
+            with open(file_path, "rb") as source:
+                data = source.read()
+            if len(data) < COMPRESS_MIN_SIZE:
+                continue
+
+            variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(data, quality=11)
+            for extension, compressed in variants.items():
+                if len(compressed) < len(data):
+                    with open(f"{file_path}{extension}", "wb") as target:
+                        target.write(compressed)
+                    written += 1
+    return written
+
+
+def cache_control_for(url_path):
+    """Selects the Cache-Control header for a request path."""
+    if FINGERPRINTED_ASSET.search(url_path):
+        return CACHE_IMMUTABLE
+    if url_path.endswith((".html", "/")) or url_path.endswith("search_index.json"):
+        return CACHE_REVALIDATE
+    return CACHE_DEFAULT
+
+
+class StaticSiteHandler(BaseHTTPRequestHandler):
+    """Serves the files of `site_dir` (set on the subclass by `serve_site`)."""
+
+    site_dir = "."
+    server_version = "NotionExporterStatic/1.0"
+    # Keep-alive connections, every response carries its Content-Length
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def local_path(self, url_path):
+        """Maps a URL path to a path inside the site, refusing anything outside of it."""
+        relative = posixpath.normpath(unquote(url_path)).lstrip("/")
+        if relative == ".." or relative.startswith("../"):
+            return None
+        return os.path.join(self.site_dir, relative)
+
+    def resolve_path(self, url_path):
+        """Maps a URL path to a file of the site (index.html for directories)."""
+        file_path = self.local_path(url_path)
+        if file_path is not None and os.path.isdir(file_path):
+            file_path = os.path.join(file_path, "index.html")
+        return file_path if file_path is not None and os.path.isfile(file_path) else None
+
+    def select_variant(self, file_path):
+        """Picks the precompressed variant accepted by the client, if any."""
+        accepted = self.headers.get("Accept-Encoding", "")
+        for encoding, extension in (("br", ".br"), ("gzip", ".gz")):
+            if encoding in accepted and os.path.isfile(f"{file_path}{extension}"):
+                return f"{file_path}{extension}", encoding
+        return file_path, None
+
+    def serve(self, send_body):
+        url_path = urlsplit(self.path).path
+        # Directories are served with a trailing slash so relative links keep working
+        local_path = self.local_path(url_path)
+        if not url_path.endswith("/") and local_path is not None and os.path.isdir(local_path):
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", f"{url_path}/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        file_path = self.resolve_path(url_path)
+        status = HTTPStatus.OK
+        if file_path is None:
+            file_path = self.resolve_path("/404.html")
+            status = HTTPStatus.NOT_FOUND
+            if file_path is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        variant_path, encoding = self.select_variant(file_path)
+        stat = os.stat(variant_path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+
+        if status == HTTPStatus.OK and self.headers.get("If-None-Match") == etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control_for(url_path))
+            self.end_headers()
+            return
+
+        offset, count = 0, stat.st_size
+        range_header = self.headers.get("Range")
+        if status == HTTPStatus.OK and range_header and encoding is None:
+            byte_range = RANGE_PATTERN.match(range_header.strip())
+            if byte_range and any(byte_range.groups()):
+                start, end = byte_range.groups()
+                if start:
+                    offset = int(start)
+                    last = min(int(end), stat.st_size - 1) if end else stat.st_size - 1
+                else:
+                    offset = max(stat.st_size - int(end), 0)
+                    last = stat.st_size - 1
+                if offset > last:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{stat.st_size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                count = last - offset + 1
+                status = HTTPStatus.PARTIAL_CONTENT
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(count))
+        self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", cache_control_for(url_path))
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Accept-Ranges", "bytes")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if status == HTTPStatus.PARTIAL_CONTENT:
+            self.send_header(
+                "Content-Range", f"bytes {offset}-{offset + count - 1}/{stat.st_size}"
+            )
+        self.end_headers()
+
+        if send_body and count:
+            self.wfile.flush()
+            with open(variant_path, "rb") as file:
+                try:
+                    self.connection.sendfile(file, offset, count)
+                except (AttributeError, OSError):
+                    # sendfile is not available on every platform, fall back to a copy loop
+                    file.seek(offset)
+                    while count > 0:
+                        chunk = file.read(min(count, 65536))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        count -= len(chunk)
+
+
+def serve_site(site_dir, interface, port):
+    """Serves the built site until the process is stopped.
+
+    Parameters:
+    - site_dir (str): The built site directory.
+    - interface (str): The interface to bind.
+    - port (int): The port to bind.
+    """
+    handler = type("SiteHandler", (StaticSiteHandler,), {"site_dir": os.path.abspath(site_dir)})
+    with ThreadingHTTPServer((interface, int(port)), handler) as server:
+        print(f"Serving {site_dir} on http://{interface}:{port}")
+        server.serve_forever()
@@ -0,0 +1,76 @@
+"""Benchmark of the rich text rendering on a long document, against the previous renderer.
+
+Run with `python tests/benchmark_rich_text.py`.
+"""
+
+import random
+import timeit
+
+from conftest import rich_text
+from test_rich_text import STYLES, reference_render
+
+from m_parse.block_models import RichText
+from m_parse.rich_text import render_rich_text
+
+PARAGRAPHS = 2000
+RUNS_PER_PARAGRAPH = 40
+REPEATS = 20
+
+
+def build_document(seed=0):
+    """Builds the paragraphs of a long document, as lists of runs with mixed styles and links."""
+    rng = random.Random(seed)
+    styles = [STYLES[0]] * 4 + STYLES
+    words = ["Notion ", "export ", "the ", "page", " with", "links ", "and", "code"]
+    return [
+        [
+            RichText(
+                **rich_text(
+                    rng.choice(words),
+                    "https://example.com/page" if rng.random() < 0.1 else None,
+                    **rng.choice(styles),
+                )
+            )
+            for _ in range(RUNS_PER_PARAGRAPH)
+        ]
+        for _ in range(PARAGRAPHS)
+    ]
+
+
+def render_reference(runs, separator):
+    return separator.join(
+        [reference_render(run.plain_text, run.annotations, run.href) for run in runs]
+    )
+
+
+def benchmark(renderers, document):
+    """Returns the best time of rendering the whole document with every renderer, in seconds.
+
+    The renderers are timed in turns, so they share the noise of the machine.
+    """
+    times = {name: [] for name in renderers}
+    for _ in range(REPEATS):
+        for name, render in renderers.items():
+            times[name].append(
+                timeit.timeit(lambda: [render(runs) for runs in document], number=1)
+            )
+    return {name: min(name_times) for name, name_times in times.items()}
+
+
+if __name__ == "__main__":
+    document = build_document()
+    print(f"{PARAGRAPHS} paragraphs of {RUNS_PER_PARAGRAPH} runs, best of {REPEATS}")
+    # Paragraphs and list items join their runs with spaces, quotes merge them
+    for label, separator in [("Joined by spaces", " "), ("Merged", "")]:
+        times = benchmark(
+            {
+                "previous": lambda runs: render_reference(runs, separator),
+                "current": lambda runs: render_rich_text(runs, separator),
+            },
+            document,
+        )
+        print(
+            f"{label}: previous renderer {times['previous'] * 1000:.1f} ms, "
+            f"current renderer {times['current'] * 1000:.1f} ms "
+            f"({times['previous'] / times['current']:.2f}x)"
+        )
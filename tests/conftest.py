@@ -0,0 +1,199 @@
+"""Shared fixtures: an in-memory Notion workspace served through the Notion client."""
+
+import copy
+import os
+import sys
+import uuid
+
+import pytest
+
+# The request spacing is read when the client module is imported
+os.environ["NOTION_REQUEST_WAIT_TIME"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m_aux import outputs  # noqa: E402
+from m_config.notion_client import notion_client  # noqa: E402
+from m_search.notion_pages import page_details_cache  # noqa: E402
+from m_search.tree_index import tree_index  # noqa: E402
+
+LISTING_PAGE_SIZE = 2
+
+
+def block_id(number):
+    """Returns the (dashed) Notion ID of a test block."""
+    return str(uuid.UUID(int=number))
+
+
+def rich_text(text, href=None, **annotations):
+    """Builds a rich text run, as returned by the Notion API."""
+    return {
+        "type": "text",
+        "text": {"content": text, "link": None},
+        "annotations": {
+            "bold": False,
+            "italic": False,
+            "strikethrough": False,
+            "underline": False,
+            "code": False,
+            "color": "default",
+            **annotations,
+        },
+        "plain_text": text,
+        "href": href,
+    }
+
+
+class FakeNotion:
+    """In-memory workspace answering the Notion API calls the exporter makes."""
+
+    def __init__(self):
+        self.blocks = {}
+        self.children = {}
+        self.pages = {}
+        self.rows = {}
+        self.calls = []
+
+    def add_block(self, number, parent, block_type, payload, edited="2024-01-01T00:00:00.000Z"):
+        """Adds a block below a parent block (or page) number, None for a root page."""
+        new_id = block_id(number)
+        parent_id = block_id(parent) if parent is not None else None
+        self.blocks[new_id] = {
+            "object": "block",
+            "id": new_id,
+            "type": block_type,
+            block_type: payload,
+            "has_children": False,
+            "created_time": "2024-01-01T00:00:00.000Z",
+            "last_edited_time": edited,
+            "parent": (
+                {"type": "page_id", "page_id": parent_id}
+                if parent_id
+                else {"type": "workspace", "workspace": True}
+            ),
+        }
+        if parent_id:
+            self.children.setdefault(parent_id, []).append(new_id)
+            if parent_id in self.blocks:
+                self.blocks[parent_id]["has_children"] = True
+        return new_id
+
+    def add_page(self, number, parent, title, edited="2024-01-01T00:00:00.000Z"):
+        """Adds a page below a parent page number, None for a page at the top of the workspace."""
+        new_id = self.add_block(number, parent, "child_page", {"title": title}, edited)
+        self.pages[new_id] = {
+            "object": "page",
+            "id": new_id,
+            "url": f"https://www.notion.so/{title.replace(' ', '-')}-{new_id.replace('-', '')}",
+            "properties": {"Page": {"title": [{"plain_text": title}]}},
+            "created_by": {"id": "user"},
+            "parent": self.blocks[new_id]["parent"],
+            "last_edited_time": edited,
+        }
+        return new_id
+
+    def add_database(self, number, parent, title):
+        """Adds a database below a parent page number."""
+        return self.add_block(number, parent, "child_database", {"title": title})
+
+    def add_row(self, number, database, title, edited="2024-01-01T00:00:00.000Z"):
+        """Adds a row (page) to a database number. Its content is added like a page content."""
+        new_id = block_id(number)
+        database_id = block_id(database)
+        self.pages[new_id] = {
+            "object": "page",
+            "id": new_id,
+            "url": f"https://www.notion.so/{title.replace(' ', '-')}-{new_id.replace('-', '')}",
+            "properties": {"Name": {"type": "title", "title": [{"plain_text": title}]}},
+            "created_by": {"id": "user"},
+            "parent": {"type": "database_id", "database_id": database_id},
+            "created_time": "2024-01-01T00:00:00.000Z",
+            "last_edited_time": edited,
+        }
+        self.rows.setdefault(database_id, []).append(new_id)
+        return new_id
+
+    def add_synced_block(self, number, parent, original=None):
+        """Adds an original synced block, or a reference to the original block number."""
+        synced_from = {"type": "block_id", "block_id": block_id(original)} if original else None
+        new_id = self.add_block(number, parent, "synced_block", {"synced_from": synced_from})
+        if original:
+            # The children of a reference are the children of its original
+            self.children[new_id] = self.children.setdefault(block_id(original), [])
+            self.blocks[new_id]["has_children"] = True
+        return new_id
+
+    def add_paragraph(self, number, parent, *runs):
+        """Adds a paragraph of rich text runs below a parent number."""
+        return self.add_block(
+            number, parent, "paragraph", {"rich_text": list(runs), "color": "default"}
+        )
+
+    def edit(self, number, edited, **payload):
+        """Edits the payload of a block, and the last edited time of its page."""
+        edited_block = self.blocks[block_id(number)]
+        edited_block[edited_block["type"]].update(payload)
+        edited_block["last_edited_time"] = edited
+        page_id = edited_block["parent"].get("page_id")
+        if page_id in self.pages:
+            self.pages[page_id]["last_edited_time"] = edited
+
+    def retrieve_block(self, block_id):
+        self.calls.append(("blocks.retrieve", str(uuid.UUID(block_id))))
+        return copy.deepcopy(self.blocks[str(uuid.UUID(block_id))])
+
+    def list_children(self, block_id, start_cursor=None, page_size=None, **kwargs):
+        self.calls.append(("blocks.children.list", str(uuid.UUID(block_id))))
+        child_ids = self.children.get(str(uuid.UUID(block_id)), [])
+        return self.paginate([self.blocks[child_id] for child_id in child_ids], start_cursor)
+
+    def retrieve_page(self, page_id):
+        self.calls.append(("pages.retrieve", str(uuid.UUID(page_id))))
+        return copy.deepcopy(self.pages[str(uuid.UUID(page_id))])
+
+    def search(self, start_cursor=None, **kwargs):
+        self.calls.append(("search", None))
+        pages = sorted(self.pages.values(), key=lambda page: page["last_edited_time"])
+        return self.paginate(pages[::-1], start_cursor)
+
+    def query_database(self, database_id, start_cursor=None, filter=None, **kwargs):
+        database_id = str(uuid.UUID(database_id))
+        self.calls.append(("databases.query", database_id))
+        rows = [self.pages[row_id] for row_id in self.rows.get(database_id, [])]
+        if filter:
+            since = filter["last_edited_time"]["on_or_after"]
+            rows = [row for row in rows if row["last_edited_time"] >= since]
+        return self.paginate(rows, start_cursor)
+
+    def paginate(self, results, start_cursor):
+        start = int(start_cursor or 0)
+        has_more = start + LISTING_PAGE_SIZE < len(results)
+        return {
+            "results": copy.deepcopy(results[start : start + LISTING_PAGE_SIZE]),
+            "next_cursor": str(start + LISTING_PAGE_SIZE) if has_more else None,
+            "has_more": has_more,
+        }
+
+    def fetched_ids(self, call):
+        """Returns the IDs the blocks (or pages) were fetched with, through an API call."""
+        return [called_id for name, called_id in self.calls if name == call]
+
+
+@pytest.fixture
+def fake_notion(monkeypatch):
+    """Serves an empty in-memory workspace, filled by the test, through the Notion client."""
+    fake = FakeNotion()
+    monkeypatch.setattr(notion_client.blocks, "retrieve", fake.retrieve_block)
+    monkeypatch.setattr(notion_client.blocks.children, "list", fake.list_children)
+    monkeypatch.setattr(notion_client.pages, "retrieve", fake.retrieve_page)
+    monkeypatch.setattr(notion_client.databases, "query", fake.query_database)
+    monkeypatch.setattr(notion_client, "search", fake.search)
+    # The crawl state shared by the modules
+    monkeypatch.setattr(outputs, "offline_media_dir", None)
+    monkeypatch.setattr(outputs, "offline_media_archive", None)
+    monkeypatch.setattr(outputs, "reused_media_dir", None)
+    monkeypatch.setattr(outputs, "downloaded_media_urls", {})
+    page_details_cache.clear()
+    tree_index.clear()
+    yield fake
+    page_details_cache.clear()
+    tree_index.clear()
@@ -0,0 +1,75 @@
+import pytest
+from conftest import block_id, rich_text
+
+from m_aux.outputs import normalize_string
+from m_search.crawl_filters import CrawlFilter
+from m_search.notion_blocks import fetch_and_process_block_hierarchy
+from m_search.page_discovery import crawl_pages
+from m_search.tree_index import tree_index
+
+
+@pytest.fixture
+def wiki(fake_notion):
+    """Root page with a page in a column, and two nested pages."""
+    fake_notion.add_page(1, None, "Root")
+    fake_notion.add_paragraph(2, 1, rich_text("Welcome"))
+    fake_notion.add_block(3, 1, "column_list", {})
+    fake_notion.add_block(4, 3, "column", {})
+    fake_notion.add_page(5, 4, "Runbooks")
+    fake_notion.add_paragraph(6, 5, rich_text("Restart the API"))
+    fake_notion.add_page(10, 1, "Guides")
+    fake_notion.add_paragraph(11, 10, rich_text("Onboarding"))
+    fake_notion.add_page(12, 10, "Deep guide")
+    fake_notion.add_paragraph(13, 12, rich_text("Details"))
+    fake_notion.add_page(20, 1, "Archive")
+    fake_notion.add_paragraph(21, 20, rich_text("Old"))
+    return fake_notion
+
+
+def crawl(**filters):
+    """Crawls the wiki with filters, and returns the numbers of the crawled blocks."""
+    blocks = fetch_and_process_block_hierarchy(block_id(1), crawl_filter=CrawlFilter(**filters))
+    return {int(normalize_string(block["id"]), 16) for block in blocks}
+
+
+def test_include_walks_the_blocks_leading_to_the_included_pages(wiki):
+    assert crawl(include=["runbooks"]) == {1, 5, 6, 10, 12, 20}
+    # Registered under the page holding it, the column is not exported
+    assert tree_index.parent_id(block_id(5)) == normalize_string(block_id(1))
+    # The content of the pages leading to the included pages is not exported
+    assert block_id(2) not in wiki.fetched_ids("blocks.retrieve")
+    assert block_id(11) not in wiki.fetched_ids("blocks.retrieve")
+
+
+def test_include_by_id_exports_the_whole_subtree(wiki):
+    assert crawl(include=[block_id(10).replace("-", "")]) == {1, 5, 10, 11, 12, 13, 20}
+
+
+def test_exclude_skips_the_whole_subtree(wiki):
+    assert crawl(exclude=["Guides"]) == {1, 2, 3, 4, 5, 6, 20, 21}
+    assert block_id(10) not in wiki.fetched_ids("blocks.retrieve")
+    assert block_id(10) not in wiki.fetched_ids("blocks.children.list")
+
+
+def test_max_depth_skips_the_deeper_pages(wiki):
+    assert crawl(max_depth=1) == {1, 2, 3, 4, 5, 6, 10, 11, 20, 21}
+
+
+def test_sample_keeps_the_first_pages(wiki):
+    # The root page and the first two pages found, in crawl order
+    assert crawl(sample=3) == {1, 2, 3, 4, 5, 6, 10, 11}
+
+
+@pytest.mark.parametrize(
+    "filters, crawled_pages",
+    [({"include": ["guides"]}, {10, 12}), ({"sample": 2}, {1, 20})],
+)
+def test_search_discovery_crawls_the_filtered_pages_only(wiki, filters, crawled_pages):
+    expected_blocks = crawl(**filters)
+    page_contents = crawl_pages(block_id(1), crawl_filter=CrawlFilter(**filters))
+    assert {int(page_id, 16) for page_id in page_contents} == crawled_pages
+
+    blocks = fetch_and_process_block_hierarchy(
+        block_id(1), crawl_filter=CrawlFilter(**filters), reused_pages=page_contents
+    )
+    assert {int(normalize_string(block["id"]), 16) for block in blocks} == expected_blocks
@@ -0,0 +1,81 @@
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from conftest import block_id, rich_text
+
+import main
+from m_search import crawl_plan
+from m_search.crawl_plan import get_media_size
+
+MEDIA_CONTENT = b"x" * 12345
+
+
+class PresignedMediaHandler(BaseHTTPRequestHandler):
+    """Serves a media file like a presigned S3 URL: signed for GET, HEAD is denied."""
+
+    def do_HEAD(self):
+        self.send_response(403)
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/ignored-range" or "Range" not in self.headers:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(MEDIA_CONTENT)))
+            self.end_headers()
+            self.wfile.write(MEDIA_CONTENT)
+            return
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes 0-0/{len(MEDIA_CONTENT)}")
+        self.send_header("Content-Length", "1")
+        self.end_headers()
+        self.wfile.write(MEDIA_CONTENT[:1])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def media_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PresignedMediaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("path", ["/media.png?X-Amz-Signature=abc", "/ignored-range"])
+def test_media_size_of_presigned_urls(media_server, path):
+    assert get_media_size(media_server + path) == len(MEDIA_CONTENT)
+
+
+def test_media_size_unknown(media_server):
+    assert get_media_size("http://127.0.0.1:1/missing.png") is None
+
+
+def test_plan_waits_before_the_page_details_retrievals(fake_notion, monkeypatch):
+    monkeypatch.setattr(crawl_plan, "notion_request_wait_time", 1)
+    monkeypatch.setattr(crawl_plan, "wait_for_request_slot", lambda: None)
+    fake_notion.add_page(1, 1000, "Wiki")
+    fake_notion.add_paragraph(2, 1, rich_text("Welcome"))
+    for number in [10, 20, 30]:
+        fake_notion.add_page(number, 1, f"Page {number}")
+        fake_notion.add_paragraph(number + 1, number, rich_text("Content"))
+
+    plan = crawl_plan.plan_export(block_id(1))
+
+    assert plan["exact"]
+    # Four pages, the root page included
+    assert plan["page_detail_calls"] == 4
+    # Two listings of the root page (2 children per listing), and one per page
+    assert plan["wall_time_seconds"] == 5 + 4
+
+
+def test_plan_rejects_the_search_discovery(monkeypatch, capsys):
+    argv = ["main.py", "-p", block_id(1), "--plan", "--discovery", "search"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit):
+        main.main()
+    assert "--discovery search" in capsys.readouterr().err
@@ -0,0 +1,53 @@
+import sys
+
+import pytest
+from conftest import block_id, rich_text
+
+import main
+
+
+@pytest.fixture
+def wiki(fake_notion):
+    """Root page with a database of three rows, edited in January, February and March."""
+    fake_notion.add_page(1, 1000, "Wiki")
+    fake_notion.add_database(10, 1, "Runbooks")
+    for number, title, month in [
+        (11, "Restart API", 1),
+        (12, "Rotate keys", 2),
+        (13, "Failover", 3),
+    ]:
+        fake_notion.add_row(number, 10, title, f"2024-0{month}-01T00:00:00.000Z")
+        fake_notion.add_paragraph(number * 10, number, rich_text(f"Steps to {title.lower()}"))
+    return fake_notion
+
+
+def export(monkeypatch, outputs_dir, *args):
+    root_id = block_id(1).replace("-", "")
+    argv = ["main.py", "-p", root_id, "-o", str(outputs_dir), "-l", "ERROR", *args]
+    monkeypatch.setattr(sys, "argv", argv)
+    main.main()
+
+
+def test_incremental_run_keeps_the_whole_database_index(wiki, monkeypatch, tmp_path):
+    export(monkeypatch, tmp_path)
+    index_file = tmp_path / "wiki" / "runbooks" / "runbooks.md"
+    full_index = index_file.read_text()
+    # Tells a kept file apart from a file written again
+    kept_file = tmp_path / "wiki" / "runbooks" / "restartapi" / "restartapi.md"
+    kept_file.write_text(kept_file.read_text() + "Kept\n")
+
+    wiki.edit(130, "2024-03-05T00:00:00.000Z", rich_text=[rich_text("Failover steps, edited")])
+    wiki.calls.clear()
+    export(monkeypatch, tmp_path, "--since", "2024-02-15T00:00:00.000Z")
+
+    assert index_file.read_text() == full_index.replace(
+        "2024-03-01T00:00:00.000Z", "2024-03-05T00:00:00.000Z"
+    )
+    assert kept_file.read_text().endswith("Kept\n")
+    assert (tmp_path / "wiki" / "runbooks" / "rotatekeys" / "rotatekeys.md").exists()
+    edited_file = tmp_path / "wiki" / "runbooks" / "failover" / "failover.md"
+    assert "Failover steps, edited" in edited_file.read_text()
+    # Only the row edited since is crawled
+    assert block_id(11) not in wiki.fetched_ids("blocks.children.list")
+    assert block_id(12) not in wiki.fetched_ids("blocks.children.list")
+    assert block_id(13) in wiki.fetched_ids("blocks.children.list")
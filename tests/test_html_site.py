@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from m_write.html_site import write_html_site
+from m_write.nav_manifest import NAV_MANIFEST_FILE
+
+pytest.importorskip("markdown")
+
+
+def write_file(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    docs_dir = tmp_path / "export" / "wiki"
+    manifest = {
+        "home": {"path": "README.md", "title": "Wiki"},
+        "pages": [{"path": "guide.md", "title": "Guide"}],
+    }
+    write_file(docs_dir / NAV_MANIFEST_FILE, json.dumps(manifest).encode("utf-8"))
+    write_file(docs_dir / "README.md", b"# Wiki\n\n[Guide](guide.md)\n")
+    write_file(docs_dir / "guide.md", b"# Guide\n\n![diagram](./guide/diagram.png)\n")
+    write_file(docs_dir / "guide" / "diagram.png", b"diagram")
+    write_file(docs_dir / "guide" / "old.png", b"old")
+    return tmp_path / "export"
+
+
+def test_removed_media_are_removed_from_the_site(export_dir, tmp_path):
+    site_dir = tmp_path / "site"
+    summary = write_html_site(str(export_dir), str(site_dir), workers=1)
+    assert summary["rendered"] == 2
+    assert summary["media"] == 2
+    assert (site_dir / "guide" / "old.png").read_bytes() == b"old"
+    assert 'href="guide.html"' in (site_dir / "README.html").read_text()
+
+    (export_dir / "wiki" / "guide" / "old.png").unlink()
+    summary = write_html_site(str(export_dir), str(site_dir), workers=1)
+    assert summary == {
+        "rendered": 0,
+        "unchanged": 2,
+        "removed": 0,
+        "media": 0,
+        "media_removed": 1,
+    }
+    assert not (site_dir / "guide" / "old.png").exists()
+    assert (site_dir / "guide" / "diagram.png").read_bytes() == b"diagram"
+
+
+def test_videos_are_rendered_as_video_players(export_dir, tmp_path):
+    write_file(export_dir / "wiki" / "guide.md", b"# Guide\n\n![type:video](./guide/demo.mp4)\n")
+    site_dir = tmp_path / "site"
+    write_html_site(str(export_dir), str(site_dir), workers=1)
+    page = (site_dir / "guide.html").read_text()
+    assert '<video controls src="./guide/demo.mp4"></video>' in page
+    assert "<img" not in page
@@ -0,0 +1,65 @@
+import sys
+
+import pytest
+from conftest import block_id, rich_text
+
+import main
+from m_write.link_index import build_link_index, rewrite_internal_links
+
+RUNBOOK_ID = "328968aac13d4b19b2a6e2b9c257e05c"
+LINK_INDEX = {
+    RUNBOOK_ID: "wiki/engineering/runbooks/runbooks.md",
+    "0" * 31 + "1": "wiki/wiki.md",
+}
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        f"https://www.notion.so/Runbooks-{RUNBOOK_ID}",
+        "https://www.notion.so/acme/328968aa-c13d-4b19-b2a6-e2b9c257e05c?pvs=4",
+        f"https://acme.notion.site/{RUNBOOK_ID.upper()}#heading",
+        f"http://notion.so/{RUNBOOK_ID}",
+    ],
+)
+def test_notion_urls_rewritten_to_relative_paths(url):
+    md = f"See [runbooks]({url}) and [home](https://www.notion.so/{'0' * 31}1)."
+    rewritten = rewrite_internal_links(md, "wiki/engineering/oncall/oncall.md", LINK_INDEX)
+    assert rewritten == "See [runbooks](../runbooks/runbooks.md) and [home](../../wiki.md)."
+
+
+def test_links_outside_the_export_left_untouched():
+    md = (
+        f"[external](https://www.notion.so/Other-{'f' * 32}) "
+        f"[site](https://example.com/{RUNBOOK_ID})"
+    )
+    assert rewrite_internal_links(md, "wiki/wiki.md", LINK_INDEX) == md
+
+
+def test_link_index_lists_the_pages():
+    blocks = [
+        {"id": "1", "type": "child_page", "root": True, "named_path": "wiki", "name": "wiki"},
+        {"id": "2", "type": "child_page", "named_path": "wiki", "name": "guide"},
+        {"id": "3", "type": "paragraph", "named_path": "wiki/guide"},
+    ]
+    assert build_link_index(blocks) == {"1": "wiki/wiki.md", "2": "wiki/guide/guide.md"}
+
+
+def test_export_rewrites_the_links_between_pages(fake_notion, monkeypatch, tmp_path):
+    fake_notion.add_page(1, None, "Wiki")
+    guide_id = fake_notion.add_page(10, 1, "Guide")
+    fake_notion.add_page(20, 1, "Notes")
+    guide_url = f"https://www.notion.so/Guide-{guide_id.replace('-', '')}"
+    fake_notion.add_paragraph(21, 20, rich_text("Read the "), rich_text("guide", href=guide_url))
+    fake_notion.add_block(22, 20, "link_to_page", {"type": "page_id", "page_id": guide_id})
+    root_id = block_id(1).replace("-", "")
+    monkeypatch.setattr(
+        sys, "argv", ["main.py", "-p", root_id, "-o", str(tmp_path), "-l", "ERROR"]
+    )
+
+    main.main()
+
+    (notes_file,) = tmp_path.rglob("notes.md")
+    notes = notes_file.read_text()
+    assert "[guide](../guide/guide.md)" in notes
+    assert "notion.so" not in notes
@@ -0,0 +1,31 @@
+import tarfile
+import zipfile
+
+import pytest
+
+from m_write.output_backends import ArchiveBackend
+
+
+@pytest.mark.parametrize("extension", [".zip", ".tar.gz"])
+def test_archive_backend_writes_every_member(tmp_path, extension):
+    archive_path = str(tmp_path / f"export{extension}")
+    with ArchiveBackend(archive_path) as backend:
+        backend.write_text("index.md", "# Index\n")
+        backend.write_stream("docs/image.png", iter([b"ima", b"ge"]))
+        with backend.open_text("docs/page.md") as page_file:
+            page_file.write("page ")
+            page_file.write("content")
+
+    expected = {
+        "index.md": b"# Index\n",
+        "docs/image.png": b"image",
+        "docs/page.md": b"page content",
+    }
+    if extension == ".zip":
+        with zipfile.ZipFile(archive_path) as archive:
+            assert archive.testzip() is None
+            assert {name: archive.read(name) for name in archive.namelist()} == expected
+    else:
+        with tarfile.open(archive_path) as archive:
+            members = archive.getmembers()
+            assert {m.name: archive.extractfile(m).read() for m in members} == expected
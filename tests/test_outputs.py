@@ -0,0 +1,71 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from m_aux.outputs import prepare_staging_folder, sync_output_folder
+
+
+def write_files(folder, files):
+    for relative_path, content in files.items():
+        path = folder / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def read_files(folder):
+    return {
+        str(path.relative_to(folder)): path.read_text()
+        for path in sorted(folder.rglob("*"))
+        if path.is_file()
+    }
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    output_dir = tmp_path / "wiki"
+    write_files(
+        output_dir,
+        {
+            "docs/unchanged.md": "same",
+            "docs/changed.md": "before",
+            "docs/gone/stale.md": "stale",
+            "profile/fetch.prof": "profile",
+        },
+    )
+    os.utime(output_dir / "docs/unchanged.md", (1000000000, 1000000000))
+    return output_dir
+
+
+def stage(output_dir, files):
+    staging_dir = prepare_staging_folder(str(output_dir))
+    write_files(Path(staging_dir), files)
+    return staging_dir
+
+
+def test_sync_replaces_changed_and_removes_stale_files(output_dir):
+    staged = {"docs/unchanged.md": "same", "docs/changed.md": "after", "docs/new.md": "new"}
+    staging_dir = stage(output_dir, staged)
+
+    summary = sync_output_folder(staging_dir, str(output_dir), preserved_dirs=["profile"])
+
+    assert summary == {"added": 1, "changed": 1, "removed": 1, "unchanged": 1}
+    assert read_files(output_dir) == {**staged, "profile/fetch.prof": "profile"}
+    # The unchanged file is not touched, the folder left empty is removed
+    assert os.stat(output_dir / "docs/unchanged.md").st_mtime == 1000000000
+    assert not (output_dir / "docs/gone").exists()
+    assert not os.path.exists(staging_dir)
+
+
+def test_incremental_sync_keeps_stale_files(output_dir):
+    staging_dir = stage(output_dir, {"docs/changed.md": "after"})
+
+    summary = sync_output_folder(staging_dir, str(output_dir), remove_stale=False)
+
+    assert summary == {"added": 0, "changed": 1, "removed": 0, "unchanged": 0}
+    assert read_files(output_dir) == {
+        "docs/changed.md": "after",
+        "docs/gone/stale.md": "stale",
+        "docs/unchanged.md": "same",
+        "profile/fetch.prof": "profile",
+    }
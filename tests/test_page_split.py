@@ -0,0 +1,64 @@
+from m_write.page_split import split_page
+
+FILE_PATH = "wiki/guide/guide.md"
+PARTS = [
+    ("child_page", "# Guide", "Guide"),
+    ("paragraph", "Start with [the deploy](#deploy-to-production).", "Start with the deploy."),
+    ("heading_1", "# Set up", "Set up"),
+    ("paragraph", "Install it.", "Install it."),
+    ("heading_3", "### Check", "Check"),
+    ("heading_2", "## Deploy to production", "Deploy to production"),
+    ("paragraph", "Then [check](#check).", "Then check."),
+]
+
+
+def test_page_under_the_thresholds_not_split():
+    assert split_page(FILE_PATH, PARTS) == [(FILE_PATH, PARTS, None)]
+    assert split_page(FILE_PATH, PARTS, max_blocks=7, max_bytes=1000) == [(FILE_PATH, PARTS, None)]
+
+
+def test_oversized_page_split_at_headings():
+    files = split_page(FILE_PATH, PARTS, max_blocks=5)
+
+    assert [(file_path, title) for file_path, _, title in files] == [
+        (FILE_PATH, None),
+        ("wiki/guide/guide_01_set-up.md", "Set up"),
+        ("wiki/guide/guide_02_deploy-to-production.md", "Deploy to production"),
+    ]
+    (_, index_parts, _), (_, set_up_parts, _), (_, deploy_parts, _) = files
+    # The content before the first heading stays in the page, followed by the sub-page index
+    assert index_parts == [
+        ("child_page", "# Guide", "Guide"),
+        (
+            "paragraph",
+            "Start with [the deploy](guide_02_deploy-to-production.md#deploy-to-production).",
+            "Start with the deploy.",
+        ),
+        (
+            "split_index",
+            "- [Set up](guide_01_set-up.md)\n"
+            "- [Deploy to production](guide_02_deploy-to-production.md)",
+            None,
+        ),
+    ]
+    # The heading becomes the title of the sub-page, the smaller headings are kept
+    assert set_up_parts == [
+        ("heading_page", "# Set up", "Set up"),
+        ("paragraph", "Install it.", "Install it."),
+        ("heading_3", "### Check", "Check"),
+    ]
+    assert deploy_parts[-1] == (
+        "paragraph",
+        "Then [check](guide_01_set-up.md#check).",
+        "Then check.",
+    )
+
+
+def test_oversized_page_split_by_size():
+    files = split_page(FILE_PATH, PARTS, max_bytes=50)
+    assert len(files) == 3
+
+
+def test_oversized_page_without_heading_not_split():
+    parts = [("paragraph", f"Line {number}", f"Line {number}") for number in range(10)]
+    assert split_page(FILE_PATH, parts, max_blocks=5) == [(FILE_PATH, parts, None)]
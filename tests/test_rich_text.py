@@ -0,0 +1,70 @@
+from itertools import product
+
+import pytest
+from conftest import rich_text
+
+from m_parse.block_models import RichText
+from m_parse.rich_text import ANNOTATION_NAMES, render_rich_text
+
+CONTENTS = ["text", "two words", " leading", "trailing  ", "\tboth\n", " ", ""]
+HREFS = [None, "https://example.com/page"]
+STYLES = [dict(zip(ANNOTATION_NAMES, values)) for values in product([False, True], repeat=5)]
+
+
+def reference_render(content, annotations, href):
+    """Rendering of a run before the annotation lookup tables, one annotation at a time."""
+    leading_spaces = len(content) - len(content.lstrip())
+    trailing_spaces = len(content) - len(content.rstrip())
+    trimmed_content = content.strip()
+    if annotations.get("bold", False):
+        trimmed_content = f"**{trimmed_content}**"
+    if annotations.get("italic", False):
+        trimmed_content = f"*{trimmed_content}*"
+    if annotations.get("strikethrough", False):
+        trimmed_content = f"~~{trimmed_content}~~"
+    if annotations.get("underline", False):
+        trimmed_content = f"<u>{trimmed_content}</u>"
+    if annotations.get("code", False):
+        trimmed_content = f"`{trimmed_content}`"
+    if href:
+        trimmed_content = f"[{trimmed_content}]({href})"
+    return f"{' ' * leading_spaces}{trimmed_content}{' ' * trailing_spaces}"
+
+
+def run(content, style, href=None):
+    return RichText(**rich_text(content, href, **style))
+
+
+@pytest.mark.parametrize("style", STYLES, ids=lambda style: "+".join(k for k in style if style[k]))
+def test_runs_render_like_the_reference(style):
+    for content, href in product(CONTENTS, HREFS):
+        expected = reference_render(content, style, href)
+        assert render_rich_text([run(content, style, href)]) == expected
+
+
+def test_runs_joined_by_spaces_render_like_the_reference():
+    styles = [STYLES[0], STYLES[1], STYLES[3], STYLES[31]]
+    for first, second in product(product(CONTENTS, styles, HREFS), repeat=2):
+        runs = [first, second]
+        expected = " ".join(reference_render(*rendered) for rendered in runs)
+        assert render_rich_text([run(*rendered) for rendered in runs]) == expected
+
+
+def test_runs_joined_without_separator_merge_same_style():
+    bold = {"bold": True}
+    italic = {"italic": True}
+    cases = [
+        ([("quoted", bold), ("more", bold)], "**quotedmore**"),
+        ([("a", bold), ("b", bold), ("c", italic)], "**ab***c*"),
+        # Whitespace stays outside of the styling, the runs are not merged across it
+        ([("quoted ", bold), ("more", bold)], "**quoted** **more**"),
+        ([("quoted", bold), (" more", bold)], "**quoted** **more**"),
+    ]
+    for runs, expected in cases:
+        assert render_rich_text([run(content, style) for content, style in runs], "") == expected
+    # Different links are not merged
+    linked = [run("a", bold, "https://a.example"), run("b", bold, "https://b.example")]
+    assert render_rich_text(linked, "") == "[**a**](https://a.example)[**b**](https://b.example)"
+    assert render_rich_text([run("a", bold, "https://a.example")] * 2, "") == (
+        "[**aa**](https://a.example)"
+    )
@@ -0,0 +1,50 @@
+import json
+
+from m_write import search_index
+from m_write.output_backends import DirectoryBackend
+from m_write.search_index import SearchIndexWriter
+
+
+def read_index(path):
+    with open(path, encoding="utf-8") as index_file:
+        return json.load(index_file)
+
+
+def test_shards_reopened_past_the_open_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_OPEN_SHARDS", 1)
+    writer = SearchIndexWriter(DirectoryBackend(str(tmp_path)), "docs")
+    # Top level pages go to the home shard, between the pages of their sections
+    pages = [
+        ("docs/README.md", [("Home", ["welcome"])]),
+        ("docs/engineering.md", [("Engineering", ["teams"])]),
+        ("docs/engineering/runbooks.md", [("Runbooks", ["restart"]), ("Rollback", ["undo"])]),
+        ("docs/product.md", [("Product", ["roadmap"])]),
+        ("docs/product/specs.md", [("Specs", ["api"])]),
+        ("docs/engineering/oncall.md", [("On-call", ["pager"])]),
+    ]
+    for file_path, sections in pages:
+        writer.add_page(file_path, sections)
+    writer.close()
+
+    search_dir = tmp_path / "docs" / "search"
+    whole_index = read_index(search_dir / "search_index.json")
+    assert whole_index["config"] == search_index.SEARCH_INDEX_CONFIG
+    assert [doc["location"] for doc in whole_index["docs"]] == [
+        "",
+        "engineering/",
+        "engineering/runbooks/",
+        "engineering/runbooks/#rollback",
+        "product/",
+        "product/specs/",
+        "engineering/oncall/",
+    ]
+    shards = {
+        shard_path.stem: [doc["title"] for doc in read_index(shard_path)["docs"]]
+        for shard_path in (search_dir / "sections").iterdir()
+    }
+    assert shards == {
+        "home": ["Home", "Engineering", "Product"],
+        "engineering": ["Runbooks", "Rollback", "On-call"],
+        "product": ["Specs"],
+    }
+    assert not writer.open_shards
@@ -0,0 +1,85 @@
+import sys
+import tarfile
+import zipfile
+
+import pytest
+from conftest import block_id, rich_text
+
+import main
+from m_aux import outputs
+
+IMAGE_URL = "https://files.example.com/diagram.png?signature=1"
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.content
+
+
+@pytest.fixture
+def wiki(fake_notion, monkeypatch):
+    """Root page holding an image, served once: the signed URL expires after the export."""
+    fake_notion.add_page(1, 1000, "Wiki")
+    fake_notion.add_paragraph(2, 1, rich_text("Welcome"))
+    fake_notion.add_block(
+        3, 1, "image", {"caption": [], "type": "file", "file": {"url": IMAGE_URL}}
+    )
+    downloads = [b"image bytes"]
+
+    def get(url, **kwargs):
+        if not downloads:
+            raise outputs.requests.RequestException("URL expired")
+        return FakeResponse(downloads.pop())
+
+    monkeypatch.setattr(outputs.requests, "get", get)
+    return fake_notion
+
+
+def export(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["main.py", "-l", "ERROR", *args])
+    main.main()
+
+
+def test_snapshot_run_copies_the_exported_media(wiki, monkeypatch, tmp_path):
+    snapshot_path = str(tmp_path / "wiki.jsonl.gz")
+    outputs_dir = tmp_path / "out"
+    root_id = block_id(1).replace("-", "")
+    export(monkeypatch, "-p", root_id, "-o", str(outputs_dir), "--snapshot", snapshot_path)
+    (outputs_dir / "wiki" / "stale.md").write_text("Removed page")
+
+    export(monkeypatch, "--from-snapshot", snapshot_path, "-o", str(outputs_dir))
+
+    images = list(outputs_dir.rglob("*.png"))
+    assert [image.read_bytes() for image in images] == [b"image bytes"]
+    assert "](./" in (outputs_dir / "wiki" / "wiki.md").read_text()
+    assert not (outputs_dir / "wiki" / "stale.md").exists()
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "tar.gz"])
+def test_snapshot_run_copies_the_media_of_the_archive(wiki, monkeypatch, tmp_path, archive_format):
+    snapshot_path = str(tmp_path / "wiki.jsonl.gz")
+    outputs_dir = str(tmp_path / "out")
+    root_id = block_id(1).replace("-", "")
+    export_args = ["-o", outputs_dir, "--output-format", archive_format]
+    export(monkeypatch, "-p", root_id, "--snapshot", snapshot_path, *export_args)
+
+    export(monkeypatch, "--from-snapshot", snapshot_path, *export_args)
+
+    archive_path = f"{outputs_dir}.{archive_format}"
+    if archive_format == "zip":
+        with zipfile.ZipFile(archive_path) as archive:
+            images = [archive.read(name) for name in archive.namelist() if name.endswith(".png")]
+    else:
+        with tarfile.open(archive_path) as archive:
+            images = [
+                archive.extractfile(member).read()
+                for member in archive.getmembers()
+                if member.name.endswith(".png")
+            ]
+    assert images == [b"image bytes"]
@@ -0,0 +1,79 @@
+import collections
+
+import pytest
+from conftest import block_id, rich_text
+
+from m_aux.outputs import normalize_string
+from m_search.crawl_filters import CrawlFilter
+from m_search.notion_blocks import fetch_and_process_block_hierarchy
+from m_search.tree_index import tree_index
+
+
+def copy_id(number, reference):
+    """Returns the ID a block is replayed with under a synced block reference."""
+    return f"{normalize_string(block_id(number))}_{normalize_string(block_id(reference))}"
+
+
+@pytest.fixture
+def wiki(fake_notion):
+    """Synced original holding a nested original, referenced from two pages."""
+    fake_notion.add_page(1, None, "Root")
+    fake_notion.add_synced_block(2, 1)
+    fake_notion.add_paragraph(3, 2, rich_text("Shared"))
+    fake_notion.add_block(4, 2, "toggle", {"rich_text": [rich_text("More")], "color": "default"})
+    fake_notion.add_paragraph(5, 4, rich_text("Details"))
+    fake_notion.add_synced_block(6, 2)
+    fake_notion.add_paragraph(7, 6, rich_text("Nested"))
+    fake_notion.add_page(10, 1, "First")
+    fake_notion.add_synced_block(11, 10, original=2)
+    fake_notion.add_page(20, 1, "Second")
+    fake_notion.add_synced_block(21, 20, original=2)
+    fake_notion.add_synced_block(22, 20, original=6)
+    return fake_notion
+
+
+def test_synced_content_is_fetched_once(wiki):
+    blocks = fetch_and_process_block_hierarchy(block_id(1))
+
+    # Only the originals are listed, their content is retrieved once (the root block twice)
+    listed_ids = set(wiki.fetched_ids("blocks.children.list"))
+    assert listed_ids == {block_id(number) for number in [1, 2, 4, 6, 10, 20]}
+    retrieved = collections.Counter(wiki.fetched_ids("blocks.retrieve"))
+    assert retrieved.pop(block_id(1)) == 2
+    assert set(retrieved.values()) == {1}
+
+    # The content is replayed under every reference, nested originals included
+    replayed_ids = [block["id"] for block in blocks if "_" in block["id"]]
+    assert replayed_ids == [
+        copy_id(3, 11),
+        copy_id(4, 11),
+        copy_id(5, 11),
+        copy_id(6, 11),
+        copy_id(7, 11),
+        copy_id(3, 21),
+        copy_id(4, 21),
+        copy_id(5, 21),
+        copy_id(6, 21),
+        copy_id(7, 21),
+        copy_id(7, 22),
+    ]
+    assert tree_index.parent_id(copy_id(3, 11)) == normalize_string(block_id(11))
+    assert tree_index.parent_id(copy_id(5, 21)) == copy_id(4, 21)
+    assert tree_index.parent_id(copy_id(7, 21)) == copy_id(6, 21)
+    assert tree_index.parent_id(copy_id(7, 22)) == normalize_string(block_id(22))
+    assert tree_index.nearest_page_id(copy_id(5, 21)) == normalize_string(block_id(20))
+
+
+def test_synced_content_is_only_recorded_in_an_included_subtree(wiki):
+    blocks = fetch_and_process_block_hierarchy(
+        block_id(1), crawl_filter=CrawlFilter(include=["Second"])
+    )
+
+    # The original is walked for child pages only, the first included reference is crawled
+    crawled_ids = [normalize_string(block["id"]) for block in blocks]
+    assert normalize_string(block_id(2)) not in crawled_ids
+    assert block_id(21) in wiki.fetched_ids("blocks.children.list")
+    assert tree_index.parent_id(block_id(3)) == normalize_string(block_id(21))
+    # The nested original was recorded under the included reference
+    assert block_id(22) not in wiki.fetched_ids("blocks.children.list")
+    assert tree_index.parent_id(copy_id(7, 22)) == normalize_string(block_id(22))
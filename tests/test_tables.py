@@ -0,0 +1,57 @@
+import sys
+
+import pytest
+from conftest import block_id, rich_text
+
+import main
+from m_search.notion_blocks import mark_table_header
+
+
+def table(has_column_header):
+    return {"type": "table", "table": {"table_width": 2, "has_column_header": has_column_header}}
+
+
+@pytest.mark.parametrize(
+    "block, rows, marked",
+    [
+        (table(True), [{"id": "1"}, {"id": "2"}], True),
+        (table(False), [{"id": "1"}, {"id": "2"}], False),
+        (table(True), [], False),
+        ({"type": "column_list"}, [{"id": "1"}], False),
+    ],
+)
+def test_first_row_of_tables_with_column_header_marked(block, rows, marked):
+    header_row = mark_table_header(block, rows)
+    assert (header_row is not None) == marked
+    if marked:
+        assert header_row is rows[0] and rows[0]["table_header"]
+        assert all("table_header" not in row for row in rows[1:])
+
+
+def add_table(fake_notion, number, parent, has_column_header, rows):
+    fake_notion.add_block(
+        number,
+        parent,
+        "table",
+        {"table_width": 2, "has_column_header": has_column_header, "has_row_header": False},
+    )
+    for position, cells in enumerate(rows, start=1):
+        cells = [[rich_text(text)] if text else [] for text in cells]
+        fake_notion.add_block(number + position, number, "table_row", {"cells": cells})
+
+
+def test_export_renders_the_table_headers(fake_notion, monkeypatch, tmp_path):
+    fake_notion.add_page(1, 1000, "Wiki")
+    add_table(fake_notion, 10, 1, True, [["Name", "Value"], ["a|b", "1"], ["two\nlines", ""]])
+    add_table(fake_notion, 20, 1, False, [["x", "y"]])
+    root_id = block_id(1).replace("-", "")
+    monkeypatch.setattr(
+        sys, "argv", ["main.py", "-p", root_id, "-o", str(tmp_path), "-l", "ERROR"]
+    )
+
+    main.main()
+
+    wiki = (tmp_path / "wiki" / "wiki.md").read_text()
+    header_table = "| Name | Value |\n| --- | --- |\n| a\\|b | 1 |\n| two<br>lines |  |\n"
+    assert header_table in wiki
+    assert "|   |   |\n| --- | --- |\n| x | y |\n" in wiki
@@ -0,0 +1,144 @@
+import os
+import sys
+import types
+from datetime import datetime, timezone
+
+import pytest
+from conftest import block_id, rich_text
+
+import main
+from m_aux import outputs
+from m_aux.outputs import normalize_string
+from m_config.notion_client import notion_client
+from m_search.notion_blocks import fetch_and_process_block_hierarchy
+from m_search.watch import get_page_contents, get_reused_pages, utc_now
+
+IMAGE_URL = "https://files.example.com/diagram.png?signature=1"
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.content
+
+
+@pytest.fixture
+def wiki(fake_notion):
+    """Root page with a page holding an image, and a page edited by the watch rounds."""
+    fake_notion.add_page(1, None, "Root")
+    fake_notion.add_paragraph(2, 1, rich_text("Welcome"))
+    fake_notion.add_page(10, 1, "Media")
+    fake_notion.add_block(
+        11, 10, "image", {"caption": [], "type": "file", "file": {"url": IMAGE_URL}}
+    )
+    fake_notion.add_page(20, 1, "Notes")
+    fake_notion.add_paragraph(21, 20, rich_text("Draft"))
+    fake_notion.add_page(30, 1, "Empty")
+    return fake_notion
+
+
+def run_watch(monkeypatch, outputs_dir, edits):
+    """Runs an export in watch mode, applying an edit before each poll, then stops it."""
+    remaining_edits = list(edits)
+
+    def sleep(seconds):
+        if not remaining_edits:
+            raise KeyboardInterrupt
+        remaining_edits.pop(0)()
+
+    monkeypatch.setattr(main, "time", types.SimpleNamespace(sleep=sleep, time=main.time.time))
+    root_id = block_id(1).replace("-", "")
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["main.py", "-p", root_id, "-o", str(outputs_dir), "-l", "WARNING", "--watch"],
+    )
+    main.main()
+
+
+def find_files(folder, extension):
+    return [
+        os.path.join(dir_path, file_name)
+        for dir_path, _, file_names in os.walk(folder)
+        for file_name in file_names
+        if file_name.endswith(extension)
+    ]
+
+
+def test_watch_rounds_keep_unchanged_media(wiki, monkeypatch, tmp_path):
+    downloads = []
+
+    def get(url, **kwargs):
+        downloads.append(url)
+        return FakeResponse(b"image bytes")
+
+    monkeypatch.setattr(outputs.requests, "get", get)
+    edit_time = utc_now().strftime("%Y-%m-%dT%H:%M:00.000Z")
+    edits = [
+        lambda: wiki.edit(21, edit_time, rich_text=[rich_text("First edit")]),
+        lambda: wiki.edit(21, edit_time, rich_text=[rich_text("Second edit")]),
+    ]
+    run_watch(monkeypatch, tmp_path / "out", edits)
+
+    images = find_files(tmp_path / "out", ".png")
+    assert len(images) == 1
+    with open(images[0], "rb") as image_file:
+        assert image_file.read() == b"image bytes"
+    # Downloaded by the initial export, copied by the watch rounds
+    assert downloads == [IMAGE_URL]
+    notes = [
+        path for path in find_files(tmp_path / "out", ".md") if "Second edit" in open(path).read()
+    ]
+    assert len(notes) == 1
+
+
+def test_recrawl_fetches_only_the_changed_pages(wiki):
+    blocks = fetch_and_process_block_hierarchy(block_id(1))
+    page_contents = get_page_contents(blocks)
+    assert page_contents[normalize_string(block_id(30))] == []
+
+    wiki.calls.clear()
+    notes_id = normalize_string(block_id(20))
+    fetch_and_process_block_hierarchy(
+        block_id(1), reused_pages=get_reused_pages(page_contents, {notes_id})
+    )
+    fetched_ids = wiki.fetched_ids("blocks.retrieve") + wiki.fetched_ids("blocks.children.list")
+    assert {normalize_string(fetched_id) for fetched_id in fetched_ids} == {
+        normalize_string(block_id(1)),
+        notes_id,
+        normalize_string(block_id(21)),
+    }
+
+
+def test_failed_watch_round_is_polled_again(wiki, monkeypatch, tmp_path):
+    monkeypatch.setattr(outputs.requests, "get", lambda url, **kwargs: FakeResponse(b"image"))
+    # An hour goes by between two polls, more than the poll overlap
+    poll_times = iter(datetime(2024, 5, 1, hour, tzinfo=timezone.utc) for hour in range(10, 20))
+    monkeypatch.setattr(main, "utc_now", lambda: next(poll_times))
+    failures = []
+
+    def list_children(block_id, **kwargs):
+        if normalize_string(block_id) == notes_id and failures:
+            raise failures.pop()
+        return wiki.list_children(block_id, **kwargs)
+
+    notes_id = normalize_string(block_id(20))
+    monkeypatch.setattr(notion_client.blocks.children, "list", list_children)
+
+    def edit_and_fail():
+        wiki.edit(21, "2024-05-01T10:30:00.000Z", rich_text=[rich_text("First edit")])
+        failures.append(RuntimeError("Connection reset"))
+
+    # The round crawling the edited page fails, the next one searches for the edit again
+    run_watch(monkeypatch, tmp_path / "out", [edit_and_fail, lambda: None])
+
+    assert not failures
+    notes = [
+        path for path in find_files(tmp_path / "out", ".md") if "First edit" in open(path).read()
+    ]
+    assert len(notes) == 1